@@ -1,18 +1,22 @@
 # -*- coding: utf-8 -*-
 # Distributed under the terms of the GNU General Public License v2
-from functools import reduce
-from pathlib import Path
+import operator
 import re
+import string
+from sys import intern
 
-from .base import constant, AppiObject
+from .base import AppiObject, ImmutableMixin
 from .base.exception import PortageError
+from .base.util.cache import LRUCache
 from .base.util.decorator import cached
+from .catalog import Catalog
 from .conf import Repository
 from .ebuild import Ebuild
-from .version import Version
+from .vdb import InstalledPackageSet
+from .version import Version, VersionRange
 
 __all__ = [
-    'DependAtom', 'QueryAtom', 'AtomError',
+    'AtomMatcher', 'DependAtom', 'QueryAtom', 'AtomError',
 ]
 
 
@@ -26,7 +30,80 @@ class AtomError(PortageError):
         super().__init__(message, atom=atom, **kwargs)
 
 
-class BaseAtom(AppiObject):
+class AtomMatcher(AppiObject):
+    """Compiled form of an atom, to match it against many ebuilds.
+
+    Everything that only depends on the atom (version, comparison operator,
+    slot and subslot) is computed once, when creating the matcher. Use
+    `BaseAtom.get_matcher()` rather than creating matchers directly.
+    """
+
+    __slots__ = (
+        'atom', 'category', 'package', 'repository', 'version', 'compare',
+        'slot', 'subslot',
+    )
+
+    operators = {
+        '>=': operator.ge,
+        '<=': operator.le,
+        '=': operator.eq,
+        '<': operator.lt,
+        '>': operator.gt,
+    }
+
+    def __init__(self, atom):
+        self.atom = atom
+        self.category = atom.category
+        self.package = atom.package
+        self.repository = atom.repository
+        self.version = atom.get_version()
+        self.compare = None
+        if self.version:
+            if atom.postfix == '*':
+                self.compare = self._startswith
+            elif atom.selector == '~':
+                self.compare = self._same_upstream_version
+            else:
+                self.compare = self.operators[atom.selector]
+        self.slot = self.subslot = None
+        if atom.slot:
+            match = re.search(r'^(.+?)(?:/(.+?))?(?:[=*])?$', atom.slot)
+            self.slot, self.subslot = match.groups()
+
+    def __str__(self):
+        return str(self.atom)
+
+    def _startswith(self, version, other):
+        return version.startswith(other)
+
+    def _same_upstream_version(self, version, other):
+        # Atoms with the '~' selector have no revision, so comparing all but
+        # the revision part of the sort keys is enough.
+        return version.sort_key()[:3] == other.sort_key()[:3]
+
+    def match(self, ebuild):
+        """Return True if `ebuild` matches the atom."""
+        if ebuild.package != self.package:
+            return False
+        if self.category and ebuild.category != self.category:
+            return False
+        if self.repository and ebuild.repo_name != self.repository:
+            return False
+        if self.compare and not self.compare(ebuild.get_version(), self.version):
+            return False
+        if self.slot:
+            if self.slot != ebuild.slot or (
+                    self.subslot and self.subslot != ebuild.subslot):
+                return False
+        return True
+
+    def filter(self, ebuilds):
+        """Return the list of `ebuilds` matching the atom."""
+        match = self.match
+        return [e for e in ebuilds if match(e)]
+
+
+class BaseAtom(ImmutableMixin, AppiObject):
     """An ebuild atom with the following properties:
 
         - package: the package name
@@ -37,7 +114,10 @@ class BaseAtom(AppiObject):
         - prefix: the extended prefix (! or !!)
         - postfix: the extended postfix (*)
         - use: the use dependency
-        - repository: not used in this class, but in subclasses
+        - repository: the repository (always None for depend atoms)
+
+    Atoms are immutable. Use the `parse()` class method to share instances of
+    frequently parsed atoms.
     """
 
     patterns = dict(map(lambda x: (x[0], '(?P<{}>{})'.format(x[0], x[1])), [
@@ -48,21 +128,45 @@ class BaseAtom(AppiObject):
         ('version', r'\d+(\.\d+)*[a-z]?(_(alpha|beta|pre|rc|p)\d*)*(-r\d+)?'),
         ('postfix', r'\*'),
         ('slot', r'\*|=|([0-9a-zA-Z_.-]+(/[0-9a-zA-Z_.-]+)?[=*]?)'),
-        ('use', r'[-!]?[a-z][a-z0-9_-]*[?=]?(,[-!]?[a-z][a-z0-9_-]*[?=]?)*'),
+        ('use', (
+            r'[-!]?[A-Za-z0-9][A-Za-z0-9+_@-]*(\([+-]\))?[?=]?'
+            r'(,[-!]?[A-Za-z0-9][A-Za-z0-9+_@-]*(\([+-]\))?[?=]?)*')),
         ('repository', r'[a-zA-Z0-9_-]+'),
     ]))
 
+    __slots__ = tuple(patterns) + (
+        '_key', '_cached_get_version_range', '_cached_get_matcher',
+    )
+
+    intern_cache = LRUCache(4096)
+    """Atoms created by `parse()`."""
+
+    package_chars = string.ascii_letters + string.digits + '+_-'
+    field_res = {
+        'category': re.compile(patterns['category'] + r'\Z'),
+        'version': re.compile(patterns['version'] + r'\Z'),
+    }
+    """Regular expressions validating a single field, used by `_parse()`."""
+
+    allow_prefix = False
+    """Whether atoms may have a prefix (! or !!)."""
+    allow_use = False
+    """Whether atoms may have use dependencies."""
+
     def __init__(self, atom_string, strict=True):
         """Create an Atom object from a raw atom string.
         If `strict` is `True`, then the package category is required.
         Raise `AtomError` if the atom string is not valid.
         """
-        match = self.atom_re.match(atom_string)
-        if not match:
+        groups = self._parse(atom_string)
+        if groups is None:
             raise AtomError("{atom} is not a valid atom.", atom_string)
 
-        for k, v in match.groupdict().items():
-            setattr(self, k, v)
+        # Fields are interned since the same values (categories, selectors,
+        # slots...) are shared by many atoms. The atom is not frozen yet, so
+        # the immutability check of `__setattr__()` can be skipped.
+        for k, v in groups.items():
+            object.__setattr__(self, k, intern(v) if v else v)
 
         if strict and not self.category:
             raise AtomError(
@@ -84,13 +188,140 @@ class BaseAtom(AppiObject):
             raise AtomError(
                 "{atom} is invalid, '*' postfix can only be used with "
                 "the '=' selector.", atom_string, code='unexpected_postfix')
+        self._key = (self.__class__,) + tuple(
+            getattr(self, field) for field in self.patterns)
+        self.freeze()
+
+    def __hash__(self):
+        return hash(self._key)
+
+    def __eq__(self, other):
+        # Atoms are compared on their class and fields, so that atoms parsed
+        # separately, or evicted from `intern_cache`, compare equal.
+        if not isinstance(other, BaseAtom):
+            return NotImplemented
+        return self._key == other._key
+
+    def __ne__(self, other):
+        if not isinstance(other, BaseAtom):
+            return NotImplemented
+        return self._key != other._key
+
+    @classmethod
+    def _parse_with_regex(cls, atom_string):
+        """Return the dictionnary of fields of `atom_string` matched with
+        `atom_re`, or None if it is not valid. This is the reference
+        implementation of `_parse()`, only kept for testing purpose.
+        """
+        match = cls.atom_re.match(atom_string)
+        if not match:
+            return None
+        fields = dict.fromkeys(cls.patterns)
+        fields.update(match.groupdict())
+        return fields
+
+    @classmethod
+    def _parse(cls, atom_string):
+        """Return the dictionnary of fields of `atom_string`, or None if it
+        is not valid. Fields that are not part of the atom are None.
+
+        The atom string is read from left to right, without backtracking:
+        the prefix and the selector are read first, then the
+        category/package-version part is split from the slot, use and
+        repository part, none of them containing ':' or '['.
+        """
+        pos = 0
+        prefix = selector = None
+        first = atom_string[:1]
+        if first == '!' and cls.allow_prefix:
+            pos = 2 if atom_string[1:2] == '!' else 1
+            prefix = atom_string[:pos]
+            first = atom_string[pos:pos+1]
+        if first and first in '<>=~':
+            end = pos + 1
+            if first in '<>' and atom_string[end:end+1] == '=':
+                end += 1
+            selector = atom_string[pos:end]
+            pos = end
+
+        end = atom_string.find(':', pos)
+        if end < 0:
+            end = len(atom_string)
+        if cls.allow_use:
+            bracket = atom_string.find('[', pos, end)
+            if bracket >= 0:
+                end = bracket
+        pv = cls._split_package_version(atom_string[pos:end])
+        tail = cls._split_tail(atom_string[end:]) if end < len(atom_string) \
+            else (None, None, None)
+        if pv is None or tail is None:
+            return None
+        return {
+            'prefix': prefix, 'selector': selector, 'category': pv[0],
+            'package': pv[1], 'version': pv[2], 'postfix': pv[3],
+            'slot': tail[0], 'use': tail[1], 'repository': tail[2],
+        }
+
+    @classmethod
+    def _split_package_version(cls, pv):
+        """Return the `(category, package, version, postfix)` tuple of `pv`,
+        or None if it is not valid.
+
+        The version starts after the leftmost '-' followed by a valid version.
+        Since a version contains at most one '-' (before the revision), only
+        the last two '-' have to be considered.
+        """
+        category = version = postfix = None
+        slash = pv.find('/')
+        if slash >= 0:
+            category = pv[:slash]
+            if not cls.field_res['category'].match(category):
+                return None
+            pv = pv[slash+1:]
+        package = pv
+        last = pv.rfind('-')
+        if last > 0:
+            for dash in (pv.rfind('-', 0, last), last):
+                if dash < 1 or not pv[dash+1:dash+2].isdecimal():
+                    continue
+                version = pv[dash+1:]
+                if version[-1] == '*':
+                    version, postfix = version[:-1], '*'
+                if cls.field_res['version'].match(version):
+                    package = pv[:dash]
+                    break
+                version = postfix = None
+        if not package or package.strip(cls.package_chars):
+            return None
+        return category, package, version, postfix
+
+    @classmethod
+    def _split_tail(cls, tail):
+        """Return the `(slot, use, repository)` tuple of `tail`, the end of
+        the atom following the package and version, or None if it is not
+        valid.
+        """
+        match = cls.tail_re.match(tail)
+        if not match:
+            return None
+        groups = match.groupdict()
+        return groups['slot'], groups.get('use'), groups.get('repository')
+
+    @classmethod
+    def parse(cls, atom_string, strict=True):
+        """Return an atom object for `atom_string`, shared with previous calls
+        for the same arguments as long as it remains in `intern_cache`.
+        Raise `AtomError` if the atom string is not valid.
+        """
+        return cls.intern_cache.get(
+            (cls, atom_string, strict), lambda: cls(atom_string, strict))
 
     def get_version(self):
         """Return the version as Version object."""
         version = self.version
         if not version:
             return None
-        return Version(version)
+        return Version.parse(version)
 
     def _get_version_glob_pattern(self):
         """Returns the version part of the glob pattern.
@@ -118,48 +349,90 @@ class BaseAtom(AppiObject):
         return '{cat}/{pkg}/{pkg}-{ver}.ebuild'.format(**params)
 
     @cached
+    def get_version_range(self):
+        """Return the `VersionRange` of the versions this atom accepts.
+        See `VersionRange.from_selector()` for the semantics of the '*'
+        postfix.
+        """
+        if not self.version:
+            return VersionRange.all()
+        return VersionRange.from_selector(
+            self.selector, self.get_version(), self.postfix)
+
+    @cached
+    def get_matcher(self):
+        """Return the `AtomMatcher` of this atom."""
+        return AtomMatcher(self)
+
+    def _get_catalogs(self, tree, installed, repository):
+        """Return the catalogs in which ebuilds matching this atom may be
+        found: `Catalog` objects of repositories, and the snapshot of the
+        installed packages. See `iter_matching_ebuilds()`.
+        """
+        catalogs = []
+        if tree:
+            if repository and self.repository and repository != self.repository:
+                locations = []
+            elif repository or self.repository:
+                found = Repository.get(repository or self.repository)
+                locations = [found['location']] if found else []
+            else:
+                locations = Repository.list_locations()
+            catalogs.extend(Catalog.for_location(location) for location in locations)
+        if installed:
+            catalogs.append(InstalledPackageSet.get_snapshot())
+        return catalogs
+
+    def iter_matching_ebuilds(self, tree=True, installed=True, repository=None):
+        """Yield the ebuilds matching this atom, one catalog after the other.
+        Ebuilds of the repositories are only looked up if `tree` is True,
+        restricted to the repository named `repository` if given, and
+        installed ebuilds only if `installed` is True.
+        """
+        matcher = self.get_matcher()
+        version_pattern = self._get_version_glob_pattern()
+        for catalog in self._get_catalogs(tree, installed, repository):
+            paths = catalog.iter_ebuild_paths(
+                self.package, self.category, version_pattern)
+            for path in paths:
+                ebuild = Ebuild(path)
+                if matcher.match(ebuild):
+                    yield ebuild
+
     def list_matching_ebuilds(self):
         """Return the set of ebuilds matching this atom."""
-        glob_pattern = self._get_glob_pattern()
-        if getattr(self, 'repository', None):
-            repository = self.get_repository()
-            if not repository:
-                return set()
-            locations = [repository['location']]
-        else:
-            locations = Repository.list_locations()
-        paths = reduce(lambda x, y: x+y, (
-            list(Path(d).glob(glob_pattern)) for d in locations))
-        paths += list(Path(constant.PACKAGE_DB_PATH).glob(re.sub(
-            r'{0}/({0}-.*)\.ebuild$'.format(re.escape(self.package)),
-            r'\1/\1.ebuild', glob_pattern
-        )))
-        return {e for e in (Ebuild(p) for p in paths) if e.matches_atom(self)}
+        return set(self.iter_matching_ebuilds())
 
     def matches_existing_ebuild(self):
         """Return True if this atom matches at least one existing ebuild."""
-        return bool(self.list_matching_ebuilds())
+        for _ in self.iter_matching_ebuilds():
+            return True
+        return False
 
     def list_possible_useflags(self):
         """Return the set of useflags supported by at least one of the
         matching ebuilds.
         """
-        return set.union(*(e.useflags for e in self.list_matching_ebuilds()))
-
-    def is_installed(self):
-        """Return True if any of the matching ebuilds is installed.
-        False otherwise.
+        ebuilds = self.list_matching_ebuilds()
+        # Ebuilds that could not be loaded raise their error again below.
+        Ebuild.load_metadata(ebuilds)
+        return set.union(*(e.useflags for e in ebuilds))
+
+    def is_installed(self, snapshot=None):
+        """Return True if any installed package matches this atom.
+        False otherwise. Installed packages are looked up in `snapshot`, an
+        `InstalledPackageSet`, or in `InstalledPackageSet.get_snapshot()` by
+        default.
         """
-        for ebuild in self.list_matching_ebuilds():
-            if ebuild.is_installed():
-                return True
-        return False
+        if snapshot is None:
+            snapshot = InstalledPackageSet.get_snapshot()
+        return bool(snapshot.match(self))
 
     def is_in_tree(self):
         """Return True if any of the matching ebuilds is available in the
         repository. False otherwise.
         """
-        for ebuild in self.list_matching_ebuilds():
+        for ebuild in self.iter_matching_ebuilds(installed=False):
             if ebuild.is_in_tree():
                 return True
         return False
@@ -168,10 +441,17 @@ class BaseAtom(AppiObject):
 class DependAtom(BaseAtom):
     """An atom used in ebuild dependencies."""
 
+    __slots__ = ()
+
+    allow_prefix = True
+    allow_use = True
+
     atom_re = re.compile((
         r'^{prefix}?{selector}?({category}/)?{package}(-{version}{postfix}?)?'
         r'(:{slot})?(\[{use}\])?$'
     ).format(**BaseAtom.patterns))
+    tail_re = re.compile(
+        r'(:{slot})?(\[{use}\])?\Z'.format(**BaseAtom.patterns))
 
     def __str__(self):
         template = ''
@@ -199,10 +479,14 @@ class DependAtom(BaseAtom):
 class QueryAtom(BaseAtom):
     """An atom used for querying an ebuild."""
 
+    __slots__ = ()
+
     atom_re = re.compile((
         r'^{selector}?({category}/)?{package}(-{version}{postfix}?)?'
         r'(:{slot})?(::{repository})?$'
     ).format(**BaseAtom.patterns))
+    tail_re = re.compile(
+        r'(:{slot})?(::{repository})?\Z'.format(**BaseAtom.patterns))
 
     def __init__(self, atom_string, *args, **kwargs):
         super().__init__(atom_string, *args, **kwargs)
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
-from .mixin import AppiObject
+from .mixin import AppiObject, ImmutableMixin
 
 __all__ = [
-    'AppiObject',
+    'AppiObject', 'ImmutableMixin',
 ]
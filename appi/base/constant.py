@@ -4,7 +4,7 @@ import platform
 
 __all__ = [
     'ROOT', 'BIN_PATH', 'CONF_DIR', 'GLOBAL_CONFIG_PATH', 'PACKAGE_DB_PATH',
-    'INCREMENTAL_PORTAGE_VARS',
+    'CACHE_DIR', 'INCREMENTAL_PORTAGE_VARS',
 ]
 
 ROOT = '/'
@@ -17,6 +17,9 @@ BIN_PATH = ROOT + 'usr/lib/portage/python{}'.format(python_version)
 CONF_DIR = ROOT + 'etc/portage'
 GLOBAL_CONFIG_PATH = ROOT + 'usr/share/portage/config'
 PACKAGE_DB_PATH = ROOT + 'var/db/pkg'
+# Directory of appi persistent metadata cache, disabled when None. Set it
+# (e.g. to ROOT + 'var/cache/appi') to keep the variables of sourced ebuilds.
+CACHE_DIR = None
 
 INCREMENTAL_PORTAGE_VARS = [
     'ACCEPT_KEYWORDS', 'CONFIG_PROTECT', 'CONFIG_PROTECT_MASK', 'FEATURES',
@@ -2,12 +2,14 @@
 # Distributed under the terms of the GNU General Public License v2
 
 __all__ = [
-    'AppiObject',
+    'AppiObject', 'ImmutableMixin',
 ]
 
 
 class AppiObject:
 
+    __slots__ = ()
+
     def __repr__(self):
         return "<{}: '{}'>".format(self.__class__.__name__, str(self))
 
@@ -15,3 +17,28 @@ class AppiObject:
         # Avoid infinite recursion if the class does not define an __str__
         # method since the default implementation is to call __repr__.
         return "an instance has no name"
+
+
+class ImmutableMixin:
+    """Forbid changing the public attributes of an object once `freeze()` has
+    been called, typically at the end of `__init__()`. Attributes starting with
+    an underscore, such as cached values, remain writable.
+    """
+
+    __slots__ = ('_frozen',)
+
+    def freeze(self):
+        """Make the public attributes of this object read-only."""
+        self._frozen = True
+
+    def __setattr__(self, name, value):
+        if getattr(self, '_frozen', False) and not name.startswith('_'):
+            raise AttributeError("{} objects are immutable.".format(
+                self.__class__.__name__))
+        super().__setattr__(name, value)
+
+    def __delattr__(self, name):
+        if getattr(self, '_frozen', False) and not name.startswith('_'):
+            raise AttributeError("{} objects are immutable.".format(
+                self.__class__.__name__))
+        super().__delattr__(name)
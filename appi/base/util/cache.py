@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+# Distributed under the terms of the GNU General Public License v2
+from collections import OrderedDict
+import threading
+
+__all__ = [
+    'LRUCache',
+]
+
+
+class LRUCache:
+    """A bounded, thread-safe mapping discarding the least recently used
+    entries first. It counts hits and misses to help tuning its size.
+    """
+
+    def __init__(self, maxsize=1024):
+        """Create a cache holding at most `maxsize` entries. A `maxsize` of 0
+        disables the cache, and None makes it unbounded.
+        """
+        self.maxsize = maxsize
+        self.hits = self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, factory):
+        """Return the value stored for `key`. If there is none, call
+        `factory()` and store its result, unless it raises an exception.
+        """
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._data.move_to_end(key)
+                return value
+        value = factory()
+        with self._lock:
+            self._data[key] = value
+            self._shrink()
+        return value
+
+    def _shrink(self):
+        """Discard entries until there are no more than `maxsize`."""
+        if self.maxsize is not None:
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def resize(self, maxsize):
+        """Change the maximum number of entries, discarding the least recently
+        used ones if needed.
+        """
+        with self._lock:
+            self.maxsize = maxsize
+            self._shrink()
+
+    def clear(self):
+        """Remove all entries and reset statistics."""
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def get_stats(self):
+        """Return a dictionnary of cache statistics: number of `hits`,
+        `misses`, `entries` and `maxsize`.
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._data),
+                'maxsize': self.maxsize,
+            }
@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+# Distributed under the terms of the GNU General Public License v2
+from .persistent import PersistentCache
+from .repository import FlatListCache, Md5DictCache, RepositoryCache
+
+__all__ = [
+    'FlatListCache', 'Md5DictCache', 'PersistentCache', 'RepositoryCache',
+]
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+# Distributed under the terms of the GNU General Public License v2
+from pathlib import Path
+
+from ..conf import Repository
+from ..util import get_file_checksum
+
+__all__ = [
+    'find_eclass', 'get_eclass_checksums', 'get_eclass_directories',
+]
+
+
+def get_eclass_directories(location=None):
+    """Return the list of directories to look for eclasses in, by order of
+    precedence, for the repository at `location`: its own eclass directory,
+    then the main repository one, then the ones of all other repositories.
+    """
+    locations = [location] if location else []
+    main_repository = Repository.get_main_repository()
+    if main_repository:
+        locations.append(main_repository['location'])
+    locations.extend(Repository.list_locations())
+    directories = []
+    for location in locations:
+        directory = Path(location, 'eclass')
+        if directory not in directories:
+            directories.append(directory)
+    return directories
+
+
+def find_eclass(name, directories):
+    """Return the path of the eclass `name` in the first of `directories`
+    that provides it. Return None if it is not found.
+    """
+    for directory in directories:
+        path = directory / '{}.eclass'.format(name)
+        if path.exists():
+            return path
+    return None
+
+
+def get_eclass_checksums(names, directories):
+    """Return a dict mapping each eclass name in `names` to the md5 checksum
+    of the eclass file found in `directories` (None if not found).
+    """
+    checksums = {}
+    for name in names:
+        path = find_eclass(name, directories)
+        checksums[name] = get_file_checksum(path) if path else None
+    return checksums
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+# Distributed under the terms of the GNU General Public License v2
+import json
+import os
+from pathlib import Path
+import sqlite3
+import threading
+import time
+
+from ..base import AppiObject, constant
+from .eclass import get_eclass_checksums, get_eclass_directories
+
+__all__ = [
+    'PersistentCache',
+]
+
+
+class PersistentCache(AppiObject):
+    """On-disk cache of ebuild metadata owned by appi.
+
+    Entries are keyed by ebuild path. An entry is only returned as long as the
+    ebuild mtime and size, and the checksums of the eclasses it inherited,
+    remain unchanged. The cache is stored in an SQLite database so that it can
+    safely be shared by several processes.
+    """
+
+    filename = 'metadata.sqlite'
+    max_entries = 100000
+    """Maximum number of entries. When it is exceeded, entries of ebuilds that
+    no longer exist are evicted first, then the oldest entries.
+    """
+    evict_ratio = 0.1
+    """Fraction of `max_entries` evicted along with the excess entries, so
+    that the following insertions do not have to evict again.
+    """
+    timeout = 30
+    """Number of seconds to wait for another process to release the database."""
+
+    schema = (
+        'CREATE TABLE IF NOT EXISTS ebuilds ('
+        ' path TEXT PRIMARY KEY,'
+        ' mtime INTEGER NOT NULL,'
+        ' size INTEGER NOT NULL,'
+        ' eclasses TEXT NOT NULL,'
+        ' metadata TEXT NOT NULL,'
+        ' created REAL NOT NULL'
+        ')'
+    )
+
+    _defaults = {}
+    """Store default caches by cache directory."""
+    _defaults_lock = threading.Lock()
+
+    @classmethod
+    def get_default(cls):
+        """Return the cache stored in `constant.CACHE_DIR`.
+        Return None if the cache is disabled (`CACHE_DIR` is None) or cannot be
+        opened, e.g. because the directory is not writable.
+        """
+        directory = constant.CACHE_DIR
+        if not directory:
+            return None
+        with cls._defaults_lock:
+            if directory not in cls._defaults:
+                try:
+                    cls._defaults[directory] = cls(directory)
+                except (OSError, sqlite3.Error):
+                    cls._defaults[directory] = None
+            return cls._defaults[directory]
+
+    def __init__(self, directory, max_entries=None, eclass_locations=None):
+        """Open (and create if needed) the cache stored in `directory`.
+        `eclass_locations` is the list of repository locations to look for
+        eclasses in. See `appi.cache.RepositoryCache`.
+        """
+        self.path = Path(directory, self.filename)
+        if max_entries is not None:
+            self.max_entries = max_entries
+        self._eclass_locations = eclass_locations
+        self._lock = threading.RLock()
+        self.hits = self.misses = self.stale = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(
+            str(self.path), timeout=self.timeout, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        with self._connection:
+            self._connection.execute(self.schema)
+        self._count = self.count()
+        """Upper bound of the number of entries, counting each insertion as
+        a new entry. It is only checked against the database once it exceeds
+        `max_entries`.
+        """
+
+    def __str__(self):
+        return str(self.path)
+
+    def get_eclass_locations(self, ebuild):
+        """Return the list of directories to look for `ebuild` eclasses in."""
+        if self._eclass_locations is not None:
+            return [Path(location, 'eclass') for location in self._eclass_locations]
+        repository = ebuild.repository
+        return get_eclass_directories(
+            repository['location'] if repository else None)
+
+    def get(self, ebuild):
+        """Return the dictionnary of `ebuild` variables.
+        Return None if the cache has no entry for this ebuild or if the entry
+        is stale.
+        """
+        path = str(ebuild.location)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        with self._lock:
+            try:
+                row = self._connection.execute(
+                    'SELECT mtime, size, eclasses, metadata FROM ebuilds '
+                    'WHERE path = ?', (path,)).fetchone()
+            except sqlite3.Error:
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+        mtime, size, eclasses, metadata = row
+        eclasses = json.loads(eclasses)
+        valid = (mtime, size) == (stat.st_mtime_ns, stat.st_size) and (
+            eclasses == get_eclass_checksums(
+                eclasses, self.get_eclass_locations(ebuild)))
+        with self._lock:
+            if not valid:
+                self.stale += 1
+                return None
+            self.hits += 1
+        return json.loads(metadata)
+
+    def put(self, ebuild, metadata):
+        """Store the dictionnary of `ebuild` variables `metadata`.
+        The list of inherited eclasses is read from the INHERITED variable.
+        """
+        path = str(ebuild.location)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        eclasses = get_eclass_checksums(
+            metadata.get('INHERITED', '').split(),
+            self.get_eclass_locations(ebuild))
+        row = (
+            path, stat.st_mtime_ns, stat.st_size,
+            json.dumps(eclasses, sort_keys=True), json.dumps(metadata),
+            time.time(),
+        )
+        with self._lock:
+            try:
+                with self._connection:
+                    self._connection.execute(
+                        'INSERT OR REPLACE INTO ebuilds VALUES (?, ?, ?, ?, ?, ?)',
+                        row)
+                self._count += 1
+                if self._count > self.max_entries:
+                    self._evict()
+            except sqlite3.Error:
+                pass
+
+    def count(self):
+        """Return the number of entries in the cache."""
+        with self._lock:
+            return self._connection.execute(
+                'SELECT COUNT(*) FROM ebuilds').fetchone()[0]
+
+    def prune(self):
+        """Remove entries of ebuilds that no longer exist.
+        Return the number of removed entries.
+        """
+        with self._lock:
+            paths = [
+                (p,) for p, in self._connection.execute(
+                    'SELECT path FROM ebuilds')
+                if not os.path.exists(p)
+            ]
+            with self._connection:
+                self._connection.executemany(
+                    'DELETE FROM ebuilds WHERE path = ?', paths)
+            self._count -= len(paths)
+        return len(paths)
+
+    def _evict(self):
+        """Bring the number of entries back under `max_entries`. If the cache
+        is full, the oldest entries are evicted at once, `evict_ratio` of
+        `max_entries` more than needed.
+        """
+        self.prune()
+        self._count = self.count()
+        if self._count >= self.max_entries:
+            limit = self._count - self.max_entries + int(
+                self.max_entries * self.evict_ratio)
+            with self._connection:
+                self._connection.execute(
+                    'DELETE FROM ebuilds WHERE path IN ('
+                    ' SELECT path FROM ebuilds ORDER BY created LIMIT ?'
+                    ')', (limit,))
+            self._count -= limit
+
+    def clear(self):
+        """Remove all entries and reset statistics."""
+        with self._lock:
+            with self._connection:
+                self._connection.execute('DELETE FROM ebuilds')
+            self._count = 0
+            self.hits = self.misses = self.stale = 0
+
+    def get_stats(self):
+        """Return a dictionnary of cache statistics: number of `hits`, `misses`
+        and `stale` entries met by this process, number of `entries` and
+        `size` of the database file in bytes.
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'entries': self.count(),
+                'size': self.path.stat().st_size,
+            }
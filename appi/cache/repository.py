@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+# Distributed under the terms of the GNU General Public License v2
+import os
+from pathlib import Path
+import re
+
+from ..base import AppiObject
+from ..util import SignatureCache, get_file_checksum, get_files_signature
+from .eclass import find_eclass, get_eclass_directories
+
+__all__ = [
+    'RepositoryCache', 'Md5DictCache', 'FlatListCache',
+]
+
+
+class RepositoryCache(AppiObject):
+    """Ebuild metadata cache shipped within a repository.
+
+    Each subclass describes a specific cache format. Entries are only returned
+    if they are still valid with regard to the ebuild file (and the eclasses it
+    inherits when the format allows to check it).
+    """
+
+    cache_dir = None
+    """Directory of the cache, relative to the repository location."""
+
+    metadata_keys = (
+        'DEPEND', 'RDEPEND', 'SLOT', 'SRC_URI', 'RESTRICT', 'HOMEPAGE',
+        'LICENSE', 'DESCRIPTION', 'KEYWORDS', 'INHERITED', 'IUSE',
+        'REQUIRED_USE', 'PDEPEND', 'BDEPEND', 'IDEPEND', 'EAPI', 'PROPERTIES',
+        'DEFINED_PHASES',
+    )
+    """Metadata variables a cache entry may provide. Variables missing from an
+    entry are considered empty.
+    """
+
+    check_interval = 1
+    """Minimum number of seconds between two checks of the cache directories
+    of a repository.
+    """
+
+    _instances = SignatureCache()
+    """Store caches by repository location, along with the signature of the
+    cache directories of the repository.
+    """
+
+    @classmethod
+    def for_location(cls, location):
+        """Return the cache of the repository at `location`.
+        The md5-cache is preferred over the flat cache.
+        Return None if the repository ships no metadata cache. The cache
+        directories are checked again at most once every `check_interval`
+        seconds, so that a cache generated or removed since is taken into
+        account.
+        """
+        return cls._instances.get(
+            str(location), cls._create, cls._get_signature, cls.check_interval)
+
+    @classmethod
+    def _create(cls, location):
+        signature = cls._get_signature(location)
+        for cache_class in (Md5DictCache, FlatListCache):
+            if Path(location, cache_class.cache_dir).is_dir():
+                return cache_class(location), signature
+        return None, signature
+
+    @staticmethod
+    def _get_signature(location, cache=None):
+        return get_files_signature(
+            Path(location, cache_class.cache_dir)
+            for cache_class in (Md5DictCache, FlatListCache)
+        )
+
+    def __init__(self, location, eclass_locations=None):
+        """Create a cache object for the repository at `location`.
+        `eclass_locations` is the list of repository locations to look for
+        eclasses in, by order of precedence. It defaults to this repository,
+        then the main repository, then all other repositories.
+        """
+        self.location = Path(location)
+        self._eclass_locations = eclass_locations
+
+    def __str__(self):
+        return str(self.location / self.cache_dir)
+
+    def get_eclass_locations(self):
+        """Return the list of directories to look for eclasses in."""
+        if self._eclass_locations is not None:
+            return [Path(location, 'eclass') for location in self._eclass_locations]
+        return get_eclass_directories(self.location)
+
+    def find_eclass(self, name):
+        """Return the path of the eclass `name`, or None if not found."""
+        return find_eclass(name, self.get_eclass_locations())
+
+    def get_entry_path(self, ebuild):
+        """Return the path of the cache entry describing `ebuild`."""
+        return (
+            self.location / self.cache_dir / ebuild.category /
+            '{}-{}'.format(ebuild.package, ebuild.version)
+        )
+
+    def get(self, ebuild):
+        """Return a dictionnary of `ebuild` metadata variables.
+        Return None if the cache has no entry for this ebuild or if the entry
+        is stale.
+        """
+        path = self.get_entry_path(ebuild)
+        try:
+            with path.open('r', encoding='utf-8') as f:
+                entry = self.read_entry(f.read())
+        except (OSError, UnicodeDecodeError):
+            return None
+        if not self.is_valid(entry, ebuild, path):
+            return None
+        metadata = {k: entry.get(k, '') for k in self.metadata_keys}
+        metadata['EAPI'] = metadata['EAPI'] or '0'
+        return metadata
+
+    def read_entry(self, content):
+        """Return a dictionnary of the variables held by the entry `content`."""
+        raise NotImplementedError
+
+    def is_valid(self, entry, ebuild, path):
+        """Return True if the `entry` read from `path` is up to date with
+        `ebuild`. False otherwise.
+        """
+        raise NotImplementedError
+
+
+class Md5DictCache(RepositoryCache):
+    """The md5-dict cache format (metadata/md5-cache).
+
+    Each entry is a list of KEY=value lines. Entries are validated against the
+    md5 checksums of the ebuild (_md5_) and of each inherited eclass
+    (_eclasses_).
+    """
+
+    cache_dir = 'metadata/md5-cache'
+    checksum_re = re.compile(r'^[0-9a-f]{32}$')
+
+    @classmethod
+    def parse_eclasses(cls, value):
+        """Return a dict mapping eclass names to their md5 checksum.
+        Both the "name<TAB>md5" layout and the older "name<TAB>path<TAB>md5"
+        layout are supported. Return None if `value` cannot be parsed.
+        """
+        tokens = value.split('\t') if value else []
+        if len(tokens) % 2 == 0 and all(
+                cls.checksum_re.match(t) for t in tokens[1::2]):
+            return dict(zip(tokens[::2], tokens[1::2]))
+        if len(tokens) % 3 == 0:
+            return dict(zip(tokens[::3], tokens[2::3]))
+        return None
+
+    def read_entry(self, content):
+        entry = {}
+        for line in content.splitlines():
+            key, sep, value = line.partition('=')
+            if sep:
+                entry[key] = value
+        eclasses = self.parse_eclasses(entry.get('_eclasses_', ''))
+        entry['_eclasses_'] = eclasses
+        if eclasses:
+            entry['INHERITED'] = ' '.join(sorted(eclasses))
+        return entry
+
+    def is_valid(self, entry, ebuild, path):
+        if entry['_eclasses_'] is None:
+            return False
+        if entry.get('_md5_') != get_file_checksum(ebuild.location):
+            return False
+        for name, checksum in entry['_eclasses_'].items():
+            eclass_path = self.find_eclass(name)
+            if not eclass_path or get_file_checksum(eclass_path) != checksum:
+                return False
+        return True
+
+
+class FlatListCache(RepositoryCache):
+    """The older flat_list cache format (metadata/cache).
+
+    Each entry lists metadata values one per line in a fixed order. This format
+    carries no checksum; portage stamps entries with the mtime of the ebuild
+    they describe, which is what entries are validated against.
+    """
+
+    cache_dir = 'metadata/cache'
+    keys = (
+        'DEPEND', 'RDEPEND', 'SLOT', 'SRC_URI', 'RESTRICT', 'HOMEPAGE',
+        'LICENSE', 'DESCRIPTION', 'KEYWORDS', 'INHERITED', 'IUSE',
+        'REQUIRED_USE', 'PDEPEND', 'PROVIDE', 'EAPI', 'PROPERTIES',
+        'DEFINED_PHASES',
+    )
+    """Variables, in the order they appear in an entry."""
+
+    def read_entry(self, content):
+        return dict(zip(self.keys, content.splitlines()))
+
+    def is_valid(self, entry, ebuild, path):
+        try:
+            entry_mtime = os.stat(str(path)).st_mtime
+            ebuild_mtime = os.stat(str(ebuild.location)).st_mtime
+        except OSError:
+            return False
+        return int(entry_mtime) == int(ebuild_mtime)
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+# Distributed under the terms of the GNU General Public License v2
+from fnmatch import fnmatchcase
+import os
+from pathlib import Path
+import re
+
+from .base import AppiObject
+from .conf import Repository
+from .util import SignatureCache, get_files_signature
+
+__all__ = [
+    'Catalog',
+]
+
+
+class Catalog(AppiObject):
+    """In-memory index of the ebuilds found in a repository. Installed
+    packages are indexed by `appi.vdb.InstalledPackageSet`.
+
+    The directory is scanned the first time the catalog is queried:
+    categories and packages are indexed immediately, along with a reverse
+    index of the categories in which each package name appears. The versions
+    of a package are only listed the first time this package is looked up.
+
+    The directory is scanned again when the mtime of the directory or of one
+    of its categories changed, which happens when a category or a package is
+    added or removed. These are checked at most once every `check_interval`
+    seconds. Versions are listed again when the mtime of the package
+    directory changed. Call `invalidate()` (or `refresh()` on a specific
+    catalog) to take other changes into account.
+    """
+
+    version_pattern = (
+        r'\d+(\.\d+)*[a-z]?(_(alpha|beta|pre|rc|p)\d*)*(-r\d+)?'
+    )
+    ebuild_re = re.compile(r'^(?P<pv>.+)\.ebuild$')
+    pv_re = re.compile(
+        r'^(?P<package>[^/]+?)-(?P<version>{})$'.format(version_pattern))
+
+    check_interval = 1
+    """Minimum number of seconds between two checks of the categories for
+    changes.
+    """
+
+    _instances = SignatureCache()
+    """Store catalogs by location. Catalogs of repositories are created again
+    when the repositories configuration changes.
+    """
+
+    @classmethod
+    def for_location(cls, location):
+        """Return the catalog of the repository at `location`."""
+        return cls._instances.get(
+            str(location), cls._create, cls._get_conf_state)
+
+    @classmethod
+    def _create(cls, location):
+        return cls(location), Repository.get_state()
+
+    @staticmethod
+    def _get_conf_state(location, catalog):
+        return Repository.get_state()
+
+    @classmethod
+    def invalidate(cls, location=None):
+        """Drop the catalog of `location`, or all catalogs if `location` is
+        None. They will be scanned again the next time they are queried.
+        """
+        if location is None:
+            cls._instances.clear()
+        else:
+            cls._instances.discard(str(location))
+
+    def __init__(self, location):
+        """Create a catalog of the repository at `location`, laid out as
+        category/package/package-version.ebuild.
+        """
+        self.location = Path(location)
+        self._index = SignatureCache()
+
+    def __str__(self):
+        return str(self.location)
+
+    def refresh(self):
+        """Scan the directory again."""
+        self._index.set(None, *self._scan())
+
+    def _get_index(self):
+        return self._index.get(
+            None, self._scan, lambda key, index: self.get_signature(),
+            self.check_interval)
+
+    def get_signature(self):
+        """Return the signature of the directory and of its categories,
+        which changes when a category or a package is added or removed. See
+        `appi.util.get_files_signature()`.
+        """
+        paths = [self.location] + [
+            e.path for e in self._scandir(self.location)
+            if not e.name.startswith('.')
+        ]
+        return get_files_signature(paths)
+
+    @staticmethod
+    def _scandir(path):
+        """Return the list of `os.DirEntry` of `path`, or an empty list if it
+        cannot be read.
+        """
+        try:
+            with os.scandir(str(path)) as entries:
+                return list(entries)
+        except OSError:
+            return []
+
+    @staticmethod
+    def _is_dir(entry):
+        try:
+            return entry.is_dir()
+        except OSError:
+            return False
+
+    @staticmethod
+    def _get_mtime(path):
+        try:
+            return os.stat(str(path)).st_mtime_ns
+        except OSError:
+            return None
+
+    def _scan(self, key=None):
+        """Return a `(categories, packages)` tuple, where `categories` maps
+        each category to a dictionnary mapping its packages to their versions,
+        and `packages` maps each package name to the set of categories it
+        appears in, along with the signature of the directory. Versions of
+        repository packages are None until they are listed, and then a
+        `(mtime, versions)` tuple, `mtime` being the one of the package
+        directory.
+        """
+        signature = self.get_signature()
+        categories = {}
+        packages = {}
+        for category in self._scandir(self.location):
+            if category.name.startswith('.') or not self._is_dir(category):
+                continue
+            category_packages = {
+                p.name: None for p in self._scandir(category.path)
+                if not p.name.startswith('.') and self._is_dir(p)
+            }
+            if not category_packages:
+                continue
+            categories[category.name] = category_packages
+            for package in category_packages:
+                packages.setdefault(package, set()).add(category.name)
+        return (categories, packages), signature
+
+    def list_categories(self):
+        """Return the list of categories containing at least one package."""
+        return sorted(self._get_index()[0])
+
+    def list_packages(self, category):
+        """Return the list of packages of `category`."""
+        return sorted(self._get_index()[0].get(category, ()))
+
+    def find_categories(self, package):
+        """Return the list of categories in which the package name `package`
+        appears.
+        """
+        return sorted(self._get_index()[1].get(package, ()))
+
+    def list_versions(self, category, package):
+        """Return the list of versions of `category/package`."""
+        category_packages = self._get_index()[0].get(category, {})
+        if package not in category_packages:
+            return []
+        path = self.location / category / package
+        mtime = self._get_mtime(path)
+        listed = category_packages[package]
+        if listed is not None and listed[0] == mtime:
+            return list(listed[1])
+        versions = []
+        for entry in self._scandir(path):
+            match = self.ebuild_re.match(entry.name)
+            match = match and self.pv_re.match(match.group('pv'))
+            if match and match.group('package') == package:
+                versions.append(match.group('version'))
+        category_packages[package] = (mtime, versions)
+        return list(versions)
+
+    def get_ebuild_path(self, category, package, version):
+        """Return the path of the ebuild `category/package-version`."""
+        pv = '{}-{}'.format(package, version)
+        return self.location / category / package / (pv + '.ebuild')
+
+    def iter_ebuild_paths(self, package, category=None, version_pattern='*'):
+        """Yield the paths of the ebuilds of `package`, in `category` if given
+        or in any category otherwise, which version matches the glob pattern
+        `version_pattern`.
+        """
+        if category:
+            categories = [category]
+        else:
+            categories = self.find_categories(package)
+        for category in categories:
+            for version in self.list_versions(category, package):
+                if fnmatchcase(version, version_pattern):
+                    yield self.get_ebuild_path(category, package, version)
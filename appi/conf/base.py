@@ -5,18 +5,46 @@ from pathlib import Path
 
 from ..base import AppiObject
 from ..base.constant import CONF_DIR
+from ..util import SignatureCache, get_files_signature, list_tree_paths
 
 __all__ = [
     'Conf', 'Field', 'PathField',
 ]
 
 
+class ConfState(AppiObject):
+    """The sections of the conf files of a `Conf` subclass, as parsed when
+    the files had the signature `signature`.
+
+    A state is built entirely before it replaces the previous one, and is
+    not modified afterwards, except for its indexes which are built on first
+    use. Readers holding a state thus never see half-parsed conf files.
+    """
+
+    def __init__(self, signature):
+        self.signature = signature
+        self.instances = {}
+        """Map section names to `Conf` instances."""
+        self.indexes = {}
+        """Store the indexes returned by `ConfMetaclass.get_index()` by name.
+        """
+        self.defaults = {}
+        """Store the values extracted from the default section by
+        `ConfMetaclass.handle_default_section()`.
+        """
+
+
 class ConfMetaclass(type):
     """Metaclass for Conf. See `appi.conf.base.Conf`."""
 
+    def __init__(self, name, bases, attrs):
+        super().__init__(name, bases, attrs)
+        # Each subclass has its own state, and replaces it when its conf
+        # files change.
+        self._states = SignatureCache()
+
     def __getitem__(self, key):
-        self._fetch_instances()
-        return self._instances[key]
+        return self.get_state().instances[key]
 
     def get(self, key, default=None):
         try:
@@ -24,13 +52,26 @@ class ConfMetaclass(type):
         except KeyError:
             return default
 
-    def _fetch_instances(self):
-        """Populate `self._instances` if empty.
-        Parse conf file and extract sections as `Conf` instances into
-        `Conf._instances`.
+    def get_state(self):
+        """Return the `ConfState` holding the sections of the conf files.
+        The files are parsed again if they changed since they were parsed.
+        They are checked at most once every `check_interval` seconds.
+        """
+        return self._states.get(
+            None, self._parse, lambda key, state: self.get_conf_signature(),
+            self.check_interval)
+
+    def reload(self):
+        """Parse the conf files again, whether they changed or not, and
+        return the new `ConfState`.
+        """
+        return self._states.set(None, *self._parse())
+
+    def _parse(self, key=None):
+        """Parse the conf files and return their sections as a new
+        `ConfState`, along with the signature of the files.
         """
-        if self._instances:
-            return
+        state = ConfState(self.get_conf_signature())
         default_section = None
         for conf_file in self.get_conf_files():
             config = ConfigParser()
@@ -40,13 +81,15 @@ class ConfMetaclass(type):
                     if section:
                         default_section = section
                 else:
-                    self._instances[name] = self(name, dict(section))
+                    state.instances[name] = self(name, dict(section))
         if default_section:
-            self.handle_default_section(default_section)
+            self.handle_default_section(default_section, state)
+        return state, state.signature
 
-    def handle_default_section(self, section):
+    def handle_default_section(self, section, state):
         """Override this method to implement the behavior when the default
-        section of the conf file is read.
+        section of the conf file is read. Values extracted from it should be
+        stored in `state.defaults`, `state` being the `ConfState` being built.
         """
 
     def list(self, **kwargs):
@@ -55,12 +98,41 @@ class ConfMetaclass(type):
         Conf.list(foobar='baz'), will only return sections that have a foobar
         field equal to "baz".
         """
-        self._fetch_instances()
-        confs = self._instances.values()
+        state = self.get_state()
+        indexed = [k for k in kwargs if k in self.indexed_fields]
+        if indexed:
+            # Sections are looked up by the first indexed field, and only the
+            # other fields are compared.
+            name = indexed[0]
+            field = self.supported_fields[name]
+            key = field.get_index_key(field.to_python(kwargs[name]))
+            confs = self._get_index(state, name).get(key, ())
+            kwargs = {k: v for k, v in kwargs.items() if k != name}
+        else:
+            confs = state.instances.values()
         if kwargs:
             confs = [c for c in confs if c.matches(**kwargs)]
         return list(confs)
 
+    def get_index(self, name):
+        """Return a dictionnary mapping the index keys of the values of the
+        field `name` to the list of sections having that value. See
+        `Field.get_index_key()`.
+        The index is built on first use, and rebuilt when the conf files are
+        parsed again.
+        """
+        return self._get_index(self.get_state(), name)
+
+    def _get_index(self, state, name):
+        index = state.indexes.get(name)
+        if index is None:
+            field = self.supported_fields[name]
+            index = {}
+            for conf in state.instances.values():
+                index.setdefault(field.get_index_key(conf[name]), []).append(conf)
+            state.indexes[name] = index
+        return index
+
     def find(self, **kwargs):
         """Return the only section which fields match the given keyword
         arguments.
@@ -75,19 +147,27 @@ class ConfMetaclass(type):
         return confs[0]
 
     def get_conf_files(self, _paths=None):
-        """Return a list of paths of files involved in the requested conf.
+        """Return a list of paths of files involved in the requested conf, in
+        the order they are parsed: files of directories are sorted by name.
         `_paths` is only used innerly to recurse over subdirectories, it should
         never be passed elsewhere. Consider this method takes no argument.
         """
-        paths = _paths or [self.get_conf_path()]
+        paths = [self.get_conf_path()] if _paths is None else _paths
         expanded_paths = []
         for path in paths:
             if path.is_dir():
-                expanded_paths.extend(self.get_conf_files(path.iterdir()))
+                expanded_paths.extend(self.get_conf_files(sorted(path.iterdir())))
             else:
                 expanded_paths.append(path)
         return expanded_paths
 
+    def get_conf_signature(self):
+        """Return the signature of the conf files and of the directories
+        holding them, which changes whenever a file is edited, added or
+        removed. See `appi.util.get_files_signature()`.
+        """
+        return get_files_signature(list_tree_paths(self.get_conf_path()))
+
     def get_conf_path(self):
         """Return the full absolute path of the conf file."""
         return Path(CONF_DIR, self.conf_file)
@@ -116,8 +196,16 @@ class Conf(AppiObject, metaclass=ConfMetaclass):
     See `appi.conf.base.Field`.
     """
 
-    _instances = {}
-    """Store conf file sections."""
+    indexed_fields = ()
+    """Names of the fields which sections are indexed by, so that `list()`
+    and `find()` do not compare the value of every section when they are
+    passed one of them.
+    """
+
+    check_interval = 1
+    """Minimum number of seconds between two checks of the conf files for
+    changes. See `ConfMetaclass.get_state()`.
+    """
 
     def __init__(self, name, fields):
         self.name = name
@@ -165,6 +253,12 @@ class Field(AppiObject):
             raise ValueError("The field '{}' is required".format(self.name))
         return value
 
+    def get_index_key(self, value):
+        """Return the hashable key sections having the python value `value`
+        are indexed by. Keys must be equal if and only if values are.
+        """
+        return value
+
 
 class PathField(Field):
     """A field which python reprsentation is a `pathlib.Path`."""
@@ -173,6 +267,10 @@ class PathField(Field):
         value = super().to_python(value)
         return Path(value)
 
+    def get_index_key(self, value):
+        # Strings of paths are normalized, and faster to hash than paths.
+        return str(value)
+
 
 class IntegerField(Field):
     """A field which python reprsentation is an `int`."""
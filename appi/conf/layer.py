@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+# Distributed under the terms of the GNU General Public License v2
+from pathlib import Path
+import threading
+
+from ..base import AppiObject, ImmutableMixin, constant
+from ..base.util.decorator import cached
+from ..util import SignatureCache, get_files_signature, list_tree_paths
+from .package import PackageEntrySet, read_conf_lines
+from .profile import Profile
+
+__all__ = [
+    'ProfileLayer', 'ProfileStack',
+]
+
+
+class ProfileLayer(ImmutableMixin, AppiObject):
+    """The data of the files of a single profile directory, as read when they
+    had the signature `signature`.
+
+    Flag files (`use.mask`, `use.force` and `use.stable.mask`) are tuples of
+    flags, possibly negated. Package files (`package.use.mask`,
+    `package.use.force`, `package.mask` and `packages`) are tuples of
+    `(tokens, path, line)` tuples, see `read_conf_lines()`. Layers are
+    immutable: use `get()` to share the layer of a profile directory until
+    its files change.
+    """
+
+    files = {
+        'use.mask': 'use_mask',
+        'use.force': 'use_force',
+        'use.stable.mask': 'use_stable_mask',
+        'package.use.mask': 'package_use_mask',
+        'package.use.force': 'package_use_force',
+        'package.mask': 'package_mask',
+        'packages': 'packages',
+    }
+    """Map the names of the files of a profile to the attributes holding
+    their data.
+    """
+    flag_files = ('use.mask', 'use.force', 'use.stable.mask')
+
+    __slots__ = ('path', 'signature', 'errors') + tuple(files.values())
+
+    check_interval = 1
+    """Minimum number of seconds between two checks of the files for changes.
+    See `get()`.
+    """
+
+    _layers = SignatureCache()
+    """Store the layers returned by `get()` by path."""
+
+    def __init__(self, path):
+        """Read the files of the profile directory at `path`."""
+        self.path = Path(path)
+        paths = self._list_paths(self.path)
+        self.signature = self._get_signature(paths)
+        errors = []
+        for name, attr in self.files.items():
+            lines, file_errors = read_conf_lines(paths[name])
+            errors.extend(file_errors)
+            if name in self.flag_files:
+                value = tuple(t for tokens, _, _ in lines for t in tokens)
+            else:
+                value = tuple((tuple(t), p, n) for t, p, n in lines)
+            setattr(self, attr, value)
+        self.errors = tuple(errors)
+        """Tuple of `(path, None, message)` tuples describing the files that
+        could not be read.
+        """
+        self.freeze()
+
+    def __str__(self):
+        return str(self.path)
+
+    @classmethod
+    def _list_paths(cls, path):
+        return {name: list_tree_paths(path / name) for name in cls.files}
+
+    @classmethod
+    def _get_signature(cls, paths):
+        return get_files_signature(
+            p for name in sorted(paths) for p in paths[name])
+
+    @classmethod
+    def get(cls, path):
+        """Return the layer of the profile directory at `path`, shared with
+        previous calls as long as its files are unchanged. Files are checked
+        at most once every `check_interval` seconds.
+        """
+        return cls._layers.get(
+            str(path), cls._read_layer, cls._get_layer_signature,
+            cls.check_interval)
+
+    @classmethod
+    def _read_layer(cls, key):
+        layer = cls(key)
+        return layer, layer.signature
+
+    @classmethod
+    def _get_layer_signature(cls, key, layer):
+        return cls._get_signature(cls._list_paths(layer.path))
+
+
+class ProfileStack(AppiObject):
+    """The effective data of a chain of profiles, computed by folding the
+    layer of each profile over the stack of its predecessors.
+
+    Each stack keeps the stacks made of itself and one more layer, so that
+    chains sharing their first profiles share the stacks of these profiles,
+    and only fold the layers which differ. Use `from_profiles()` to get the
+    stack of a chain of profiles.
+
+    Folded data is:
+
+        - `use_mask`, `use_force` and `use_stable_mask`: frozensets of flags,
+        - `package_mask`: the tuple of the lines of `package.mask` files which
+          were not removed by a negated atom (`-atom`) of a following profile,
+        - `package_use_mask` and `package_use_force`: the tuples of the lines
+          of these files, which apply in order,
+        - `system`: the frozenset of the atoms of the system set, from the
+          `packages` files.
+    """
+
+    root = None
+    """The empty stack, which all stacks are built over."""
+
+    def __init__(self, parent=None, layer=None):
+        """Create the stack of `layer` over the stack `parent`, or the empty
+        stack if they are None. Use `from_profiles()` or `push()` rather than
+        creating stacks directly.
+        """
+        self.parent = parent
+        self.layer = layer
+        self._children = {}
+        self._children_lock = threading.Lock()
+        if layer is None:
+            self.use_mask = self.use_force = self.use_stable_mask = frozenset()
+            self.package_mask = self.package_use_mask = ()
+            self.package_use_force = ()
+            self.system = frozenset()
+            return
+        self.use_mask = self.fold_flags(parent.use_mask, layer.use_mask)
+        self.use_force = self.fold_flags(parent.use_force, layer.use_force)
+        self.use_stable_mask = self.fold_flags(
+            parent.use_stable_mask, layer.use_stable_mask)
+        self.package_mask = self.fold_lines(parent.package_mask, layer.package_mask)
+        self.package_use_mask = parent.package_use_mask + layer.package_use_mask
+        self.package_use_force = parent.package_use_force + layer.package_use_force
+        self.system = self.fold_system(parent.system, layer.packages)
+
+    def __str__(self):
+        return ' '.join(str(layer) for layer in self.list_layers())
+
+    @staticmethod
+    def fold_flags(flags, new_flags):
+        """Return the frozenset of `flags` updated with `new_flags`: negated
+        flags (`-flag`) are removed, '-*' removes all of them, and other flags
+        are added.
+        """
+        if not new_flags:
+            return flags
+        flags = set(flags)
+        for flag in new_flags:
+            if flag == '-*':
+                flags.clear()
+            elif flag[0] == '-':
+                flags.discard(flag[1:])
+            else:
+                flags.add(flag)
+        return frozenset(flags)
+
+    @staticmethod
+    def fold_lines(lines, new_lines):
+        """Return the tuple of `lines` followed by `new_lines`. Lines which
+        atom is negated (`-atom`) by one of `new_lines` are removed.
+        """
+        if not new_lines:
+            return lines
+        lines = list(lines)
+        for line in new_lines:
+            atom = line[0][0]
+            if atom[0] == '-':
+                lines = [x for x in lines if x[0][0] != atom[1:]]
+            else:
+                lines.append(line)
+        return tuple(lines)
+
+    @staticmethod
+    def fold_system(atoms, new_lines):
+        """Return the frozenset of `atoms` updated with the system set entries
+        of the `packages` lines `new_lines`: `*atom` adds an atom and `-*atom`
+        removes it. Other entries are not part of the system set.
+        """
+        atoms = set(atoms)
+        for line in new_lines:
+            atom = line[0][0]
+            if atom.startswith('*'):
+                atoms.add(atom[1:])
+            elif atom.startswith('-*'):
+                atoms.discard(atom[2:])
+        return frozenset(atoms)
+
+    def push(self, layer):
+        """Return the stack of `layer` over this stack, shared with previous
+        calls as long as the layer of the same profile is unchanged.
+        """
+        key = str(layer.path)
+        with self._children_lock:
+            child = self._children.get(key)
+            if child is None or child.layer is not layer:
+                child = ProfileStack(self, layer)
+                self._children[key] = child
+        return child
+
+    @classmethod
+    def from_profiles(cls, profiles=None):
+        """Return the stack of `profiles`, a list of `Profile` objects in the
+        order they are parsed (`list_default_profiles()` by default).
+        """
+        if profiles is None:
+            profiles = cls.list_default_profiles()
+        stack = cls.root
+        for profile in profiles:
+            stack = stack.push(ProfileLayer.get(profile.path))
+        return stack
+
+    @staticmethod
+    def list_default_profiles():
+        """Return the list of the profiles portage stacks: the chain of
+        `Profile.list()`, then the make.profile target, then the user profile
+        (/etc/portage/profile). The last two are skipped if they do not exist.
+        """
+        profiles = Profile.list()
+        for name in ('make.profile', 'profile'):
+            path = Path(constant.CONF_DIR, name)
+            if path.is_dir():
+                profiles.append(Profile(path))
+        return profiles
+
+    def list_layers(self):
+        """Return the list of the layers of the stack, from the first one."""
+        layers = []
+        stack = self
+        while stack.layer is not None:
+            layers.append(stack.layer)
+            stack = stack.parent
+        return layers[::-1]
+
+    @cached
+    def get_package_mask(self):
+        """Return the masked atoms as a `PackageEntrySet`."""
+        return PackageEntrySet(self.package_mask)
+
+    @cached
+    def get_package_use_mask(self):
+        """Return the masked flags of packages as a `PackageEntrySet`."""
+        return PackageEntrySet(self.package_use_mask)
+
+    @cached
+    def get_package_use_force(self):
+        """Return the forced flags of packages as a `PackageEntrySet`."""
+        return PackageEntrySet(self.package_use_force)
+
+    def is_masked(self, ebuild):
+        """Return True if `ebuild` is masked by the profiles."""
+        return self.get_package_mask().matches(ebuild)
+
+    def get_use_mask(self, ebuild, stable=False):
+        """Return the frozenset of the flags masked for `ebuild`. If `stable`
+        is True, flags of `use.stable.mask` are masked too.
+        """
+        flags = self.use_mask | self.use_stable_mask if stable else self.use_mask
+        return self.fold_flags(
+            flags, self.get_package_use_mask().get_values(ebuild))
+
+    def get_use_force(self, ebuild):
+        """Return the frozenset of the flags forced for `ebuild`."""
+        return self.fold_flags(
+            self.use_force, self.get_package_use_force().get_values(ebuild))
+
+
+ProfileStack.root = ProfileStack()
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+# Distributed under the terms of the GNU General Public License v2
+from pathlib import Path
+import re
+
+__all__ = [
+    'MakeConfParser', 'UnsupportedSyntax',
+]
+
+
+class UnsupportedSyntax(Exception):
+    """Raised by `MakeConfParser` when it meets bash syntax it does not
+    support. The file should then be evaluated by bash itself.
+    """
+
+
+class MakeConfParser:
+    """In-process evaluator of make.conf-like files.
+
+    Only the subset of bash commonly used in make.conf and make.defaults files
+    is supported: comments, plain (and `+=`) assignments, possibly exported,
+    `unset`, single and double quotes, backslash escapes and line
+    continuations, `$VAR` and `${VAR}` expansions, and `source` (or `.`) of an
+    absolute path. Anything else raises `UnsupportedSyntax`.
+    """
+
+    name_re = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+    assignment_re = re.compile(r'([A-Za-z_][A-Za-z0-9_]*)(\+?)=')
+    bash_vars = {
+        'DIRSTACK', 'EPOCHREALTIME', 'EPOCHSECONDS', 'EUID', 'FUNCNAME',
+        'GROUPS', 'HISTCMD', 'HOSTNAME', 'HOSTTYPE', 'IFS', 'LINENO',
+        'MACHTYPE', 'OLDPWD', 'OPTERR', 'OPTIND', 'OSTYPE', 'PATH',
+        'PIPESTATUS', 'PPID', 'PS4', 'PWD', 'RANDOM', 'SECONDS', 'SHELL',
+        'SHELLOPTS', 'SHLVL', 'SRANDOM', 'TERM', 'UID', '_',
+    }
+    """Variables bash defines by itself. Expanding them is only supported if
+    they are defined in the context.
+    """
+    max_depth = 16
+    """Maximum depth of nested `source` commands."""
+
+    _end = object()
+    """Token marking the end of a command."""
+
+    def __init__(self, context=None):
+        self.variables = dict(context or {})
+
+    def parse_file(self, path, _depth=0):
+        """Evaluate the file at `path` and return the resulting variables."""
+        with open(str(path), 'r', encoding='utf-8') as f:
+            return self.parse(f.read(), _depth)
+
+    def parse(self, content, _depth=0):
+        """Evaluate `content` and return the resulting variables."""
+        if _depth > self.max_depth:
+            raise UnsupportedSyntax("Too many nested source commands.")
+        command = []
+        for word in self._iter_words(content):
+            if word is self._end:
+                self._run(command, _depth)
+                command = []
+                continue
+            name, append, value = word
+            if name and (not command or command[0][0] or
+                         command[0][2] == 'export'):
+                # Assignments are performed as soon as they are read, since
+                # the next words of the command may expand them.
+                if append:
+                    value = self.variables.get(name, '') + value
+                self.variables[name] = value
+            command.append(word)
+        return self.variables
+
+    def _run(self, command, depth):
+        """Run the non-assignment part of a command."""
+        if not command or command[0][0]:
+            if any(name is None for name, _, _ in command):
+                raise UnsupportedSyntax("Commands are not supported.")
+            return
+        builtin = command[0][2]
+        args = command[1:]
+        if builtin == 'export':
+            if any(not name and not self.name_re.fullmatch(value)
+                   for name, _, value in args):
+                raise UnsupportedSyntax("Unsupported export options.")
+        elif builtin == 'unset':
+            for name, _, value in args:
+                if name or not self.name_re.fullmatch(value):
+                    raise UnsupportedSyntax("Unsupported unset options.")
+                self.variables.pop(value, None)
+        elif builtin in ('source', '.'):
+            if len(args) != 1 or args[0][0] or not args[0][2].startswith('/'):
+                raise UnsupportedSyntax("Unsupported source arguments.")
+            self.parse_file(Path(args[0][2]), depth + 1)
+        else:
+            raise UnsupportedSyntax("Commands are not supported.")
+
+    def _iter_words(self, text):
+        """Yield the words of `text` as `(name, append, value)` tuples, where
+        `name` is the assigned variable for assignments, None otherwise.
+        `self._end` is yielded at the end of each command.
+        """
+        pos = 0
+        length = len(text)
+        while pos < length:
+            c = text[pos]
+            if c in ' \t':
+                pos += 1
+            elif c == '\\' and text[pos+1:pos+2] == '\n':
+                pos += 2
+            elif c in '\n;':
+                yield self._end
+                pos += 1
+            elif c == '#':
+                end = text.find('\n', pos)
+                pos = length if end < 0 else end
+            else:
+                match = self.assignment_re.match(text, pos)
+                if match:
+                    value, pos = self._scan_word(text, match.end(), True)
+                    yield match.group(1), bool(match.group(2)), value
+                else:
+                    value, pos = self._scan_word(text, pos, False)
+                    yield None, False, value
+        yield self._end
+
+    def _scan_word(self, text, pos, assignment):
+        """Return the expanded value of the word starting at `pos` and the
+        position following it. Pathname expansion does not apply to
+        assignment values.
+        """
+        buf = []
+        length = len(text)
+        while pos < length:
+            c = text[pos]
+            if c in ' \t\n;':
+                break
+            if c == '\\':
+                if pos + 1 >= length:
+                    raise UnsupportedSyntax("Trailing backslash.")
+                if text[pos+1] != '\n':
+                    buf.append(text[pos+1])
+                pos += 2
+            elif c == "'":
+                pos = self._scan_single_quotes(text, pos + 1, buf)
+            elif c == '"':
+                pos = self._scan_double_quotes(text, pos + 1, buf)
+            elif c == '$':
+                pos = self._scan_expansion(text, pos, buf, False)
+            elif c in '`|&<>(){}~' or (not assignment and c in '*?['):
+                raise UnsupportedSyntax("Unsupported character: {}".format(c))
+            else:
+                buf.append(c)
+                pos += 1
+        return ''.join(buf), pos
+
+    def _scan_single_quotes(self, text, pos, buf):
+        """Append the content of the single-quoted string starting at `pos` to
+        `buf`. Return the position following the closing quote.
+        """
+        end = text.find("'", pos)
+        if end < 0:
+            raise UnsupportedSyntax("Unterminated single quote.")
+        buf.append(text[pos:end])
+        return end + 1
+
+    def _scan_double_quotes(self, text, pos, buf):
+        """Append the expanded content of the double-quoted string starting at
+        `pos` to `buf`. Return the position following the closing quote.
+        """
+        length = len(text)
+        while pos < length:
+            c = text[pos]
+            if c == '"':
+                return pos + 1
+            if c == '\\' and pos + 1 < length and text[pos+1] in '$`"\\\n':
+                if text[pos+1] != '\n':
+                    buf.append(text[pos+1])
+                pos += 2
+            elif c == '$':
+                pos = self._scan_expansion(text, pos, buf, True)
+            elif c == '`':
+                raise UnsupportedSyntax("Command substitution.")
+            else:
+                buf.append(c)
+                pos += 1
+        raise UnsupportedSyntax("Unterminated double quote.")
+
+    def _scan_expansion(self, text, pos, buf, quoted):
+        """Append the expansion starting with the '$' at `pos` to `buf`.
+        Return the position following the expansion.
+        """
+        following = text[pos+1:pos+2]
+        if following == '{':
+            end = text.find('}', pos + 2)
+            name = text[pos+2:end] if end >= 0 else ''
+            if not self.name_re.fullmatch(name):
+                raise UnsupportedSyntax("Unsupported parameter expansion.")
+            buf.append(self._get_variable(name))
+            return end + 1
+        match = self.name_re.match(text, pos + 1)
+        if match:
+            buf.append(self._get_variable(match.group()))
+            return match.end()
+        if following in ('', ' ', '\t', '\n') or (quoted and following == '"'):
+            buf.append('$')
+            return pos + 1
+        raise UnsupportedSyntax("Unsupported expansion.")
+
+    def _get_variable(self, name):
+        """Return the value of the variable `name` (empty if undefined)."""
+        if name not in self.variables and (
+                name in self.bash_vars or name.startswith('BASH')):
+            raise UnsupportedSyntax("Variable defined by bash: {}".format(name))
+        return self.variables.get(name, '')
@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+# Distributed under the terms of the GNU General Public License v2
+import fnmatch
+from itertools import chain
+import os
+from pathlib import Path
+import re
+
+from ..atom import AtomError, DependAtom, QueryAtom
+from ..base import AppiObject, constant
+from ..util import SignatureCache, get_files_signature, list_tree_paths
+
+__all__ = [
+    'PackageAcceptKeywords', 'PackageConf', 'PackageConfEntry',
+    'PackageEntrySet', 'PackageEnv', 'PackageLicense', 'PackageMask',
+    'PackageUnmask', 'PackageUse', 'WildcardMatcher', 'read_conf_lines',
+]
+
+
+class WildcardMatcher(AppiObject):
+    """Matcher of the wildcard atoms of portage configuration files, which
+    category and package names may hold '*' wildcards, such as `*/*`,
+    `dev-python/*` or `*/*::gentoo`. They have no version, but may have a slot
+    and a repository.
+
+    It provides the same `match()` method as `AtomMatcher`.
+    """
+
+    __slots__ = (
+        'atom', 'category', 'package', 'slot', 'subslot', 'repository',
+        '_category_re', '_package_re',
+    )
+
+    wildcard_re = re.compile(
+        r'^(?P<category>[a-z0-9*+_.-]+)/(?P<package>[a-zA-Z0-9*+_-]+)'
+        r'(?::(?P<slot>[0-9a-zA-Z_.-]+(?:/[0-9a-zA-Z_.-]+)?))?'
+        r'(?:::(?P<repository>[a-zA-Z0-9_-]+))?$'
+    )
+
+    def __init__(self, atom_string):
+        """Create the matcher of `atom_string`.
+        Raise `AtomError` if it is not a valid wildcard atom.
+        """
+        match = self.wildcard_re.match(atom_string)
+        if not match:
+            raise AtomError("{atom} is not a valid atom.", atom_string)
+        self.atom = atom_string
+        self.category = match.group('category')
+        self.package = match.group('package')
+        slot = match.group('slot') or ''
+        self.slot = slot.partition('/')[0] or None
+        self.subslot = slot.partition('/')[2] or None
+        self.repository = match.group('repository')
+        self._category_re = self._compile(self.category)
+        self._package_re = self._compile(self.package)
+
+    @staticmethod
+    def _compile(pattern):
+        """Return the compiled regular expression of `pattern`, or None if it
+        is a lone wildcard, which matches everything.
+        """
+        if pattern == '*':
+            return None
+        return re.compile(fnmatch.translate(pattern))
+
+    def __str__(self):
+        return self.atom
+
+    def match(self, ebuild):
+        """Return True if `ebuild` matches the atom."""
+        if self._package_re and not self._package_re.match(ebuild.package):
+            return False
+        if self._category_re and not self._category_re.match(ebuild.category):
+            return False
+        if self.repository and ebuild.repo_name != self.repository:
+            return False
+        if self.slot:
+            if self.slot != ebuild.slot or (
+                    self.subslot and self.subslot != ebuild.subslot):
+                return False
+        return True
+
+
+class PackageConfEntry(AppiObject):
+    """A line of a package configuration file: an atom and the values
+    following it. `position` is the index of the entry in the whole
+    configuration, so that matching entries are returned in the order they
+    were read.
+    """
+
+    __slots__ = ('atom', 'matcher', 'values', 'path', 'line', 'position')
+
+    def __init__(self, atom, matcher, values, path, line, position):
+        self.atom = atom
+        self.matcher = matcher
+        self.values = tuple(values)
+        self.path = path
+        self.line = line
+        self.position = position
+
+    def __str__(self):
+        return ' '.join((str(self.atom),) + self.values)
+
+    def matches(self, ebuild):
+        """Return True if the entry applies to `ebuild`."""
+        return self.matcher.match(ebuild)
+
+
+def read_conf_lines(paths):
+    """Return the lines of the files at `paths`, as returned by
+    `appi.util.list_tree_paths()`, as a list of `(tokens, path, line)` tuples,
+    where `tokens` is the list of whitespace-separated words of the line,
+    comments excluded. Empty lines, directories, missing paths, backup files
+    (ending with '~') and hidden files, or files of hidden directories, are
+    skipped.
+    Return the list of lines and a list of `(path, None, message)` tuples
+    describing the files that could not be read.
+    """
+    lines = []
+    errors = []
+    hidden_dir = None
+    for path in paths:
+        # Directories are listed before their content.
+        if hidden_dir and path.startswith(hidden_dir):
+            continue
+        name = os.path.basename(path)
+        if name.startswith('.'):
+            if os.path.isdir(path):
+                hidden_dir = os.path.join(path, '')
+            continue
+        if name.endswith('~') or not os.path.isfile(path):
+            continue
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                content = f.readlines()
+        except (OSError, UnicodeDecodeError) as e:
+            errors.append((path, None, str(e)))
+            continue
+        for number, line in enumerate(content, 1):
+            tokens = line.partition('#')[0].split()
+            if tokens:
+                lines.append((tokens, path, number))
+    return lines, errors
+
+
+class PackageEntrySet(AppiObject):
+    """A list of atoms associated to values, indexed by `category/package`,
+    so that finding the entries applying to an ebuild only matches the atoms
+    of its package, and the wildcard and category-less atoms. Entries which
+    atom can't be parsed are skipped and reported in `errors`.
+    """
+
+    def __init__(self, lines=()):
+        """Create the set of the entries of `lines`, an iterable of
+        `(tokens, path, line)` tuples, where `tokens` is the list of the atom
+        and its values. See `read_conf_lines()`.
+        """
+        self.errors = []
+        """List of `(path, line, message)` tuples describing the lines that
+        could not be parsed.
+        """
+        self._entries = []
+        self._index = {}
+        """Map each `category/package` to the list of its entries."""
+        self._wildcards = []
+        """List of the entries of wildcard and category-less atoms."""
+        for tokens, path, number in lines:
+            self.add(tokens, path, number)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def parse_atom(atom_string):
+        """Return the atom of `atom_string` and its matcher. Atoms with a
+        repository are `QueryAtom` objects, wildcard atoms are kept as strings
+        and matched by a `WildcardMatcher`, other atoms are `DependAtom`
+        objects.
+        Raise `AtomError` if `atom_string` is not a valid atom.
+        """
+        name = atom_string.partition(':')[0]
+        # Versioned atoms may only hold the '*' postfix, and have a selector.
+        if '*' in name and name[0] not in '<=>~':
+            return atom_string, WildcardMatcher(atom_string)
+        if '::' in atom_string:
+            atom = QueryAtom.parse(atom_string, False)
+        else:
+            atom = DependAtom.parse(atom_string, False)
+            if atom.prefix:
+                raise AtomError(
+                    "{atom} is invalid, blockers are not allowed here.",
+                    atom_string, code='unexpected_prefix')
+        return atom, atom.get_matcher()
+
+    def add(self, tokens, path=None, line=None):
+        """Add the entry of `tokens`, the list of an atom and its values,
+        read at `line` of the file at `path`. If the atom is not valid, the
+        entry is reported in `errors` instead.
+        """
+        try:
+            atom, matcher = self.parse_atom(tokens[0])
+        except AtomError as e:
+            self.errors.append((path, line, str(e)))
+            return
+        entry = PackageConfEntry(
+            atom, matcher, tokens[1:], path, line, len(self._entries))
+        self._entries.append(entry)
+        if isinstance(matcher, WildcardMatcher) or not atom.category:
+            self._wildcards.append(entry)
+        else:
+            key = '{}/{}'.format(atom.category, atom.package)
+            self._index.setdefault(key, []).append(entry)
+
+    def get_entries(self, ebuild):
+        """Return the list of entries applying to `ebuild`, in the order they
+        were added. `ebuild` may be any object matchers can match, such as an
+        `Ebuild` or an `InstalledPackage`.
+        """
+        entries = self._index.get(
+            '{}/{}'.format(ebuild.category, ebuild.package), [])
+        if self._wildcards:
+            entries = sorted(entries + self._wildcards, key=lambda e: e.position)
+        return [e for e in entries if e.matches(ebuild)]
+
+    def get_values(self, ebuild):
+        """Return the list of the values of the entries applying to `ebuild`,
+        in the order they were added.
+        """
+        return [v for e in self.get_entries(ebuild) for v in e.values]
+
+    def matches(self, ebuild):
+        """Return True if any entry applies to `ebuild`."""
+        entries = self._index.get(
+            '{}/{}'.format(ebuild.category, ebuild.package), ())
+        return any(e.matches(ebuild) for e in chain(entries, self._wildcards))
+
+
+class PackageConf(PackageEntrySet):
+    """A line-based configuration file of portage associating atoms to
+    values, such as `package.use`. Each line holds an atom followed by
+    whitespace-separated values. The configuration may be a directory, which
+    files are read in the order of their names. See `PackageEntrySet`.
+
+    Each subclass represents a specific file. Use `get_snapshot()` to share
+    a configuration which is read again when its files change.
+    """
+
+    conf_file = None
+    """File or directory to parse, relative to /etc/portage/."""
+    check_interval = 1
+    """Minimum number of seconds between two checks of the files for changes.
+    See `get_snapshot()`.
+    """
+
+    _snapshots = SignatureCache()
+    """Store the configurations returned by `get_snapshot()` by class and
+    path.
+    """
+
+    def __init__(self, path=None):
+        """Read the configuration at `path` (`conf_file` in
+        `constant.CONF_DIR` by default). A missing path is an empty
+        configuration.
+        """
+        self.path = Path(path or Path(constant.CONF_DIR, self.conf_file))
+        paths = list_tree_paths(self.path)
+        self.signature = get_files_signature(paths)
+        lines, errors = read_conf_lines(paths)
+        super().__init__(lines)
+        self.errors[:0] = errors
+
+    def __str__(self):
+        return str(self.path)
+
+    @classmethod
+    def get_snapshot(cls, path=None):
+        """Return the configuration at `path` (`conf_file` in
+        `constant.CONF_DIR` by default), shared with previous calls as long as
+        its files are unchanged. Files are checked at most once every
+        `check_interval` seconds.
+        """
+        key = (cls, str(path or Path(constant.CONF_DIR, cls.conf_file)))
+        return cls._snapshots.get(
+            key, cls._read_snapshot, cls._get_snapshot_signature,
+            cls.check_interval)
+
+    @staticmethod
+    def _read_snapshot(key):
+        conf = key[0](key[1])
+        return conf, conf.signature
+
+    @staticmethod
+    def _get_snapshot_signature(key, conf):
+        return get_files_signature(list_tree_paths(conf.path))
+
+
+class PackageUse(PackageConf):
+    """The useflags of packages (`package.use`)."""
+
+    conf_file = 'package.use'
+
+
+class PackageAcceptKeywords(PackageConf):
+    """The keywords accepted for packages (`package.accept_keywords`). An
+    entry without values accepts the testing keyword of the architecture.
+    """
+
+    conf_file = 'package.accept_keywords'
+
+
+class PackageMask(PackageConf):
+    """The masked packages (`package.mask`)."""
+
+    conf_file = 'package.mask'
+
+
+class PackageUnmask(PackageConf):
+    """The unmasked packages (`package.unmask`)."""
+
+    conf_file = 'package.unmask'
+
+
+class PackageLicense(PackageConf):
+    """The licenses accepted for packages (`package.license`)."""
+
+    conf_file = 'package.license'
+
+
+class PackageEnv(PackageConf):
+    """The environment files of packages (`package.env`). Values are the
+    names of files of /etc/portage/env/.
+    """
+
+    conf_file = 'package.env'
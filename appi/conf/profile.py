@@ -1,10 +1,15 @@
 # -*- coding: utf-8 -*-
 # Distributed under the terms of the GNU General Public License v2
+import os
 from pathlib import Path
 import re
+import threading
 
 from ..base import AppiObject, constant
-from ..util import extract_bash_file_vars
+from ..util import (
+    SignatureCache, extract_bash_file_vars, get_files_signature,
+)
+from .makeconf import MakeConfParser, UnsupportedSyntax
 from .repository import Repository
 
 __all__ = [
@@ -23,22 +28,84 @@ class Profile(AppiObject):
     information contained in profile, separately or all profiles aggregated.
     """
 
+    _system_make_conf = None
+    """Cache of the system make.conf as a (files signature, context) tuple."""
+    _system_make_conf_lock = threading.Lock()
+    _profiles = SignatureCache()
+    """Cache of the chains of profiles returned by `list()`, by make.profile
+    target.
+    """
+    check_interval = 1
+    """Minimum number of seconds between two checks of the parent files for
+    changes. See `list()`.
+    """
+
     @classmethod
     def list(cls):
         """Return the list of all enabled profiles.
         Sorted in the order they will be parsed in the chain.
+        The chain is resolved once and cached until the make.profile target,
+        any parent file of the chain, or the repositories it refers to,
+        change. These are checked at most once every `check_interval` seconds.
         """
-        base_dir = Path(constant.CONF_DIR, 'make.profile')
-        return cls._get_parent_profiles(base_dir)
+        target = os.path.realpath(str(Path(constant.CONF_DIR, 'make.profile')))
+        profiles, _, _ = cls._profiles.get(
+            target, cls._resolve_chain, cls._get_chain_signature,
+            cls.check_interval)
+        return list(profiles)
 
     @classmethod
-    def _get_parent_profiles(cls, base_dir):
-        """Return the list of parent profiles given a profile path."""
-        profiles_parent = base_dir / 'parent'
+    def _resolve_chain(cls, target):
+        """Return the chain of the profile at `target`, as a tuple of the list
+        of its parent profiles, the list of the parent files read and the
+        state of the repositories if any parent refers to a repository, along
+        with the signature of the chain.
+        """
+        context = {'parent_files': [], 'repositories': None, 'memo': {}}
+        profiles = cls._get_parent_profiles(Path(target), context)
+        chain = (profiles, context['parent_files'], context['repositories'])
+        signature = (get_files_signature(chain[1]), chain[2])
+        return chain, signature
+
+    @staticmethod
+    def _get_chain_signature(target, chain):
+        _, parent_files, repositories = chain
+        if repositories is not None:
+            repositories = Repository.get_state()
+        return get_files_signature(parent_files), repositories
+
+    @classmethod
+    def _get_parent_profiles(cls, base_dir, context):
+        """Return the list of parent profiles given a profile path.
+        `context` is a dictionnary holding the list of the paths of the
+        parent files read (`parent_files`), the state of the repositories if
+        any parent refers to a repository (`repositories`), and the parents of
+        the profiles already resolved (`memo`).
+        """
+        key = str(base_dir)
+        if key in context['memo']:
+            return context['memo'][key]
         profiles = []
+        seen = set()
+        for path in cls._read_parent_file(base_dir, context):
+            for profile in cls._get_parent_profiles(path, context) + [cls(path)]:
+                if profile not in seen:
+                    seen.add(profile)
+                    profiles.append(profile)
+        context['memo'][key] = profiles
+        return profiles
+
+    @classmethod
+    def _read_parent_file(cls, base_dir, context):
+        """Return the list of resolved paths of the parents listed in the
+        parent file of the profile at `base_dir`.
+        """
+        profiles_parent = base_dir / 'parent'
+        context['parent_files'].append(profiles_parent)
         if not profiles_parent.exists():
-            return profiles
+            return []
 
+        paths = []
         with profiles_parent.open('r', encoding='utf-8') as f:
             for path in f.readlines():
                 path = re.sub(r'#.*$', '', path)
@@ -46,6 +113,7 @@ class Profile(AppiObject):
                 if not path:
                     continue
                 if ':' in path:
+                    context['repositories'] = Repository.get_state()
                     repo_name, path = path.split(':', 1)
                     if not repo_name:
                         repo = Repository.get_main_repository()
@@ -56,17 +124,8 @@ class Profile(AppiObject):
                     path = base_dir / path
                 else:
                     path = Path(path)
-                path = path.resolve()
-                new_profiles = [
-                    x for x in cls._get_parent_profiles(path)
-                    if x not in profiles
-                ]
-                profiles.extend(new_profiles)
-                profile = cls(path)
-                if profile not in profiles:
-                    profiles.append(profile)
-
-        return profiles
+                paths.append(path.resolve())
+        return paths
 
     @classmethod
     def _sanitize_incremental_var(cls, new_value, old_value):
@@ -106,18 +165,26 @@ class Profile(AppiObject):
 
     @classmethod
     def _parse_make_conf_file(cls, path, context=None):
-        """Read a make.conf-like file and return an updated context."""
+        """Read a make.conf-like file and return an updated context.
+        The file is evaluated in-process when possible, and by bash when it
+        uses syntax `MakeConfParser` does not support.
+        """
         context = context or {}
         incrementals = {
             k: v for k, v in context.items()
             if k in constant.INCREMENTAL_PORTAGE_VARS
         }
         with open(str(path), 'r', encoding='utf-8') as f:
-            output_vars = set(re.findall(
-                r'^\s*(?:export\s+)?([a-z][a-z0-9_]*)=', f.read(), re.M | re.I
-            ))
-        context = dict(
-            context, **extract_bash_file_vars(path, output_vars, context))
+            content = f.read()
+        output_vars = set(re.findall(
+            r'^\s*(?:export\s+)?([a-z][a-z0-9_]*)=', content, re.M | re.I
+        ))
+        try:
+            variables = MakeConfParser(context).parse(content)
+            variables = {k: variables[k] for k in output_vars if k in variables}
+        except UnsupportedSyntax:
+            variables = extract_bash_file_vars(path, output_vars, context)
+        context = dict(context, **variables)
         for incremental in constant.INCREMENTAL_PORTAGE_VARS:
             context[incremental] = cls._sanitize_incremental_var(
                 context.get(incremental, ''), incrementals.get(incremental, '')
@@ -125,16 +192,41 @@ class Profile(AppiObject):
         context['USE'] = cls._expand_to_use(context)
         return context
 
+    @classmethod
+    def list_make_conf_files(cls):
+        """Return the list of paths of files involved in the system make.conf,
+        in the order they are parsed. Some of them may not exist.
+        """
+        paths = [Path(constant.GLOBAL_CONFIG_PATH, 'make.globals')]
+        paths.extend(profile.path / 'make.defaults' for profile in cls.list())
+        paths.append(Path(constant.CONF_DIR, 'make.conf'))
+        return paths
+
     @classmethod
     def get_system_make_conf(cls):
-        """Return a dict of system make.conf variables."""
-        path = Path(constant.GLOBAL_CONFIG_PATH, 'make.globals')
-        context = cls._parse_make_conf_file(path)
-        for profile in cls.list():
-            path = profile.path / 'make.defaults'
+        """Return a dict of system make.conf variables.
+        The result is computed once and cached until any of the files returned
+        by `list_make_conf_files()` changes.
+        """
+        paths = cls.list_make_conf_files()
+        signature = get_files_signature(paths)
+        with cls._system_make_conf_lock:
+            cached = cls._system_make_conf
+            if cached is None or cached[0] != signature:
+                cached = (signature, cls._parse_system_make_conf(paths))
+                cls._system_make_conf = cached
+        return dict(cached[1])
+
+    @classmethod
+    def _parse_system_make_conf(cls, paths):
+        """Return a dict of system make.conf variables, given the list of
+        files returned by `list_make_conf_files()`.
+        """
+        context = cls._parse_make_conf_file(paths[0])
+        for path in paths[1:-1]:
             if path.exists():
                 context = Profile._parse_make_conf_file(path, context)
-        path = Path(constant.CONF_DIR, 'make.conf')
+        path = paths[-1]
         profile_only_vars = context.get('PROFILE_ONLY_VARIABLES', '').split()
         backup_vars = {k: context.get(k, '') for k in profile_only_vars}
         context = Profile._parse_make_conf_file(path, context)
@@ -145,8 +237,18 @@ class Profile(AppiObject):
         """Create a Profile object from a profile path."""
         self.path = Path(path).resolve()
 
+    def __hash__(self):
+        return hash(self.path)
+
     def __eq__(self, profile):
+        if not isinstance(profile, Profile):
+            return NotImplemented
         return self.path == profile.path
 
+    def __ne__(self, profile):
+        if not isinstance(profile, Profile):
+            return NotImplemented
+        return self.path != profile.path
+
     def __str__(self):
         return str(self.path)
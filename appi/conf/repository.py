@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 # Distributed under the terms of the GNU General Public License v2
+import os
+
 from .base import Conf, PathField, IntegerField, BooleanField
 
 __all__ = [
@@ -16,19 +18,55 @@ class Repository(Conf):
         'priority': IntegerField(default=0),
         'auto-sync': BooleanField(default=True),
     }
+    indexed_fields = ('location',)
 
-    _main_repository = None
+    _location_index_key = 'location:resolved'
+    """Key of the index of `find_by_path()` in the indexes of the state."""
 
     @classmethod
-    def handle_default_section(cls, section):
+    def handle_default_section(cls, section, state):
         if 'main-repo' in section:
-            cls._main_repository = cls._instances[section['main-repo']]
+            state.defaults['main_repository'] = state.instances[section['main-repo']]
 
     @classmethod
     def get_main_repository(cls):
         """Return the main repository."""
-        cls._fetch_instances()
-        return cls._main_repository
+        return cls.get_state().defaults.get('main_repository')
+
+    @classmethod
+    def find_by_path(cls, path):
+        """Return the repository containing `path`, that is the one which
+        location is the longest prefix of `path`. Return None if `path` is not
+        in any repository.
+        Locations are matched as written in the conf file and with their
+        symbolic links resolved, `path` is not resolved.
+        """
+        index = cls._get_location_index()
+        path = os.path.normpath(str(path))
+        while True:
+            repository = index.get(path)
+            if repository is not None:
+                return repository
+            parent = os.path.dirname(path)
+            if parent == path:
+                return None
+            path = parent
+
+    @classmethod
+    def _get_location_index(cls):
+        """Return a dictionnary mapping normalized locations, as written and
+        resolved, to repositories.
+        """
+        state = cls.get_state()
+        index = state.indexes.get(cls._location_index_key)
+        if index is None:
+            index = {}
+            for repository in state.instances.values():
+                location = str(repository['location'])
+                index.setdefault(os.path.normpath(location), repository)
+                index.setdefault(os.path.realpath(location), repository)
+            state.indexes[cls._location_index_key] = index
+        return index
 
     @classmethod
     def list_locations(cls):
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+# Distributed under the terms of the GNU General Public License v2
+import re
+
+from .atom import AtomError, DependAtom
+from .base import AppiObject, ImmutableMixin
+from .base.exception import PortageError
+from .base.util.cache import LRUCache
+
+__all__ = [
+    'DependError', 'DependGroup', 'UseConditional',
+]
+
+
+class DependError(PortageError):
+    """Error related to a dependency string."""
+
+    default_code = 'invalid'
+
+    def __init__(self, message, depend, **kwargs):
+        self.depend = depend
+        super().__init__(message, depend=depend, **kwargs)
+
+
+class DependGroup(ImmutableMixin, AppiObject):
+    """A group of dependencies, such as the whole value of `DEPEND`, or a
+    parenthesized group of it.
+
+    `children` is a tuple of `DependAtom`, `DependGroup` and `UseConditional`
+    objects. `operator` tells how many of them are required:
+
+        - None: all of them,
+        - '||': at least one of them,
+        - '^^': exactly one of them,
+        - '??': at most one of them.
+
+    Groups are immutable. Use `DependGroup.parse()` to create them from a
+    dependency string.
+    """
+
+    __slots__ = ('operator', 'children', '_key')
+
+    operators = ('||', '^^', '??')
+    conditional_re = re.compile(r'^(?P<negated>!?)(?P<flag>[A-Za-z0-9][A-Za-z0-9+_@-]*)\?$')
+    token_re = re.compile(r'\S+')
+
+    intern_cache = LRUCache(4096)
+    """Trees created by `DependGroup.parse()`."""
+
+    def __init__(self, children, operator=None):
+        if operator is not None and operator not in self.operators:
+            raise ValueError("Unknown operator: {}".format(operator))
+        self.operator = operator
+        self.children = tuple(children)
+        self._key = (self.__class__, operator, self.children)
+        self.freeze()
+
+    @classmethod
+    def parse(cls, depend_string):
+        """Return the tree of `depend_string`, shared with previous calls for
+        the same string as long as it remains in `intern_cache`.
+        Raise `DependError` if the dependency string is not valid.
+        """
+        return cls.intern_cache.get(
+            (cls, depend_string), lambda: cls._parse(depend_string))
+
+    @classmethod
+    def iter_tokens(cls, depend_string):
+        """Yield the whitespace-separated tokens of `depend_string`."""
+        for match in cls.token_re.finditer(depend_string):
+            yield match.group()
+
+    @classmethod
+    def _parse(cls, depend_string):
+        """Return the tree of `depend_string`, built while reading its tokens.
+        Open groups are kept on a stack of `(opener, children)` tuples, where
+        `opener` is the operator or conditional preceding the parenthesis.
+        """
+        stack = [(None, [])]
+        opener = None
+        for token in cls.iter_tokens(depend_string):
+            if opener is not None and token != '(':
+                raise DependError(
+                    "{depend} is invalid, '{token}' must be followed by a "
+                    "parenthesis.", depend_string, token=opener,
+                    code='missing_parenthesis')
+            if token == '(':
+                stack.append((opener, []))
+                opener = None
+            elif token == ')':
+                if len(stack) == 1:
+                    raise DependError(
+                        "{depend} is invalid, unexpected ')'.", depend_string,
+                        code='unexpected_parenthesis')
+                group = cls._make_group(*stack.pop())
+                stack[-1][1].append(group)
+            elif token in cls.operators or cls.conditional_re.match(token):
+                opener = token
+            else:
+                stack[-1][1].append(cls._parse_atom(token, depend_string))
+        if opener is not None:
+            raise DependError(
+                "{depend} is invalid, '{token}' must be followed by a "
+                "parenthesis.", depend_string, token=opener,
+                code='missing_parenthesis')
+        if len(stack) > 1:
+            raise DependError(
+                "{depend} is invalid, a group is not closed.", depend_string,
+                code='unclosed_group')
+        return cls(stack[0][1])
+
+    @classmethod
+    def _make_group(cls, opener, children):
+        if opener is None or opener in cls.operators:
+            return DependGroup(children, opener)
+        match = cls.conditional_re.match(opener)
+        return UseConditional(
+            match.group('flag'), children, bool(match.group('negated')))
+
+    @staticmethod
+    def _parse_atom(token, depend_string):
+        try:
+            return DependAtom.parse(token)
+        except AtomError as e:
+            raise DependError(
+                "{depend} is invalid: {error}", depend_string, error=str(e),
+                code='invalid_atom')
+
+    def __str__(self):
+        if self.operator:
+            return '{} ( {} )'.format(self.operator, self._format_children())
+        return self._format_children()
+
+    def _format_children(self):
+        # Nested all-of groups are the only ones which string lacks the
+        # parentheses.
+        return ' '.join(
+            '( {} )'.format(c) if type(c) is DependGroup and not c.operator
+            else str(c) for c in self.children)
+
+    def __iter__(self):
+        return iter(self.children)
+
+    def __len__(self):
+        return len(self.children)
+
+    def __hash__(self):
+        return hash(self._key)
+
+    def __eq__(self, other):
+        if not isinstance(other, DependGroup):
+            return NotImplemented
+        return self._key == other._key
+
+    def __ne__(self, other):
+        if not isinstance(other, DependGroup):
+            return NotImplemented
+        return self._key != other._key
+
+    def evaluate(self, use):
+        """Return the tree of dependencies applying to the set of enabled
+        useflags `use`: conditionals are replaced by their children if their
+        condition is met, and dropped otherwise.
+        """
+        children = []
+        for child in self.children:
+            if isinstance(child, UseConditional):
+                if child.is_enabled(use):
+                    children.extend(child.evaluate(use).children)
+            elif isinstance(child, DependGroup):
+                children.append(child.evaluate(use))
+            else:
+                children.append(child)
+        return DependGroup(children, self.operator)
+
+    def flatten(self, use=None):
+        """Return the list of atoms of the tree, in order, including all
+        alternatives of `||`, `^^` and `??` groups. If `use` is given, atoms
+        of conditionals which condition is not met are left out.
+        """
+        atoms = []
+        for child in self.children:
+            if isinstance(child, UseConditional) and use is not None and (
+                    not child.is_enabled(use)):
+                continue
+            if isinstance(child, DependGroup):
+                atoms.extend(child.flatten(use))
+            else:
+                atoms.append(child)
+        return atoms
+
+
+class UseConditional(DependGroup):
+    """A group of dependencies only required if the useflag `flag` is enabled
+    (`flag? ( ... )`), or disabled if `negated` is True (`!flag? ( ... )`).
+    """
+
+    __slots__ = ('flag', 'negated')
+
+    def __init__(self, flag, children, negated=False):
+        self.flag = flag
+        self.negated = negated
+        super().__init__(children)
+        self._key += (flag, negated)
+
+    def __str__(self):
+        return '{}{}? ( {} )'.format(
+            '!' if self.negated else '', self.flag, self._format_children())
+
+    def is_enabled(self, use):
+        """Return True if the condition is met for the set of enabled useflags
+        `use`.
+        """
+        return (self.flag in use) != self.negated
+
+    def evaluate(self, use):
+        """Return the group of dependencies applying to `use`, without the
+        condition. See `DependGroup.evaluate()`.
+        """
+        return super().evaluate(use)
@@ -1,14 +1,18 @@
 # -*- coding: utf-8 -*-
 # Distributed under the terms of the GNU General Public License v2
-from hashlib import sha1
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import os
 from pathlib import Path
 import re
+from sys import intern
 
-from .base import constant, AppiObject
+from .base import constant, AppiObject, ImmutableMixin
 from .base.exception import PortageError
+from .base.util.decorator import cached
+from .cache import PersistentCache, RepositoryCache
 from .conf import Repository, Profile
-from .util import extract_bash_file_vars
+from .util import BashWorker, BashWorkerPool, extract_bash_file_vars
+from .vdb import InstalledPackage, InstalledPackageSet
 from .version import Version
 
 __all__ = [
@@ -26,7 +30,7 @@ class EbuildError(PortageError):
         super().__init__(message, ebuild=ebuild, **kwargs)
 
 
-class Ebuild(AppiObject):
+class Ebuild(ImmutableMixin, AppiObject):
     """An ebuild file. It defines the following properties:
 
         - category
@@ -41,8 +45,16 @@ class Ebuild(AppiObject):
 
     You can access to more information through the `vars` property, such as the
     description, the home page, and the license of the ebuild.
+
+    Ebuilds are immutable. They only store their path and the name of their
+    repository, and build `location` and `repository` objects on access.
     """
 
+    __slots__ = (
+        'category', 'package', 'version', 'repo_name', '_path', '_key',
+        '_vars', '_cached_get_version', '_cached___str__',
+    )
+
     path_re = re.compile(
         r'^(?P<repo_location>/.*/)'
         r'(?P<category>[^/]+?)/(?P<package>[^/]+?)/(?P<package_check>[^/]+?)-'
@@ -55,6 +67,16 @@ class Ebuild(AppiObject):
         r'-(?P<version>\d+(\.\d+)*[a-z]?(_(alpha|beta|pre|rc|p)\d*)*(-r\d+)?)/'
         r'.*\.ebuild$'
     )
+    ebuild_vars = {
+        'EAPI', 'DESCRIPTION', 'HOMEPAGE', 'SRC_URI', 'LICENSE', 'SLOT',
+        'KEYWORDS', 'IUSE', 'REQUIRED_USE', 'RESTRICT', 'DEPEND',
+        'RDEPEND', 'PDEPEND', 'BDEPEND', 'IDEPEND', 'S', 'PROPERTIES',
+        'DOCS', 'HTML_DOCS', 'INHERITED',
+    }
+    """Variables exported to `vars`. Variables which are not part of the
+    metadata cache (S, DOCS and HTML_DOCS) are only available when the ebuild
+    has to be executed.
+    """
 
     def __init__(self, path):
         """Create an Ebuild object from an ebuild path.
@@ -68,10 +90,9 @@ class Ebuild(AppiObject):
                 raise EbuildError("{ebuild} is not a valid ebuild path.", path)
             group_dict = match.groupdict()
             for k, v in group_dict.items():
-                setattr(self, k, v)
-            with (self.db_dir / 'repository').open(encoding='utf-8') as f:
-                self.repo_name = f.read().strip()
-            self.repository = Repository.get(self.repo_name)
+                setattr(self, k, intern(v))
+            package = InstalledPackage.from_path(Path(path).parent)
+            self.repo_name = intern(package.get('repository', '').strip()) or None
         else:
             match = self.path_re.match(path)
             if not match:
@@ -79,8 +100,9 @@ class Ebuild(AppiObject):
             group_dict = match.groupdict()
             package_check = group_dict.pop('package_check')
             repo_location = group_dict.pop('repo_location')
+            # Categories, packages and versions are shared by many ebuilds.
             for k, v in group_dict.items():
-                setattr(self, k, v)
+                setattr(self, k, intern(v))
 
             if self.package != package_check:
                 raise EbuildError(
@@ -88,56 +110,61 @@ class Ebuild(AppiObject):
                     path, pkg1=self.package, pkg2=package_check,
                     code='package_name_mismatch')
 
-            self.repository = Repository.find(location=repo_location)
-            self.repo_name = self.repository.name if self.repository else None
-        self.location = Path(path)
+            repository = Repository.find_by_path(repo_location)
+            self.repo_name = repository.name if repository else None
+        self._path = path
+        self._key = (self.category, self.package, self.version, self.repo_name)
+        self.freeze()
 
+    @cached
     def __str__(self):
         template = '{cat}/{pkg}-{ver}'
         info = dict(cat=self.category, pkg=self.package, ver=self.version)
-        if self.repository:
+        repository = self.repository
+        if repository:
             template += '::{repo}'
-            info['repo'] = self.repository.name
+            info['repo'] = repository.name
         return template.format(**info)
 
+    @property
+    def location(self):
+        """The path of the ebuild file."""
+        return Path(self._path)
+
+    @property
+    def repository(self):
+        """The repository of the ebuild, or None if it is not known."""
+        if not self.repo_name:
+            return None
+        return Repository.get(self.repo_name)
+
+    @cached
     def get_version(self):
         """Return the version as Version object."""
-        return Version(self.version)
+        return Version.parse(self.version)
 
     def matches_atom(self, atom):
         """Return True if this ebuild matches the given atom."""
-        atom_repository = getattr(atom, 'repository', None)
-        valid_category = not atom.category or self.category == atom.category
-        valid_package = self.package == atom.package
-        valid_repository = not atom_repository or (
-            self.repository and self.repository.name == atom_repository)
-        if not (valid_category and valid_package and valid_repository):
-            return False
-        if atom.version:
-            v1 = self.get_version()
-            v2 = atom.get_version()
-            selector = atom.selector
-            if atom.postfix == '*':
-                selector = '^'
-            if selector == '~':
-                v1 = v1.get_upstream_version()
-                selector = '='
-            comp_method = Version.selector_to_comp_method[selector]
-            if not getattr(v1, comp_method)(v2):
-                return False
-        if atom.slot:
-            m = re.search(r'^(.+?)(?:/(.+?))?(?:[=*])?$', atom.slot)
-            slot = m.group(1)
-            subslot = m.group(2)
-            if slot != self.slot or (subslot and subslot != self.subslot):
-                return False
-        return True
+        return atom.get_matcher().match(self)
+
+    def get_key(self):
+        """Return the tuple identifying this ebuild: its category, package,
+        version and repository name (None if unknown).
+        """
+        return self._key
 
     def __hash__(self):
-        return int(sha1(str(self).encode('utf-8')).hexdigest(), 16)
+        return hash(self._key)
 
     def __eq__(self, other):
-        return hash(self) == hash(other)
+        if not isinstance(other, Ebuild):
+            return NotImplemented
+        return self._key == other._key
+
+    def __ne__(self, other):
+        if not isinstance(other, Ebuild):
+            return NotImplemented
+        return self._key != other._key
 
     @property
     def vars(self):
@@ -197,46 +224,152 @@ class Ebuild(AppiObject):
             # EROOT='',
         )
 
-    def _parse_ebuild_file(self):
-        """Execute the ebuild file and export ebuild-related variables to
-        `self._vars` dictionnary.
+    @classmethod
+    def get_source_context(cls):
+        """Return the environment shared by all ebuilds when they are
+        executed, that is, without ebuild-specific variables.
         """
         make_conf = Profile.get_system_make_conf()
-        path = Path(constant.BIN_PATH, 'ebuild.sh')
         repo_locations = (str(l) for l in Repository.list_locations())
-        ebuild_vars = {
-            'EAPI', 'DESCRIPTION', 'HOMEPAGE', 'SRC_URI', 'LICENSE', 'SLOT',
-            'KEYWORDS', 'IUSE', 'REQUIRED_USE', 'RESTRICT', 'DEPEND',
-            'RDEPEND', 'PDEPEND', 'S', 'PROPERTIES', 'DOCS', 'HTML_DOCS',
-        }
-        context = dict(
+        return dict(
             os.environ,
             PORTAGE_PIPE_FD='2',  # TODO How to set something else than stderr?
                                   # Cf. GitLab#12
             PORTAGE_ECLASS_LOCATIONS=' '.join(repo_locations),
-            EBUILD=str(self.location),
             EBUILD_PHASE='depend',  # TODO Is this an ideal phase?
                                     # Cf. GitLab#12
             PORTAGE_BIN_PATH=constant.BIN_PATH,
             PORTAGE_TMPDIR=make_conf['PORTAGE_TMPDIR'],
         )
-        context.update(self.get_ebuild_env())
-        self._vars = extract_bash_file_vars(path, ebuild_vars, context)
-
-    def is_installed(self):
-        """Return True if this ebuild is installed. False otherwise."""
-        if self.repo_name and self.db_dir.exists():
-            with (self.db_dir / 'repository').open(encoding='utf-8') as f:
-                return f.read().strip() == self.repo_name
-        return False
+
+    @classmethod
+    def create_worker(cls):
+        """Return a `BashWorker` ready to execute ebuilds. The environment
+        shared by all ebuilds is only computed once, when creating the worker.
+        The worker has no preamble: ebuild.sh sources the libraries it needs
+        itself, for each ebuild, so sourcing them beforehand would not spare
+        any work.
+        """
+        return BashWorker(context=cls.get_source_context())
+
+    @classmethod
+    def iter_vars(cls, ebuilds, worker=None):
+        """Load the variables of the given ebuilds one after the other and
+        yield `(ebuild, vars)` tuples. Ebuilds which have to be executed are
+        sourced by `worker`, a `BashWorker` created with `create_worker()`,
+        instead of starting one bash process per ebuild. If no worker is
+        given, a temporary one is created when the first ebuild needs it.
+        """
+        pool = None
+        if worker is None:
+            worker = pool = BashWorkerPool(cls.create_worker)
+        try:
+            for ebuild in ebuilds:
+                if not hasattr(ebuild, '_vars'):
+                    ebuild._parse_ebuild_file(worker)
+                yield ebuild, ebuild._vars
+        finally:
+            if pool:
+                pool.close()
+
+    @classmethod
+    def load_metadata(cls, ebuilds, workers=None):
+        """Load the variables of all the given ebuilds concurrently.
+        At most `workers` ebuilds (the number of CPUs by default) are loaded
+        at once, each of them through its own `BashWorker` when it has to be
+        executed. A failing ebuild does not abort the batch: return a
+        dictionnary mapping each ebuild that could not be loaded to the raised
+        exception.
+        """
+        pending = {e for e in ebuilds if not hasattr(e, '_vars')}
+        errors = {}
+        if not pending:
+            return errors
+        workers = min(workers or os.cpu_count() or 1, len(pending))
+        # Make sure the configuration is loaded before threads start.
+        Repository.list()
+        with BashWorkerPool(cls.create_worker, workers) as pool, \
+                ThreadPoolExecutor(workers) as executor:
+            futures = {
+                executor.submit(e._parse_ebuild_file, pool): e
+                for e in pending
+            }
+            for future in as_completed(futures):
+                error = future.exception()
+                if error is not None:
+                    errors[futures[future]] = error
+        return errors
+
+    def _parse_ebuild_file(self, worker=None):
+        """Export ebuild-related variables to `self._vars` dictionnary.
+        Variables of installed ebuilds are read from the files of the database
+        of installed packages. Other ones are read from the repository
+        metadata cache, then from appi persistent cache, if either holds an
+        up-to-date entry for this ebuild. Otherwise, the ebuild is executed
+        (by `worker`, a `BashWorker` or a `BashWorkerPool`, if given) and the
+        result is stored in the persistent cache, unless it lacks SLOT, which
+        every ebuild defines.
+        """
+        if self._path.startswith(constant.PACKAGE_DB_PATH + '/'):
+            package = InstalledPackage.from_path(self.location.parent)
+            self._vars = package.get_vars(self.ebuild_vars)
+            return
+        repository = self.repository
+        if repository:
+            cache = RepositoryCache.for_location(repository['location'])
+            metadata = cache.get(self) if cache else None
+            if metadata is not None:
+                self._vars = {
+                    k: v for k, v in metadata.items() if k in self.ebuild_vars
+                }
+                return
+        cache = PersistentCache.get_default()
+        metadata = cache.get(self) if cache else None
+        if metadata is not None:
+            self._vars = metadata
+            return
+        self._source_ebuild_file(worker)
+        # Sourcing failures, such as a missing ebuild.sh or a bash error,
+        # give no variables, which must not outlive the failure.
+        if cache and self._vars.get('SLOT'):
+            cache.put(self, self._vars)
+
+    def _source_ebuild_file(self, worker=None):
+        """Execute the ebuild file and export ebuild-related variables to
+        `self._vars` dictionnary. If `worker` is given, the ebuild is executed
+        by this `BashWorker` (or `BashWorkerPool`), which already holds the
+        shared environment.
+        """
+        path = Path(constant.BIN_PATH, 'ebuild.sh')
+        context = dict(self.get_ebuild_env(), EBUILD=str(self.location))
+        if worker:
+            self._vars = worker.extract_vars(path, self.ebuild_vars, context)
+        else:
+            context = dict(self.get_source_context(), **context)
+            self._vars = extract_bash_file_vars(
+                path, self.ebuild_vars, context)
+
+    def is_installed(self, snapshot=None):
+        """Return True if this ebuild is installed. False otherwise.
+        Installed packages are looked up in `snapshot`, an
+        `InstalledPackageSet`, or in `InstalledPackageSet.get_snapshot()` by
+        default.
+        """
+        if not self.repo_name:
+            return False
+        if snapshot is None:
+            snapshot = InstalledPackageSet.get_snapshot()
+        package = snapshot.find(self.category, self.package, self.version)
+        return package is not None and package.repo_name == self.repo_name
 
     def is_in_tree(self):
         """Return True if this ebuild is available in the repository.
         False otherwise.
         """
-        if self.repository:
+        repository = self.repository
+        if repository:
             location = (
-                self.repository['location'] / self.category / self.package /
+                repository['location'] / self.category / self.package /
                 '{}-{}.ebuild'.format(self.package, self.version)
             )
             if location.exists():
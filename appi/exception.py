@@ -2,9 +2,12 @@
 # Distributed under the terms of the GNU General Public License v2
 from .base.exception import AppiError, PortageError
 from .atom import AtomError
+from .depend import DependError
 from .ebuild import EbuildError
+from .util import BashError
 from .version import VersionError
 
 __all__ = [
-    'AppiError', 'PortageError', 'AtomError', 'EbuildError', 'VersionError',
+    'AppiError', 'PortageError', 'AtomError', 'BashError', 'DependError',
+    'EbuildError', 'VersionError',
 ]
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+# Distributed under the terms of the GNU General Public License v2
+import json
+import os
+from pathlib import Path
+
+from .base import AppiObject
+from .catalog import Catalog
+from .conf import Repository
+from .depend import DependError, DependGroup
+from .ebuild import Ebuild
+
+__all__ = [
+    'ReverseDependencyIndex',
+]
+
+
+class ReverseDependencyIndex(AppiObject):
+    """Index of the ebuilds depending on each package, built from the
+    dependency variables of the ebuilds.
+
+    Dependency strings are flattened over all their use conditionals and
+    alternatives, so an ebuild is considered as depending on every package
+    it may require. Blockers (`!atom` and `!!atom`) are not dependencies and
+    are left out.
+
+    The index maps each `category/package` to the paths of the ebuilds
+    referencing it, along with the signature (mtime and size) of each indexed
+    ebuild file, so that `update()` only reloads the ebuilds which changed.
+    It can be saved to and loaded from a JSON file.
+    """
+
+    depend_vars = ('DEPEND', 'RDEPEND', 'PDEPEND', 'BDEPEND', 'IDEPEND')
+    """Ebuild variables holding dependencies. Missing ones are ignored."""
+    format_version = 1
+    """Version of the JSON format written by `save()`."""
+
+    def __init__(self):
+        self._ebuilds = {}
+        """Map each indexed ebuild path to a `(signature, packages)` tuple."""
+        self._index = {}
+        """Map each `category/package` to the set of ebuild paths."""
+        self.errors = {}
+        """Map the paths of the ebuilds that could not be indexed to the error
+        message.
+        """
+
+    def __len__(self):
+        return len(self._ebuilds)
+
+    @classmethod
+    def from_repositories(cls, repositories=None, workers=None):
+        """Return the index of all the ebuilds of `repositories` (all the
+        configured repositories by default). Ebuild metadata is loaded
+        concurrently by at most `workers` threads (see `Ebuild.load_metadata()`).
+        """
+        index = cls()
+        index.update(cls.iter_repository_ebuilds(repositories), workers)
+        return index
+
+    @staticmethod
+    def iter_repository_ebuilds(repositories=None):
+        """Yield the paths of all the ebuilds of `repositories` (all the
+        configured repositories by default).
+        """
+        if repositories is None:
+            repositories = Repository.list()
+        for repository in repositories:
+            catalog = Catalog.for_location(repository['location'])
+            for category in catalog.list_categories():
+                for package in catalog.list_packages(category):
+                    for version in catalog.list_versions(category, package):
+                        yield catalog.get_ebuild_path(category, package, version)
+
+    @staticmethod
+    def _get_signature(path):
+        """Return the `(mtime, size)` signature of the file at `path`, or None
+        if it does not exist.
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    def _get_package_key(package):
+        """Return the `category/package` key of `package`, an atom, an ebuild
+        or a `category/package` string.
+        """
+        if isinstance(package, str):
+            return package
+        return '{}/{}'.format(package.category, package.package)
+
+    @classmethod
+    def get_dependencies(cls, variables):
+        """Return the set of `category/package` referenced by the dependency
+        variables of the ebuild `variables` dictionnary.
+        Raise `DependError` if a dependency string is not valid.
+        """
+        packages = set()
+        for var in cls.depend_vars:
+            for atom in DependGroup.parse(variables.get(var) or '').flatten():
+                if not atom.prefix:
+                    packages.add(cls._get_package_key(atom))
+        return packages
+
+    def update(self, ebuilds=None, workers=None):
+        """Index the ebuilds of `ebuilds`, an iterable of ebuild paths or
+        `Ebuild` objects, which are new or changed since they were indexed.
+        Ebuilds which file no longer exists are removed from the index.
+        If `ebuilds` is None, all the indexed ebuilds are checked.
+        Return the number of ebuilds which were (re)indexed.
+
+        `Ebuild` objects keep the variables they loaded: only pass objects
+        created after the ebuild file changed, or paths.
+        """
+        if ebuilds is None:
+            ebuilds = list(self._ebuilds)
+        stale = []
+        for ebuild in ebuilds:
+            path = str(ebuild.location if isinstance(ebuild, Ebuild) else ebuild)
+            signature = self._get_signature(path)
+            if signature is None:
+                self.remove(path)
+            elif path not in self._ebuilds or self._ebuilds[path][0] != signature:
+                if not isinstance(ebuild, Ebuild):
+                    ebuild = Ebuild(path)
+                stale.append((ebuild, path, signature))
+        errors = Ebuild.load_metadata([e for e, _, _ in stale], workers)
+        for ebuild, path, signature in stale:
+            self.remove(path)
+            if ebuild in errors:
+                self.errors[path] = str(errors[ebuild])
+                continue
+            try:
+                packages = self.get_dependencies(ebuild.vars)
+            except DependError as e:
+                self.errors[path] = str(e)
+            else:
+                self._add(path, signature, packages)
+        return len(stale)
+
+    def _add(self, path, signature, packages):
+        self._ebuilds[path] = (signature, frozenset(packages))
+        for package in packages:
+            self._index.setdefault(package, set()).add(path)
+
+    def remove(self, path):
+        """Remove the ebuild at `path` from the index."""
+        path = str(path)
+        self.errors.pop(path, None)
+        entry = self._ebuilds.pop(path, None)
+        if entry is None:
+            return
+        for package in entry[1]:
+            paths = self._index[package]
+            paths.discard(path)
+            if not paths:
+                del self._index[package]
+
+    def get_dependent_paths(self, package):
+        """Return the set of paths of the ebuilds depending on `package`, an
+        atom, an ebuild or a `category/package` string.
+        """
+        return frozenset(self._index.get(self._get_package_key(package), ()))
+
+    def list_dependents(self, package):
+        """Return the list of `Ebuild` objects depending on `package`. See
+        `get_dependent_paths()`.
+        """
+        return [Ebuild(p) for p in sorted(self.get_dependent_paths(package))]
+
+    def list_packages(self):
+        """Return the list of `category/package` which have dependents."""
+        return sorted(self._index)
+
+    def save(self, path):
+        """Write the index to the JSON file at `path`."""
+        data = {
+            'version': self.format_version,
+            'ebuilds': {
+                p: {'signature': list(s), 'packages': sorted(packages)}
+                for p, (s, packages) in self._ebuilds.items()
+            },
+        }
+        tmp_path = '{}.tmp'.format(path)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, str(path))
+
+    @classmethod
+    def load(cls, path):
+        """Return the index saved to the JSON file at `path`. Call `update()`
+        to take into account the ebuilds which changed since it was saved.
+        Raise `ValueError` if the file was not written by `save()`.
+        """
+        with Path(path).open(encoding='utf-8') as f:
+            data = json.load(f)
+        if not isinstance(data, dict) or data.get('version') != cls.format_version:
+            raise ValueError("Unsupported reverse dependency index: {}".format(path))
+        index = cls()
+        for p, entry in data['ebuilds'].items():
+            index._add(p, tuple(entry['signature']), entry['packages'])
+        return index
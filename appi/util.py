@@ -1,33 +1,323 @@
 # -*- coding: utf-8 -*-
 # Distributed under the terms of the GNU General Public License v2
+from contextlib import contextmanager
+from hashlib import md5
+import os
+import queue
 import re
+import shlex
 import subprocess
+import threading
+import time
+from uuid import uuid4
+
+from .base.exception import AppiError
 
 __all__ = [
-    'extract_bash_file_vars',
+    'BashError', 'BashWorker', 'BashWorkerPool', 'SignatureCache',
+    'extract_bash_file_vars', 'get_file_checksum', 'get_files_signature',
 ]
 
+_file_checksums = {}
 
-def extract_bash_file_vars(path, output_vars, context=None):
-    context = context or {}
-    proc = subprocess.Popen(
-        ['bash', '-c', 'source {} && set'.format(path)],
-        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=context)
 
+class BashError(AppiError):
+    """Error related to the execution of a bash process."""
+
+    default_code = 'died'
+
+    def __init__(self, message, path, **kwargs):
+        self.path = path
+        super().__init__(message, path=path, **kwargs)
+
+
+def _parse_bash_set_output(lines, output_vars):
+    """Return a dictionnary of `output_vars` values from the `lines` (bytes)
+    printed by the bash `set` builtin.
+    """
     raw_vars = {}
-    var_re = re.compile('^({})='.format('|'.join(output_vars)))
-    for line in proc.stdout:
-        if not var_re.search(line.decode('utf-8')):
+    var_re = re.compile('^({})='.format('|'.join(output_vars)).encode('utf-8'))
+    for line in lines:
+        if not var_re.search(line):
             continue
         key, _, value = line.partition(b'=')
         key = key.decode('ascii')
         raw_vars[key] = value
 
-    proc.communicate()
-
     cleaned_vars = {}
     for k, v in raw_vars.items():
         v = re.sub(rb'\n$', b'', v)
         v = re.sub(rb"^\$?'(.*)'$", rb'\1', v)
         cleaned_vars[k] = v.decode('unicode_escape')
     return cleaned_vars
+
+
+def extract_bash_file_vars(path, output_vars, context=None):
+    context = context or {}
+    proc = subprocess.Popen(
+        ['bash', '-c', 'source {} && set'.format(path)],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=context)
+    lines = proc.stdout.readlines()
+    proc.communicate()
+    return _parse_bash_set_output(lines, output_vars)
+
+
+class BashWorker:
+    """A long-lived bash process sourcing files on request.
+
+    The process is started once with the base `context` environment, and the
+    optional `preamble` file is sourced once. Each file is then sourced in a
+    subshell of the worker, so that the environment is reset between requests
+    without paying for the startup of a new bash process.
+
+    A worker handles one request at a time. It may be used as a context
+    manager to make sure the bash process is terminated.
+    """
+
+    name_re = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+    def __init__(self, context=None, preamble=None):
+        self.context = context or {}
+        self.preamble = preamble
+        self._proc = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def start(self):
+        """Start the bash process if it is not running."""
+        if self._proc and self._proc.poll() is None:
+            return
+        self._proc = subprocess.Popen(
+            ['bash'], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL, env=self.context)
+        if self.preamble:
+            self._send('source {} </dev/null >/dev/null\n'.format(
+                shlex.quote(str(self.preamble))))
+
+    def close(self):
+        """Terminate the bash process."""
+        if self._proc:
+            try:
+                self._proc.stdin.close()
+            except OSError:
+                pass
+            self._proc.wait()
+            self._proc.stdout.close()
+            self._proc = None
+
+    def _send(self, script):
+        self._proc.stdin.write(script.encode('utf-8'))
+        self._proc.stdin.flush()
+
+    def extract_vars(self, path, output_vars, context=None):
+        """Source the file at `path` with the additional environment
+        variables of `context` and return a dictionnary of `output_vars`
+        values, just like `extract_bash_file_vars()` does.
+        Raise `BashError` if the worker died while sourcing the file.
+        """
+        exports = ''.join(
+            'export {}={}\n'.format(k, shlex.quote(str(v)))
+            for k, v in (context or {}).items() if self.name_re.match(k)
+        )
+        marker = 'appi-{}'.format(uuid4().hex)
+        script = (
+            '(\n{exports}source {path} && set\n) </dev/null 2>/dev/null\n'
+            'echo\necho {marker}\n'
+        ).format(exports=exports, path=shlex.quote(str(path)), marker=marker)
+        with self._lock:
+            self.start()
+            try:
+                self._send(script)
+                lines = self._read_until(marker.encode('ascii'))
+            except OSError:
+                lines = None
+            if lines is None:
+                self.close()
+                raise BashError(
+                    "The bash worker died while sourcing {path}.", str(path))
+        return _parse_bash_set_output(lines, output_vars)
+
+    def _read_until(self, marker):
+        """Return the list of lines printed by the worker until `marker`.
+        Return None if the worker stopped before printing it.
+        """
+        lines = []
+        while True:
+            line = self._proc.stdout.readline()
+            if not line:
+                return None
+            if line.rstrip(b'\n') == marker:
+                return lines
+            lines.append(line)
+
+    def iter_extract_vars(self, requests, output_vars):
+        """Source the files of `requests`, an iterable of `(path, context)`
+        tuples, one after the other, and yield `(path, variables)` tuples.
+        """
+        for path, context in requests:
+            yield path, self.extract_vars(path, output_vars, context)
+
+
+class BashWorkerPool:
+    """A bounded pool of `BashWorker`s, which are only created when needed by
+    calling `factory`.
+
+    The pool exposes the same `extract_vars()` method as a single worker and
+    can be shared by several threads: each request is handled by an idle
+    worker, and at most `size` workers run at once.
+    """
+
+    def __init__(self, factory=BashWorker, size=1):
+        self.factory = factory
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._workers = []
+        self._lock = threading.Lock()
+        self._semaphore = threading.BoundedSemaphore(size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @contextmanager
+    def acquire(self):
+        """Context manager giving exclusive access to a worker of the pool."""
+        with self._semaphore:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                worker = self.factory()
+                with self._lock:
+                    self._workers.append(worker)
+            try:
+                yield worker
+            finally:
+                self._idle.put(worker)
+
+    def extract_vars(self, path, output_vars, context=None):
+        """See `BashWorker.extract_vars()`."""
+        with self.acquire() as worker:
+            return worker.extract_vars(path, output_vars, context)
+
+    def close(self):
+        """Terminate all the workers of the pool."""
+        with self._lock:
+            for worker in self._workers:
+                worker.close()
+
+
+def get_file_checksum(path):
+    """Return the md5 hexadecimal digest of the file at `path`, or None if it
+    does not exist. Digests are memoized as long as the file mtime and size
+    remain unchanged.
+    """
+    path = str(path)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = _file_checksums.get(path)
+    if cached and cached[0] == signature:
+        return cached[1]
+    with open(path, 'rb') as f:
+        checksum = md5(f.read()).hexdigest()
+    _file_checksums[path] = (signature, checksum)
+    return checksum
+
+
+def get_files_signature(paths):
+    """Return a tuple describing the state of the files at `paths`, made of
+    their path, mtime and size. Missing files are described with a None mtime
+    and size. Comparing signatures tells whether any of the files changed.
+    """
+    signature = []
+    for path in paths:
+        path = str(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            signature.append((path, None, None))
+        else:
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def list_tree_paths(path):
+    """Return the list of `path` and, if it is a directory, of the paths of
+    all the files and directories it contains, recursively. Entries of each
+    directory are sorted by name and follow it, which is the order portage
+    reads configuration directories in.
+    """
+    path = str(path)
+    paths = [path]
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            paths.extend(list_tree_paths(os.path.join(path, name)))
+    return paths
+
+
+class SignatureCache:
+    """Thread-safe store of values computed from files, each kept along with
+    the signature its files had when they were read, such as the one returned
+    by `get_files_signature()`. `get()` shares a value as long as the
+    signature of its files is unchanged.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        """Map keys to `[value, signature, checked]` lists, `checked` being
+        when the signature was last compared to the files.
+        """
+        self._lock = threading.Lock()
+        self._compute_lock = threading.RLock()
+
+    def get(self, key, compute, get_signature, check_interval=0):
+        """Return the value of `key`, computed by `compute(key)` if there is
+        none yet or if the files changed. `compute(key)` returns a
+        `(value, signature)` tuple, the signature being computed before the
+        files are read. `get_signature(key, value)` returns the current
+        signature of the files `value` was computed from. It is called at most
+        once every `check_interval` seconds for a given key.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                now = time.monotonic()
+                if now - entry[2] < check_interval:
+                    return entry[0]
+                entry[2] = now
+        if entry is not None and get_signature(key, entry[0]) == entry[1]:
+            return entry[0]
+        with self._compute_lock:
+            with self._lock:
+                current = self._entries.get(key)
+            # Another thread may have computed the value meanwhile.
+            if current is not None and current is not entry:
+                return current[0]
+            return self.set(key, *compute(key))
+
+    def set(self, key, value, signature):
+        """Store `value`, computed from files which had `signature`, as the
+        value of `key`, and return it.
+        """
+        with self._lock:
+            self._entries[key] = [value, signature, time.monotonic()]
+        return value
+
+    def discard(self, key):
+        """Drop the value of `key`, if any."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Drop all values."""
+        with self._lock:
+            self._entries.clear()
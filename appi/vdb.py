@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+# Distributed under the terms of the GNU General Public License v2
+from collections.abc import Mapping
+from fnmatch import fnmatchcase
+import os
+from pathlib import Path
+
+from .base import AppiObject, constant
+from .base.util.decorator import cached
+from .catalog import Catalog
+from .conf import Repository
+from .util import SignatureCache
+from .version import Version
+
+__all__ = [
+    'InstalledPackage', 'InstalledPackageSet',
+]
+
+
+class InstalledPackage(AppiObject, Mapping):
+    """A package of the database of installed packages (VDB).
+
+    Portage stores the metadata of each installed package (SLOT, IUSE, USE,
+    KEYWORDS, RDEPEND, repository...) as one file per key in the package
+    directory. An installed package is a read-only mapping of these keys to
+    the file contents, without the trailing newline. Files are only read the
+    first time their key is looked up.
+
+    Installed packages provide the attributes atom matchers rely on
+    (category, package, repo_name, slot...), so they can be matched against
+    atoms. See `BaseAtom.get_matcher()`.
+    """
+
+    __slots__ = (
+        'category', 'package', 'version', 'path', '_files',
+        '_cached_get_version',
+    )
+
+    def __init__(self, category, package, version, root=None):
+        """Create the installed package `category/package-version` of the
+        database at `root` (`constant.PACKAGE_DB_PATH` by default).
+        """
+        self.category = category
+        self.package = package
+        self.version = version
+        self.path = Path(root or constant.PACKAGE_DB_PATH) / category / (
+            '{}-{}'.format(package, version))
+        self._files = {}
+
+    @classmethod
+    def from_path(cls, path):
+        """Return the installed package which directory is at `path`.
+        Raise `ValueError` if `path` is not named as a package directory.
+        """
+        path = Path(path)
+        match = Catalog.pv_re.match(path.name)
+        if not match:
+            raise ValueError("{} is not an installed package.".format(path))
+        return cls(
+            path.parent.name, match.group('package'), match.group('version'),
+            path.parent.parent)
+
+    def __str__(self):
+        return '{}/{}-{}'.format(self.category, self.package, self.version)
+
+    # Mapping compares contents, which would read all the files.
+    def __hash__(self):
+        return hash(self.path)
+
+    def __eq__(self, other):
+        if not isinstance(other, InstalledPackage):
+            return NotImplemented
+        return self.path == other.path
+
+    def __ne__(self, other):
+        if not isinstance(other, InstalledPackage):
+            return NotImplemented
+        return self.path != other.path
+
+    def __getitem__(self, key):
+        if key not in self._files:
+            if '/' in key or key.startswith('.'):
+                raise KeyError(key)
+            try:
+                with (self.path / key).open(
+                        encoding='utf-8', errors='surrogateescape') as f:
+                    self._files[key] = f.read().rstrip('\n')
+            except (FileNotFoundError, NotADirectoryError, IsADirectoryError):
+                raise KeyError(key)
+        return self._files[key]
+
+    def __iter__(self):
+        with os.scandir(str(self.path)) as entries:
+            names = sorted(e.name for e in entries if e.is_file())
+        return iter(names)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def get_vars(self, keys):
+        """Return a dictionnary of the values of `keys`. Missing keys are
+        empty strings, like in the metadata cache.
+        """
+        return {k: self.get(k, '') for k in keys}
+
+    @cached
+    def get_version(self):
+        """Return the version as Version object."""
+        return Version.parse(self.version)
+
+    @property
+    def ebuild_path(self):
+        """The path of the ebuild saved in the package directory."""
+        return self.path / '{}-{}.ebuild'.format(self.package, self.version)
+
+    @property
+    def repo_name(self):
+        """The name of the repository the package was installed from."""
+        return self.get('repository', '').strip() or None
+
+    @property
+    def repository(self):
+        """The repository the package was installed from, or None if it is
+        not known.
+        """
+        if not self.repo_name:
+            return None
+        return Repository.get(self.repo_name)
+
+    @property
+    def slot(self):
+        """The slot of the package."""
+        return self.get('SLOT', '').partition('/')[0]
+
+    @property
+    def subslot(self):
+        """The subslot of the package if any. None otherwise."""
+        return self.get('SLOT', '').partition('/')[2] or None
+
+    @property
+    def use(self):
+        """The set of useflags the package was built with."""
+        return set(self.get('USE', '').split())
+
+
+class InstalledPackageSet(AppiObject):
+    """The set of packages of the database of installed packages (VDB),
+    indexed by category and package name.
+
+    The database is scanned once, when the set is created, using only
+    directory listings: package metadata is read from the package directories
+    when accessed. The set is a snapshot of the database: use `get_snapshot()`
+    to share a set which is scanned again when the database changes.
+    """
+
+    merging_prefix = '-MERGING-'
+    """Prefix of the directories of packages being merged."""
+
+    _snapshots = SignatureCache()
+    """Store the sets returned by `get_snapshot()` by root."""
+
+    def __init__(self, root=None):
+        """Scan the database at `root` (`constant.PACKAGE_DB_PATH` by
+        default).
+        """
+        self.root = Path(root or constant.PACKAGE_DB_PATH)
+        self.mtime = self._get_mtime(self.root)
+        self._versions = {}
+        """Map each `(category, package, version)` to the installed package."""
+        self._packages = {}
+        """Map each `(category, package)` to the list of installed packages."""
+        self._category_packages = {}
+        """Map each category to the set of names of its installed packages."""
+        self._categories = {}
+        """Map each package name to the set of categories it is installed in.
+        """
+        self._scan()
+
+    def __str__(self):
+        return str(self.root)
+
+    @classmethod
+    def get_snapshot(cls, root=None):
+        """Return the set of packages of the database at `root`
+        (`constant.PACKAGE_DB_PATH` by default), shared with previous calls as
+        long as the mtime of the database directory is unchanged. Portage
+        updates it whenever a package is merged or unmerged.
+        """
+        return cls._snapshots.get(
+            str(root or constant.PACKAGE_DB_PATH), cls._read_snapshot,
+            lambda root, snapshot: cls._get_mtime(root))
+
+    @classmethod
+    def _read_snapshot(cls, root):
+        snapshot = cls(root)
+        return snapshot, snapshot.mtime
+
+    @staticmethod
+    def _get_mtime(path):
+        try:
+            return os.stat(str(path)).st_mtime_ns
+        except OSError:
+            return None
+
+    def is_stale(self):
+        """Return True if the database changed since the set was created."""
+        return self._get_mtime(self.root) != self.mtime
+
+    @staticmethod
+    def _scandir(path):
+        """Return the list of subdirectories of `path` as `os.DirEntry`
+        objects, leaving out hidden ones. Return an empty list if `path`
+        cannot be read.
+        """
+        try:
+            with os.scandir(str(path)) as entries:
+                return [
+                    e for e in entries
+                    if not e.name.startswith('.') and e.is_dir()
+                ]
+        except OSError:
+            return []
+
+    def _scan(self):
+        for category in self._scandir(self.root):
+            for entry in self._scandir(category.path):
+                match = Catalog.pv_re.match(entry.name)
+                if not match or entry.name.startswith(self.merging_prefix):
+                    continue
+                package = InstalledPackage(
+                    category.name, match.group('package'),
+                    match.group('version'), self.root)
+                self._add(package)
+        for packages in self._packages.values():
+            packages.sort(key=lambda p: p.get_version())
+
+    def _add(self, package):
+        self._versions[(package.category, package.package, package.version)] = package
+        key = (package.category, package.package)
+        self._packages.setdefault(key, []).append(package)
+        self._category_packages.setdefault(package.category, set()).add(
+            package.package)
+        self._categories.setdefault(package.package, set()).add(
+            package.category)
+
+    def __iter__(self):
+        for key in sorted(self._packages):
+            yield from self._packages[key]
+
+    def __len__(self):
+        return sum(len(p) for p in self._packages.values())
+
+    def __contains__(self, package):
+        """Return True if the `category/package` string `package` is
+        installed.
+        """
+        category, _, name = package.partition('/')
+        return (category, name) in self._packages
+
+    def list_categories(self):
+        """Return the list of categories having installed packages."""
+        return sorted(self._category_packages)
+
+    def list_packages(self, category):
+        """Return the list of the names of the packages installed in
+        `category`.
+        """
+        return sorted(self._category_packages.get(category, ()))
+
+    def find_categories(self, package):
+        """Return the list of categories in which a package named `package`
+        is installed.
+        """
+        return sorted(self._categories.get(package, ()))
+
+    def find(self, category, package, version):
+        """Return the installed package `category/package-version`, or None
+        if it is not installed.
+        """
+        return self._versions.get((category, package, version))
+
+    def get(self, category, package):
+        """Return the list of installed versions of `category/package`, as
+        `InstalledPackage` objects, sorted by version.
+        """
+        return list(self._packages.get((category, package), ()))
+
+    def iter_ebuild_paths(self, package, category=None, version_pattern='*'):
+        """Yield the paths of the ebuilds of the installed versions of
+        `package`, in `category` if given or in any category otherwise, which
+        version matches the glob pattern `version_pattern`. See
+        `Catalog.iter_ebuild_paths()`.
+        """
+        categories = [category] if category else self.find_categories(package)
+        for category in categories:
+            for installed in self._packages.get((category, package), ()):
+                if fnmatchcase(installed.version, version_pattern):
+                    yield installed.ebuild_path
+
+    def match(self, atom):
+        """Return the list of installed packages matching `atom`."""
+        if atom.category:
+            categories = [atom.category]
+        else:
+            categories = self.find_categories(atom.package)
+        matcher = atom.get_matcher()
+        return [
+            p for c in categories for p in self._packages.get((c, atom.package), ())
+            if matcher.match(p)
+        ]
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+# Distributed under the terms of the GNU General Public License v2
+from .base import AppiObject
+from .version import Version
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+__all__ = [
+    'VersionArray',
+]
+
+
+class VersionArray(AppiObject):
+    """A sequence of versions packed into an integer NumPy array, to compare
+    all of them against a version, or sort them, in a single vectorized call.
+
+    Each version is encoded as a row of integers which lexicographic order is
+    the order of versions:
+
+        - two columns per base component: (n, 0) for a plain number n and
+          (0, digits) for a component with leading zeros, which digits are
+          right-padded with zeros so that they compare as decimal fractions,
+        - one column for the letter,
+        - two columns per suffix: its kind and its number,
+        - one column for the revision.
+
+    Missing base components and suffixes are padded with values lower than
+    any actual one, since a version with fewer components is lower.
+
+    NumPy is an optional dependency of appi: install `appi[numpy]` to use
+    this class.
+    """
+
+    max_fraction_digits = 18
+    """Maximum number of digits of components with leading zeros, so that they
+    fit in a 64-bit integer.
+    """
+    base_padding = (-1, -1)
+    suffix_padding = (-5, 0)
+
+    def __init__(self, versions):
+        """Create an array of `versions`, an iterable of `Version` objects or
+        version strings.
+        Raise `ImportError` if NumPy is not installed.
+        """
+        if numpy is None:
+            raise ImportError("VersionArray requires NumPy.")
+        self.versions = [
+            v if isinstance(v, Version) else Version.parse(v) for v in versions
+        ]
+        self._shape = (0, 0, 0)
+        self._data = None
+        self._fit(self.versions)
+
+    def __len__(self):
+        return len(self.versions)
+
+    def __getitem__(self, index):
+        return self.versions[index]
+
+    def __str__(self):
+        return ' '.join(str(v) for v in self.versions)
+
+    @staticmethod
+    def _get_components(version):
+        """Return the base components of `version` as a list of strings."""
+        return version.base.split('.')
+
+    @classmethod
+    def _get_shape(cls, versions):
+        """Return the number of base components, the number of digits of
+        components with leading zeros and the number of suffixes needed to
+        encode `versions`.
+        """
+        base_width = fraction_width = suffix_width = 0
+        for version in versions:
+            components = cls._get_components(version)
+            base_width = max(base_width, len(components))
+            for component in components[1:]:
+                if component[0] == '0':
+                    fraction_width = max(fraction_width, len(component))
+            suffix_width = max(suffix_width, len(version.get_suffix_tuple()))
+        if fraction_width > cls.max_fraction_digits:
+            raise ValueError(
+                "Version components with leading zeros can't have more than "
+                "{} digits.".format(cls.max_fraction_digits))
+        return base_width, fraction_width, suffix_width
+
+    def _fit(self, versions):
+        """Make sure the array is wide enough to encode `versions`, and
+        re-encode it if it is not.
+        """
+        shape = tuple(map(max, zip(self._shape, self._get_shape(versions))))
+        if shape != self._shape or self._data is None:
+            self._shape = shape
+            rows = [self._encode(v) for v in self.versions]
+            self._data = numpy.array(rows, dtype=numpy.int64).reshape(
+                len(rows), self._get_width())
+
+    def _get_width(self):
+        base_width, _, suffix_width = self._shape
+        return 2 * base_width + 1 + 2 * suffix_width + 1
+
+    def _encode(self, version):
+        """Return the row encoding `version` as a list of integers."""
+        base_width, fraction_width, suffix_width = self._shape
+        components = self._get_components(version)
+        row = [int(components[0]), 0]
+        for component in components[1:]:
+            if component[0] == '0':
+                row += [0, int(component.ljust(fraction_width, '0'))]
+            else:
+                row += [int(component), 0]
+        row += self.base_padding * (base_width - len(components))
+        row.append(version.get_letter_tuple())
+        suffixes = version.get_suffix_tuple()
+        for suffix in suffixes:
+            row += suffix
+        row += self.suffix_padding * (suffix_width - len(suffixes))
+        row.append(version.get_revision_tuple())
+        return row
+
+    def _encode_version(self, version):
+        if not isinstance(version, Version):
+            version = Version.parse(version)
+        self._fit([version])
+        return numpy.array(self._encode(version), dtype=numpy.int64)
+
+    def compare(self, version, ignore_revision=False):
+        """Return an array holding -1, 0 or 1 for each version of the array
+        which is respectively lower than, equal to or greater than `version`.
+        If `ignore_revision` is True, revisions are not taken into account.
+        """
+        row = self._encode_version(version)
+        data = self._data
+        if ignore_revision:
+            data, row = data[:, :-1], row[:-1]
+        signs = numpy.sign(data - row)
+        different = signs != 0
+        first = different.argmax(axis=1)
+        return signs[numpy.arange(len(signs)), first]
+
+    def match(self, selector, version):
+        """Return a boolean array telling which versions match `version` with
+        the atom `selector` (>=, <=, <, =, >, ~ or !=). The '=*' operator
+        (version starting with `version`, see `Version.startswith()`) is
+        available with the '^' selector, but is not vectorized.
+        """
+        if selector == '^':
+            if not isinstance(version, Version):
+                version = Version.parse(version)
+            return numpy.array(
+                [v.startswith(version) for v in self.versions], dtype=bool)
+        if selector == '~':
+            return self.compare(version, ignore_revision=True) == 0
+        signs = self.compare(version)
+        if selector == '>=':
+            return signs >= 0
+        if selector == '<=':
+            return signs <= 0
+        if selector == '=':
+            return signs == 0
+        if selector == '!=':
+            return signs != 0
+        if selector == '<':
+            return signs < 0
+        if selector == '>':
+            return signs > 0
+        raise ValueError("Unknown selector: {}".format(selector))
+
+    def filter(self, selector, version):
+        """Return the list of versions matching `version` with `selector`.
+        See `match()`.
+        """
+        mask = self.match(selector, version)
+        return [v for v, m in zip(self.versions, mask) if m]
+
+    def argsort(self):
+        """Return the array of indices sorting the versions. The sort is
+        stable: equal versions remain in their original order.
+        """
+        if not len(self.versions):
+            return numpy.array([], dtype=numpy.intp)
+        return numpy.lexsort(self._data.T[::-1])
+
+    def sorted(self):
+        """Return the list of versions, sorted."""
+        return [self.versions[i] for i in self.argsort()]
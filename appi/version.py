@@ -1,12 +1,15 @@
 # -*- coding: utf-8 -*-
 # Distributed under the terms of the GNU General Public License v2
+from bisect import bisect_left, bisect_right
 import re
 
-from .base import AppiObject
+from .base import AppiObject, ImmutableMixin
 from .base.exception import PortageError
+from .base.util.cache import LRUCache
+from .base.util.decorator import cached
 
 __all__ = [
-    'Version', 'VersionError',
+    'Version', 'VersionError', 'VersionRange',
 ]
 
 
@@ -20,7 +23,7 @@ class VersionError(PortageError):
         super().__init__(message, version=version, **kwargs)
 
 
-class Version(AppiObject):
+class Version(ImmutableMixin, AppiObject):
     """A package version characterized by the following properties:
 
         - base: 1.2.3
@@ -29,8 +32,16 @@ class Version(AppiObject):
         - revision: 6
 
     The example numbers above match the version: 1.2.3d_rc5-r6
+
+    Versions are immutable. Use `Version.parse()` to share instances of
+    frequently parsed versions.
     """
 
+    __slots__ = (
+        'base', 'letter', 'suffix', 'revision', '_cached_sort_key',
+        '_cached_get_prefix_range',
+    )
+
     version_re = re.compile(
         r'^(?P<base>\d+(\.\d+)*)(?P<letter>[a-z]?)'
         r'(?P<suffix>(_(alpha|beta|pre|rc|p)\d*)*)?(-r(?P<revision>\d+))?$'
@@ -38,6 +49,9 @@ class Version(AppiObject):
     suffix_re = re.compile(r'^(?P<name>[a-z]+)(?P<value>\d*)$')
     suffix_values = {'alpha': -4, 'beta': -3, 'pre': -2, 'rc': -1, 'p': 0}
 
+    intern_cache = LRUCache(4096)
+    """Versions created by `Version.parse()`."""
+
     selector_to_comp_method = {
         '>=': '__ge__',
         '<=': '__le__',
@@ -77,6 +91,16 @@ class Version(AppiObject):
 
         for k, v in match.groupdict().items():
             setattr(self, k, v)
+        self.freeze()
+
+    @classmethod
+    def parse(cls, version_string):
+        """Return a version object for `version_string`, shared with previous
+        calls for the same string as long as it remains in `intern_cache`.
+        Raise `VersionError` if the version string is not valid.
+        """
+        return cls.intern_cache.get(
+            (cls, version_string), lambda: cls(version_string))
 
     def __str__(self):
         return '{base}{letter}{suffix}{revision}'.format(
@@ -84,22 +108,45 @@ class Version(AppiObject):
             revision=('-r' + self.revision if self.revision else ''))
 
     def __gt__(self, other):
-        return self.compare(other) > 0
+        if not isinstance(other, Version):
+            return NotImplemented
+        return self.sort_key() > other.sort_key()
 
     def __lt__(self, other):
-        return self.compare(other) < 0
+        if not isinstance(other, Version):
+            return NotImplemented
+        return self.sort_key() < other.sort_key()
 
     def __ge__(self, other):
-        return self.compare(other) >= 0
+        if not isinstance(other, Version):
+            return NotImplemented
+        return self.sort_key() >= other.sort_key()
 
     def __le__(self, other):
-        return self.compare(other) <= 0
+        if not isinstance(other, Version):
+            return NotImplemented
+        return self.sort_key() <= other.sort_key()
 
     def __eq__(self, other):
-        return self.compare(other) == 0
+        if not isinstance(other, Version):
+            return NotImplemented
+        return self.sort_key() == other.sort_key()
 
     def __ne__(self, other):
-        return self.compare(other) != 0
+        if not isinstance(other, Version):
+            return NotImplemented
+        return self.sort_key() != other.sort_key()
+
+    def __hash__(self):
+        return hash(self.sort_key())
+
+    @cached
+    def sort_key(self):
+        """Return a key ordering versions with native comparisons, which may
+        be passed to `sorted()`: `sorted(versions, key=Version.sort_key)`.
+        The key is computed once.
+        """
+        return self.get_version_tuple()
 
     def get_version_tuple(self):
         """Return the version number as a tuple.
@@ -140,24 +187,276 @@ class Version(AppiObject):
         return int(self.revision) if self.revision else 0
 
     def compare(self, other):
-        self_tuple = self.get_version_tuple()
-        other_tuple = other.get_version_tuple()
-        return self.version_tuple_compare(self_tuple, other_tuple)
+        """Return a negative integer if this version is lower than `other`,
+        zero if they are equal and a positive integer otherwise.
+        """
+        self_key, other_key = self.sort_key(), other.sort_key()
+        return (self_key > other_key) - (self_key < other_key)
 
     def startswith(self, version):
-        """Return True if this version starts with the given other version.
+        """Return True if this version starts with the given other version,
+        which components are compared whole: 1.2.5 and 1.2_rc1 start with 1.2,
+        but 1.20 does not. This is how the '*' postfix of atoms matches
+        versions, see `VersionRange.from_prefix()`.
         May raise VersionError if `version` is not a valid version.
         """
         if not isinstance(version, Version):
             # Make sure that 'version' is valid, otherwise this method would
             # return unexpected results.
-            version = Version(version)
-        v1, v2 = str(self), str(version)
-        return v1.startswith(v2) and (
-            len(v1) == len(v2) or v1[len(v2):][0] not in '123456789')
+            version = Version.parse(version)
+        return self in version.get_prefix_range()
+
+    @cached
+    def get_prefix_range(self):
+        """Return the `VersionRange` of the versions starting with this
+        version, see `startswith()`. The range is computed once.
+        """
+        return VersionRange.from_prefix(self)
 
     def get_upstream_version(self):
         """Return the version without the ebuild's revision part."""
-        return Version('{base}{letter}{suffix}'.format(
+        return Version.parse('{base}{letter}{suffix}'.format(
             base=self.base, letter=self.letter or '',
             suffix=self.suffix or ''))
+
+
+class _Bound:
+    """A sentinel lower (or greater) than any other object, used to bound
+    version sort keys.
+    """
+
+    __slots__ = ('name', 'sign')
+
+    def __init__(self, name, sign):
+        self.name = name
+        self.sign = sign
+
+    def __repr__(self):
+        return self.name
+
+    def __eq__(self, other):
+        return self is other
+
+    def __ne__(self, other):
+        return self is not other
+
+    def __hash__(self):
+        return hash(self.name)
+
+    def __lt__(self, other):
+        return self.sign < 0 and self is not other
+
+    def __le__(self, other):
+        return self.sign < 0 or self is other
+
+    def __gt__(self, other):
+        return self.sign > 0 and self is not other
+
+    def __ge__(self, other):
+        return self.sign > 0 or self is other
+
+
+class VersionRange(AppiObject):
+    """A set of versions described as a union of intervals over version sort
+    keys (see `Version.sort_key()`). Ranges are immutable and support
+    intersection (&), union (|) and emptiness (bool) tests, as well as
+    binary search of the matching versions in a sorted list of versions.
+
+    Each interval is a `(lower, lower_inclusive, upper, upper_inclusive)`
+    tuple, where bounds are sort keys, or prefixes of sort keys.
+    """
+
+    __slots__ = ('intervals',)
+
+    MIN = _Bound('MIN', -1)
+    """Bound lower than any sort key."""
+    MAX = _Bound('MAX', 1)
+    """Bound greater than any sort key."""
+
+    def __init__(self, intervals=()):
+        self.intervals = self._normalize(intervals)
+
+    @classmethod
+    def all(cls):
+        """Return the range of all versions."""
+        return cls([(cls.MIN, True, cls.MAX, True)])
+
+    @classmethod
+    def from_selector(cls, selector, version, postfix=None):
+        """Return the range of versions matching `version` with the atom
+        `selector` (>=, <=, <, =, >, ~) and `postfix` (*). See `from_prefix()`
+        for the semantics of the '*' postfix.
+        """
+        if not isinstance(version, Version):
+            version = Version.parse(version)
+        key = version.sort_key()
+        if postfix == '*':
+            return cls.from_prefix(version)
+        if selector == '~':
+            return cls([(key[:3] + (0,), True, key[:3] + (cls.MAX,), False)])
+        intervals = {
+            '>=': (key, True, cls.MAX, True),
+            '>': (key, False, cls.MAX, True),
+            '<=': (cls.MIN, True, key, True),
+            '<': (cls.MIN, True, key, False),
+            '=': (key, True, key, True),
+        }
+        if selector not in intervals:
+            raise ValueError("Unknown selector: {}".format(selector))
+        return cls([intervals[selector]])
+
+    @classmethod
+    def from_prefix(cls, version):
+        """Return the range of versions which components start with those of
+        `version`, that is, of versions matching the atom "=version*".
+
+        As in portage (bug 560466), components are only matched whole:
+        '=1.2*' matches 1.2, 1.2.5, 1.2b and 1.2_rc1 but neither 1.20 nor
+        1.25, and '=1.2_p*' matches 1.2_p3 but not 1.2_pre1. A trailing
+        suffix without number matches any number: '=1.2_rc*' matches 1.2_rc1.
+        Versions which compare equal, such as 1.0 and 1.00, match the same
+        prefixes.
+        """
+        if not isinstance(version, Version):
+            version = Version.parse(version)
+        key = version.sort_key()
+        if version.revision:
+            return cls([(key, True, key + (cls.MAX,), False)])
+        if version.suffix and not version.suffix[-1].isdigit():
+            # A suffix without number matches any number: '=1.2_rc*' matches
+            # 1.2_rc and 1.2_rc3. Numbers start at 0, which keeps versions
+            # without suffix, which kind is 0 too, out of '=1.2_p*'.
+            kind = key[2][-1][0]
+            return cls([(
+                key[:2] + (key[2][:-1] + ((kind, 0),),), True,
+                key[:2] + (key[2][:-1] + ((kind, cls.MAX),),), False,
+            )])
+        if version.suffix:
+            prefix, last = key[:2], key[2]
+        elif version.letter:
+            return cls([(key[:2], True, key[:2] + (cls.MAX,), False)])
+        else:
+            prefix, last = (), key[0]
+        lower = prefix + (last,)
+        upper = prefix + (last + (cls.MAX,),)
+        return cls([(lower, True, upper, False)])
+
+    @classmethod
+    def _is_empty(cls, interval):
+        lower, lower_inclusive, upper, upper_inclusive = interval
+        if lower == upper:
+            return not (lower_inclusive and upper_inclusive)
+        return upper < lower
+
+    @classmethod
+    def _normalize(cls, intervals):
+        """Return the sorted tuple of non-empty `intervals`, where
+        overlapping intervals are merged.
+        """
+        intervals = sorted(
+            (i for i in intervals if not cls._is_empty(i)),
+            key=lambda i: (i[0], not i[1]))
+        merged = []
+        for interval in intervals:
+            if merged:
+                _, _, upper, upper_inclusive = merged[-1]
+                lower, lower_inclusive = interval[:2]
+                if lower < upper or (lower == upper and (
+                        upper_inclusive or lower_inclusive)):
+                    if interval[2] > upper or (
+                            interval[2] == upper and interval[3]):
+                        merged[-1] = merged[-1][:2] + interval[2:]
+                    continue
+            merged.append(tuple(interval))
+        return tuple(merged)
+
+    def __str__(self):
+        return ' | '.join(
+            '{}{!r}, {!r}{}'.format('[' if i[1] else '(', i[0], i[2],
+                                    ']' if i[3] else ')')
+            for i in self.intervals) or 'empty'
+
+    def __eq__(self, other):
+        if not isinstance(other, VersionRange):
+            return NotImplemented
+        return self.intervals == other.intervals
+
+    def __ne__(self, other):
+        if not isinstance(other, VersionRange):
+            return NotImplemented
+        return self.intervals != other.intervals
+
+    def __hash__(self):
+        return hash(self.intervals)
+
+    def __bool__(self):
+        return bool(self.intervals)
+
+    def is_empty(self):
+        """Return True if no version can belong to this range."""
+        return not self.intervals
+
+    def __or__(self, other):
+        return VersionRange(self.intervals + other.intervals)
+
+    def __and__(self, other):
+        intervals = []
+        for a in self.intervals:
+            for b in other.intervals:
+                lower = max(a[:2], b[:2], key=lambda x: (x[0], not x[1]))
+                upper = min(a[2:], b[2:], key=lambda x: (x[0], x[1]))
+                intervals.append(lower + upper)
+        return VersionRange(intervals)
+
+    def union(self, *others):
+        """Return the union of this range with `others`."""
+        intervals = self.intervals
+        for other in others:
+            intervals += other.intervals
+        return VersionRange(intervals)
+
+    def intersection(self, *others):
+        """Return the intersection of this range with `others`."""
+        result = self
+        for other in others:
+            result = result & other
+        return result
+
+    def __contains__(self, version):
+        if not isinstance(version, Version):
+            version = Version.parse(version)
+        key = version.sort_key()
+        for lower, lower_inclusive, upper, upper_inclusive in self.intervals:
+            if (lower < key or lower_inclusive and lower == key) and (
+                    key < upper or upper_inclusive and key == upper):
+                return True
+        return False
+
+    def bisect(self, keys):
+        """Return the list of `(start, end)` slices of the sorted list of sort
+        keys `keys` holding the keys of the versions of this range.
+        """
+        slices = []
+        for lower, lower_inclusive, upper, upper_inclusive in self.intervals:
+            if lower_inclusive:
+                start = bisect_left(keys, lower)
+            else:
+                start = bisect_right(keys, lower)
+            if upper_inclusive:
+                end = bisect_right(keys, upper, start)
+            else:
+                end = bisect_left(keys, upper, start)
+            if start < end:
+                slices.append((start, end))
+        return slices
+
+    def select(self, versions, keys=None):
+        """Return the list of versions of this range from the list `versions`,
+        which must be sorted. `keys`, the list of their sort keys, may be
+        passed to avoid computing it each time.
+        """
+        if keys is None:
+            keys = [v.sort_key() for v in versions]
+        return [
+            v for start, end in self.bisect(keys) for v in versions[start:end]
+        ]
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+# Distributed under the terms of the GNU General Public License v2
+"""Compare the speed of the atom tokenizer with the reference regex, and
+measure the creation of atom objects.
+
+Usage: python bench/atoms.py [count]
+"""
+from pathlib import Path
+import sys
+import timeit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from appi.atom import DependAtom, QueryAtom  # noqa: E402
+
+atom_strings = {
+    DependAtom: [
+        'dev-lang/python', '>=dev-libs/openssl-1.1.1g:0=[-bindist]',
+        '!!<sys-apps/portage-2.3.99-r2', 'dev-python/foo-bar-baz',
+        '~sys-kernel/gentoo-sources-5.10.27', '=media-libs/mesa-21*[wayland,vulkan?]',
+        'x11-libs/gtk+:3[introspection?]', 'dev-lang/perl:=',
+        '>=dev-python/sphinx-autodoc-typehints-1.12.0[doc]',
+    ],
+    QueryAtom: [
+        'dev-lang/python', '>=dev-libs/openssl-1.1.1g:0::gentoo',
+        '<sys-apps/portage-2.3.99-r2', 'dev-python/foo-bar-baz',
+        '~sys-kernel/gentoo-sources-5.10.27', '=media-libs/mesa-21*',
+        'x11-libs/gtk+:3', 'dev-lang/perl::gentoo',
+        '=app-emacs/emacs-common-gentoo-1.7-r1',
+    ],
+}
+
+
+def main(count=5000):
+    for atom_class, strings in atom_strings.items():
+        parsers = [
+            ('_parse_with_regex', atom_class._parse_with_regex),
+            ('_parse', atom_class._parse),
+            ('__init__', atom_class),
+        ]
+        for name, parse in parsers:
+            seconds = min(timeit.repeat(
+                lambda: [parse(s) for s in strings], number=count, repeat=5))
+            print('{:<12} {:<18} {:>8.2f} us per atom'.format(
+                atom_class.__name__, name,
+                seconds * 1e6 / count / len(strings)))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
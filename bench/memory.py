@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+# Distributed under the terms of the GNU General Public License v2
+"""Measure the memory held by Version, atom and Ebuild objects.
+
+Usage: python bench/memory.py [count]
+"""
+from pathlib import Path
+import sys
+import tracemalloc
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from appi.atom import DependAtom, QueryAtom  # noqa: E402
+from appi.ebuild import Ebuild  # noqa: E402
+from appi.version import Version  # noqa: E402
+
+
+def measure(factory, count):
+    """Return the average number of bytes held by each of `count` objects
+    created by `factory(i)`. The objects are kept alive while measuring.
+    """
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    objects = [factory(i) for i in range(count)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(s.size_diff for s in after.compare_to(before, 'filename'))
+    del objects
+    return size / count
+
+
+def main(count=10000):
+    benchmarks = [
+        ('Version', lambda i: Version('1.{}.3_rc2-r1'.format(i))),
+        ('DependAtom', lambda i: DependAtom(
+            '>=dev-libs/foo{}-1.2:0=[ssl]'.format(i))),
+        ('QueryAtom', lambda i: QueryAtom(
+            '=dev-libs/foo{}-1.2*::gentoo'.format(i))),
+        ('Ebuild', lambda i: Ebuild(
+            '/var/db/repos/gentoo/dev-libs/foo{0}/foo{0}-1.2.ebuild'.format(i))),
+    ]
+    for name, factory in benchmarks:
+        print('{:<12} {:>8.0f} bytes per object'.format(
+            name, measure(factory, count)))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
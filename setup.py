@@ -18,6 +18,9 @@ setup(
     version=VERSION,
     packages=find_packages(exclude=['test']),
     include_package_data=True,
+    extras_require={
+        'numpy': ['numpy'],
+    },
     license='GPL-2',
     description="Another Portage Python Interface",
     long_description=README,
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+# Distributed under the terms of the GNU General Public License v2
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+
+class TemporaryDirectoryTestCase(TestCase):
+    """Setup a temporary directory, `location`, removed after each test."""
+
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.location = Path(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, path, content=''):
+        """Write `content` to the file at `path`, relative to `location`,
+        creating its parent directories. Return the path of the file.
+        """
+        path = self.location / path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open('w', encoding='utf-8') as f:
+            f.write(content)
+        return path
@@ -1,9 +1,17 @@
 # -*- coding: utf-8 -*-
 # Distributed under the terms of the GNU General Public License v2
 from unittest import TestCase
+from unittest.mock import patch
 
 from appi.atom import DependAtom, QueryAtom, AtomError
-from appi.version import Version
+from appi.base import constant
+from appi.catalog import Catalog
+from appi.conf import Repository
+from appi.ebuild import Ebuild
+from appi.version import Version, VersionRange
+
+from .test_catalog import CatalogTestCase
+from .test_ebuild import SourcingTestCase
 
 
 class TestAtomValidityMetaclass(type(TestCase)):
@@ -211,16 +219,151 @@ class TestGetGlobPattern(TestCase, metaclass=TestGetGlobPatternMetaclass):
     ]
 
 
-class TestListMatchingEbuilds(TestCase):
-    """Need to setup a temporary portage directory for these tests"""
+class TestListMatchingEbuilds(CatalogTestCase):
+
+    def setUp(self):
+        super().setUp()
+        Catalog.invalidate()
+        patchers = [
+            patch.object(Repository, 'list_locations', return_value=[self.repository]),
+            patch.object(constant, 'PACKAGE_DB_PATH', str(self.location / 'pkg')),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(Catalog.invalidate)
+
+    def list_matching_ebuilds(self, atom):
+        return sorted(str(e.location) for e in DependAtom(atom, False).list_matching_ebuilds())
+
+    def test_list_matching_ebuilds(self):
+        self.assertEqual(self.list_matching_ebuilds('foo'), [
+            str(self.repository / 'app-misc/foo/foo-1.0.ebuild'),
+            str(self.repository / 'app-misc/foo/foo-1.1-r1.ebuild'),
+            str(self.repository / 'dev-libs/foo/foo-2.0_rc1.ebuild'),
+        ])
+        self.assertEqual(self.list_matching_ebuilds('>=app-misc/foo-1.1'), [
+            str(self.repository / 'app-misc/foo/foo-1.1-r1.ebuild'),
+        ])
+        self.assertEqual(self.list_matching_ebuilds('~foo-1.1'), [
+            str(self.repository / 'app-misc/foo/foo-1.1-r1.ebuild'),
+        ])
+        self.assertEqual(self.list_matching_ebuilds('=foo-2*'), [
+            str(self.repository / 'dev-libs/foo/foo-2.0_rc1.ebuild'),
+        ])
+        self.assertEqual(self.list_matching_ebuilds('sys-apps/foo'), [])
+
+    def test_list_matching_ebuilds_is_up_to_date(self):
+        atom = DependAtom.parse('app-misc/foo')
+        self.assertEqual(len(atom.list_matching_ebuilds()), 2)
+        self.write(self.repository / 'app-misc/foo/foo-2.0.ebuild')
+        self.assertIs(DependAtom.parse('app-misc/foo'), atom)
+        self.assertEqual(len(atom.list_matching_ebuilds()), 3)
+
+    def test_iter_matching_ebuilds_is_lazy(self):
+        atom = DependAtom('foo', False)
+        with patch('appi.atom.Ebuild', wraps=Ebuild) as ebuild_class:
+            ebuild = next(atom.iter_matching_ebuilds())
+        self.assertEqual(ebuild.location, self.repository / 'app-misc/foo/foo-1.0.ebuild')
+        self.assertEqual(ebuild_class.call_count, 1)
+
+    def test_iter_matching_ebuilds_scope(self):
+        atom = QueryAtom('app-misc/foo')
+        self.assertEqual(len(list(atom.iter_matching_ebuilds(installed=False))), 2)
+        self.assertEqual(list(atom.iter_matching_ebuilds(tree=False)), [])
+        with patch.object(Repository, 'get', return_value=None):
+            self.assertEqual(list(atom.iter_matching_ebuilds(repository='gentoo')), [])
+        with patch.object(Repository, 'get', return_value={'location': self.repository}):
+            self.assertEqual(len(list(atom.iter_matching_ebuilds(repository='gentoo'))), 2)
+            atom = QueryAtom('app-misc/foo::gentoo')
+            self.assertEqual(len(list(atom.iter_matching_ebuilds())), 0)
+            self.assertEqual(list(atom.iter_matching_ebuilds(repository='sapher')), [])
+
+    def test_matches_existing_ebuild(self):
+        self.assertTrue(DependAtom('<app-misc/foo-2').matches_existing_ebuild())
+        self.assertFalse(DependAtom('>app-misc/foo-2').matches_existing_ebuild())
+
+
+class TestGetMatcher(TestCase):
+
+    ebuilds = [
+        '/repo/cat/pkg/pkg-1.0.ebuild',
+        '/repo/cat/pkg/pkg-1.0-r1.ebuild',
+        '/repo/cat/pkg/pkg-1.01.ebuild',
+        '/repo/cat/pkg/pkg-1.1.ebuild',
+        '/repo/cat/pkg/pkg-10.ebuild',
+        '/repo/other/pkg/pkg-1.0.ebuild',
+        '/repo/cat/other/other-1.0.ebuild',
+    ]
+
+    def filter(self, atom):
+        matcher = DependAtom(atom, False).get_matcher()
+        return [str(e.location) for e in matcher.filter(Ebuild(p) for p in self.ebuilds)]
+
+    def test_matcher_is_cached(self):
+        atom = DependAtom('cat/pkg')
+        self.assertIs(atom.get_matcher(), atom.get_matcher())
+
+    def test_filter(self):
+        self.assertEqual(self.filter('pkg'), self.ebuilds[:6])
+        self.assertEqual(self.filter('cat/pkg'), self.ebuilds[:5])
+        self.assertEqual(self.filter('>cat/pkg-1.0'), self.ebuilds[1:5])
+        self.assertEqual(self.filter('~cat/pkg-1.0'), self.ebuilds[:2])
+        self.assertEqual(self.filter('=cat/pkg-1.0*'), self.ebuilds[:2])
+        self.assertEqual(self.filter('=cat/pkg-1.0'), self.ebuilds[:1])
+        self.assertEqual(self.filter('<pkg-1.0'), [])
+
+    def test_slot(self):
+        ebuild = Ebuild(self.ebuilds[0])
+        ebuild._vars = {'SLOT': '2/2.1'}
+        for atom, expected in [('cat/pkg:2', True), ('cat/pkg:2/2.1=', True),
+                               ('cat/pkg:2/2.0', False), ('cat/pkg:1', False)]:
+            self.assertEqual(DependAtom(atom).get_matcher().match(ebuild), expected)
+
+    def test_repository_is_matched_by_name(self):
+        gentoo = Repository('gentoo', {'location': '/repo'})
+        with patch.object(Repository, 'find_by_path', return_value=gentoo):
+            ebuilds = [Ebuild(p) for p in self.ebuilds]
+        with patch.object(Repository, 'get') as get:
+            matcher = QueryAtom('cat/pkg::gentoo').get_matcher()
+            self.assertEqual(len(matcher.filter(ebuilds)), 5)
+            self.assertEqual(QueryAtom('cat/pkg::sapher').get_matcher().filter(ebuilds), [])
+        get.assert_not_called()
 
 
 class TestMatchesExistingEbuild(TestCase):
     """Need to setup a temporary portage directory for these tests"""
 
 
-class TestListPossibleUseflags(TestCase):
-    """Need to setup a temporary portage directory for these tests"""
+class TestListPossibleUseflags(SourcingTestCase):
+
+    ebuilds = {
+        'app-misc/foo/foo-1.0.ebuild': 'SLOT="0"\nIUSE="doc +ssl"\n',
+        'app-misc/foo/foo-2.0.ebuild': 'SLOT="0"\nIUSE="-doc ${PN}"\n',
+        'dev-libs/foo/foo-1.0.ebuild': 'SLOT="0"\nIUSE="static-libs"\n',
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.repository = self.location / 'repo'
+        for path, content in self.ebuilds.items():
+            self.write(self.repository / path, content)
+        Catalog.invalidate()
+        for p in [
+            patch.object(Repository, 'list_locations', return_value=[self.repository]),
+            patch.object(constant, 'PACKAGE_DB_PATH', str(self.location / 'pkg')),
+        ]:
+            p.start()
+            self.patches.append(p)
+        self.addCleanup(Catalog.invalidate)
+
+    def test_list_possible_useflags(self):
+        self.assertEqual(
+            DependAtom('app-misc/foo').list_possible_useflags(), {'doc', 'ssl', 'foo'})
+        self.assertEqual(DependAtom('<app-misc/foo-2').list_possible_useflags(), {'doc', 'ssl'})
+        self.assertEqual(
+            DependAtom('foo', False).list_possible_useflags(),
+            {'doc', 'ssl', 'foo', 'static-libs'})
 
 
 class TestIsInstalled(TestCase):
@@ -273,3 +416,120 @@ class TestQueryAtomValidity(TestCase, metaclass=TestQueryAtomValidityMetaclass):
 
 class TestGetRepository(TestCase):
     """Need to setup a temporary portage configuration directory for these tests"""
+
+
+class TestParse(TestCase):
+
+    def test_instances_are_shared(self):
+        self.assertIs(DependAtom.parse('dev-lang/python'), DependAtom.parse('dev-lang/python'))
+        self.assertIsNot(DependAtom.parse('dev-lang/python'), QueryAtom.parse('dev-lang/python'))
+        self.assertIsNot(
+            QueryAtom.parse('dev-lang/python', False), QueryAtom.parse('dev-lang/python'))
+
+    def test_invalid_atom(self):
+        with self.assertRaises(AtomError):
+            QueryAtom.parse('python')
+
+    def test_equality(self):
+        atom = DependAtom('>=dev-lang/python-3.6:3.6[ssl]')
+        self.assertEqual(atom, DependAtom('>=dev-lang/python-3.6:3.6[ssl]'))
+        self.assertEqual(hash(atom), hash(DependAtom('>=dev-lang/python-3.6:3.6[ssl]')))
+        self.assertNotEqual(atom, DependAtom('>=dev-lang/python-3.6:3.6[-ssl]'))
+        self.assertNotEqual(DependAtom('dev-lang/python'), QueryAtom('dev-lang/python'))
+        self.assertNotEqual(DependAtom('dev-lang/python'), 'dev-lang/python')
+
+    def test_trailing_newline(self):
+        # Unlike the reference regex, which '$' matches before a trailing
+        # newline, the tokenizer rejects it.
+        for atom_class in (DependAtom, QueryAtom):
+            with self.assertRaises(AtomError):
+                atom_class('dev-lang/python-3.6\n')
+
+    def test_immutable(self):
+        atom = QueryAtom.parse('=dev-lang/python-3.6*')
+        with self.assertRaises(AttributeError):
+            atom.version = '3.7'
+        atom.get_matcher()
+
+
+class TestGetVersionRange(TestCase):
+
+    versions = [
+        '1', '1.0', '1.0-r1', '1.0-r10', '1.0_rc1', '1.0_rc10', '1.0_p1', '1.0_pre1', '1.01',
+        '1.05', '1.0.5', '1.0a', '1.1', '1.2', '1.20', '1.2.5', '1.2_rc1', '10', '12', '1999',
+        '2', '2.0_beta3',
+    ]
+
+    @staticmethod
+    def portage_startswith(version, prefix):
+        # The rule of portage: a string prefix ending on a component boundary.
+        if not version.startswith(prefix):
+            return False
+        following = version[len(prefix):len(prefix) + 1]
+        return (not following or following in '._-'
+                or following.isdigit() != prefix[-1].isdigit())
+
+    def test_get_version_range(self):
+        self.assertEqual(DependAtom('dev-lang/python').get_version_range(), VersionRange.all())
+        self.assertIn(Version('3.6.3'), DependAtom('=dev-lang/python-3.6*').get_version_range())
+        self.assertNotIn(Version('3.60'), DependAtom('=dev-lang/python-3.6*').get_version_range())
+        self.assertEqual(
+            DependAtom('~dev-lang/python-3.6.3').get_version_range(),
+            VersionRange.from_selector('~', '3.6.3'))
+
+    def test_prefix_same_as_matcher(self):
+        ebuilds = [Ebuild('/repo/cat/pkg/pkg-{}.ebuild'.format(v)) for v in self.versions]
+        for prefix in ['1', '1.0', '1.0-r1', '1.0_rc1', '1.0_p', '1.0a', '1.2', '2.0_beta']:
+            with self.subTest(prefix=prefix):
+                atom = DependAtom('=cat/pkg-{}*'.format(prefix))
+                expected = [v for v in self.versions if self.portage_startswith(v, prefix)]
+                version_range = atom.get_version_range()
+                self.assertEqual(
+                    [v for v in self.versions if Version(v) in version_range], expected)
+                self.assertEqual(
+                    [e.version for e in atom.get_matcher().filter(ebuilds)], expected)
+                self.assertEqual(
+                    [v for v in self.versions if Version(v).startswith(prefix)], expected)
+
+
+class TestParseFieldsMetaclass(type(TestCase)):
+
+    @staticmethod
+    def test_func_wrapper(atom_class, s):
+        def test_func(self):
+            self.assertEqual(atom_class._parse(s), atom_class._parse_with_regex(s))
+        return test_func
+
+    def __new__(mcs, name, bases, attrs):
+        for atom_class in (DependAtom, QueryAtom):
+            for i, s in enumerate(attrs['atom_strings']):
+                func_name = 'test_{}_{}'.format(atom_class.__name__, i)
+                test_func = mcs.test_func_wrapper(atom_class, s)
+                test_func.__name__ = func_name
+                attrs[func_name] = test_func
+        return super().__new__(mcs, name, bases, attrs)
+
+
+class TestParseFields(TestCase, metaclass=TestParseFieldsMetaclass):
+    """Compare the fields found by the tokenizer with the reference regex."""
+
+    atom_strings = [
+        '', 'package', 'dev-lang/python', '~dev-python/ipython-5.4.0', 'toto-3.14*',
+        '=x11-libs/qtile-0.10.6', '=toto-3.14*:3.14::gentoo', '<toto-3.14**',
+        '=virtual/toto-0_beta_alpha-r0', 'sys-kernel/gentoo-sources:4.8.0=',
+        'sys-kernel/vanilla-sources::sapher', '~python-3.7-r9999', 'foo-1-2', 'foo-1-r2-3',
+        'foo-bar-1.0-r1', 'foo-1-bar', 'a-1', '-1', 'foo-', 'foo--1', 'foo-1a', 'foo-1ab',
+        'foo-1.0_p1_rc2', 'foo-1.0_beta-r', 'foo-1.0-r1-r2', 'x11/foo', 'x-1/foo', 'x-1-2/foo',
+        'X/foo', '/foo', 'a//foo', 'a/b/foo', 'dev-lang/python:*', 'dev-lang/python:=',
+        'dev-lang/python:3.6/3.6m=', 'dev-lang/python:3/', 'dev-lang/python:/3',
+        'dev-lang/python:3*', 'dev-lang/python:3=*', 'dev-lang/python:', 'dev-lang/python::',
+        'dev-lang/python:3::', 'dev-lang/python::gentoo', 'dev-lang/python:::gentoo',
+        'dev-lang/python::gen+too', 'dev-lang/python::gen:too', 'dev-lang/python[ssl]',
+        '!!dev-lang/python[-ssl,xml?,!tk=]', '!>=dev-lang/python-3[ssl]', '!!!foo',
+        'foo[', 'foo[]', 'foo[ssl', 'foo[ssl,]', 'foo[,ssl]', 'foo[Ssl]', 'foo[1ssl]',
+        'foo[ssl?=]', 'foo[ssl][xml]', 'foo:3[ssl]', 'foo[ssl]:3', 'foo:3[ssl]::gentoo',
+        '>=foo', '=>foo-1', '==foo-1', '~~foo-1', '>foo-1.0*', 'foo-1.0*:*', 'foo*',
+        'f+o_o-1.0', 'foo-1.0.*', 'foo bar', 'foo-1.0 ',
+        '!foo', 'foo-01.002', 'foo-1_pre1_p', 'foo-1.0-r01', 'gtk+:3[X]', 'foo[ssl(+)]',
+        'foo[a(-)?,!b(+)=]', 'foo[a(*)]', 'foo[(+)]', 'foo[a(+)(-)]',
+    ]
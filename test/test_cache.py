@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+# Distributed under the terms of the GNU General Public License v2
+from hashlib import md5
+import os
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from appi.cache import FlatListCache, Md5DictCache, PersistentCache, RepositoryCache
+from appi.ebuild import Ebuild
+
+from .helpers import TemporaryDirectoryTestCase
+
+
+class RepositoryTestCase(TemporaryDirectoryTestCase):
+    """Setup a temporary repository with a single ebuild inheriting one eclass."""
+
+    ebuild_content = 'EAPI=6\ninherit foo\nSLOT="0"\n'
+    eclass_content = 'IUSE="doc"\n'
+
+    def setUp(self):
+        super().setUp()
+        self.ebuild_path = self.location / 'cat' / 'pkg' / 'pkg-1.0.ebuild'
+        self.eclass_path = self.location / 'eclass' / 'foo.eclass'
+        self.write(self.ebuild_path, self.ebuild_content)
+        self.write(self.eclass_path, self.eclass_content)
+        self.ebuild = Ebuild(self.ebuild_path)
+
+    @staticmethod
+    def checksum(content):
+        return md5(content.encode('utf-8')).hexdigest()
+
+
+class TestMd5DictCache(RepositoryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.cache = Md5DictCache(self.location, eclass_locations=[self.location])
+        self.write_entry(
+            self.checksum(self.ebuild_content), self.checksum(self.eclass_content))
+
+    def write_entry(self, ebuild_checksum, eclass_checksum):
+        self.write(self.location / 'metadata' / 'md5-cache' / 'cat' / 'pkg-1.0', (
+            'EAPI=6\nIUSE=doc\nSLOT=0\n'
+            '_eclasses_=foo\t{}\n_md5_={}\n'
+        ).format(eclass_checksum, ebuild_checksum))
+
+    def test_valid_entry(self):
+        metadata = self.cache.get(self.ebuild)
+        self.assertEqual(metadata['EAPI'], '6')
+        self.assertEqual(metadata['IUSE'], 'doc')
+        self.assertEqual(metadata['SLOT'], '0')
+        self.assertEqual(metadata['INHERITED'], 'foo')
+        self.assertEqual(metadata['KEYWORDS'], '')
+
+    def test_missing_entry(self):
+        os.remove(str(self.cache.get_entry_path(self.ebuild)))
+        self.assertIsNone(self.cache.get(self.ebuild))
+
+    def test_stale_ebuild(self):
+        self.write(self.ebuild_path, self.ebuild_content + 'KEYWORDS="~amd64"\n')
+        self.assertIsNone(self.cache.get(self.ebuild))
+
+    def test_stale_eclass(self):
+        self.write_entry(self.checksum(self.ebuild_content), self.checksum('IUSE=""\n'))
+        self.assertIsNone(self.cache.get(self.ebuild))
+
+    def test_missing_eclass(self):
+        os.remove(str(self.eclass_path))
+        self.assertIsNone(self.cache.get(self.ebuild))
+
+    def test_parse_eclasses(self):
+        checksum = self.checksum('')
+        self.assertEqual(
+            Md5DictCache.parse_eclasses('foo\t{0}\tbar\t{0}'.format(checksum)),
+            {'foo': checksum, 'bar': checksum})
+        self.assertEqual(
+            Md5DictCache.parse_eclasses('foo\t/path/to\t{}'.format(checksum)),
+            {'foo': checksum})
+        self.assertEqual(Md5DictCache.parse_eclasses(''), {})
+        self.assertIsNone(Md5DictCache.parse_eclasses('foo'))
+
+
+class TestFlatListCache(RepositoryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.cache = FlatListCache(self.location, eclass_locations=[self.location])
+        self.entry_path = self.cache.get_entry_path(self.ebuild)
+        lines = [''] * len(FlatListCache.keys)
+        lines[FlatListCache.keys.index('SLOT')] = '0'
+        lines[FlatListCache.keys.index('IUSE')] = 'doc'
+        self.write(self.entry_path, '\n'.join(lines) + '\n')
+        ebuild_mtime = self.ebuild_path.stat().st_mtime
+        os.utime(str(self.entry_path), (ebuild_mtime, ebuild_mtime))
+
+    def test_valid_entry(self):
+        metadata = self.cache.get(self.ebuild)
+        self.assertEqual(metadata['IUSE'], 'doc')
+        self.assertEqual(metadata['SLOT'], '0')
+        self.assertEqual(metadata['EAPI'], '0')
+
+    def test_stale_entry(self):
+        ebuild_mtime = self.ebuild_path.stat().st_mtime
+        os.utime(str(self.entry_path), (ebuild_mtime - 60, ebuild_mtime - 60))
+        self.assertIsNone(self.cache.get(self.ebuild))
+
+
+class TestForLocation(RepositoryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(RepositoryCache._instances.discard, str(self.location))
+
+    def test_for_location(self):
+        self.write(self.location / 'metadata' / 'cache' / 'cat' / 'pkg-1.0')
+        cache = RepositoryCache.for_location(self.location)
+        self.assertIsInstance(cache, FlatListCache)
+        self.assertIs(RepositoryCache.for_location(str(self.location)), cache)
+
+    def test_cache_generated_later(self):
+        self.assertIsNone(RepositoryCache.for_location(self.location))
+        (self.location / 'metadata' / 'md5-cache').mkdir(parents=True)
+        self.assertIsNone(RepositoryCache.for_location(self.location))
+        with patch.object(RepositoryCache, 'check_interval', 0):
+            cache = RepositoryCache.for_location(self.location)
+        self.assertIsInstance(cache, Md5DictCache)
+        self.assertEqual(cache.location, self.location)
+
+
+class TestPersistentCache(RepositoryTestCase):
+
+    metadata = {'EAPI': '6', 'IUSE': 'doc', 'SLOT': '0', 'INHERITED': 'foo'}
+
+    def setUp(self):
+        super().setUp()
+        self.cache_dir = TemporaryDirectory()
+        self.cache = PersistentCache(
+            self.cache_dir.name, max_entries=2, eclass_locations=[self.location])
+        self.cache.put(self.ebuild, self.metadata)
+
+    def tearDown(self):
+        self.cache_dir.cleanup()
+        super().tearDown()
+
+    def test_hit(self):
+        self.assertEqual(self.cache.get(self.ebuild), self.metadata)
+        self.assertEqual(self.cache.get_stats()['hits'], 1)
+
+    def test_shared_between_instances(self):
+        cache = PersistentCache(self.cache_dir.name, eclass_locations=[self.location])
+        self.assertEqual(cache.get(self.ebuild), self.metadata)
+
+    def test_miss(self):
+        ebuild = Ebuild(self.location / 'cat' / 'pkg' / 'pkg-2.0.ebuild')
+        self.write(ebuild.location, self.ebuild_content)
+        self.assertIsNone(self.cache.get(ebuild))
+        self.assertEqual(self.cache.get_stats()['misses'], 1)
+
+    def test_stale_ebuild(self):
+        self.write(self.ebuild_path, self.ebuild_content + 'KEYWORDS="~amd64"\n')
+        self.assertIsNone(self.cache.get(self.ebuild))
+        self.assertEqual(self.cache.get_stats()['stale'], 1)
+
+    def test_stale_eclass(self):
+        self.write(self.eclass_path, 'IUSE=""\n')
+        self.assertIsNone(self.cache.get(self.ebuild))
+
+    def test_eviction(self):
+        for version in ['2.0', '3.0']:
+            ebuild = Ebuild(self.location / 'cat' / 'pkg' / 'pkg-{}.ebuild'.format(version))
+            self.write(ebuild.location, self.ebuild_content)
+            self.cache.put(ebuild, self.metadata)
+        self.assertEqual(self.cache.count(), 2)
+        self.assertIsNone(self.cache.get(self.ebuild))
+
+    def test_batch_eviction(self):
+        cache = PersistentCache(
+            self.cache_dir.name, max_entries=4, eclass_locations=[self.location])
+        cache.evict_ratio = 0.5
+        with patch.object(cache, 'count', wraps=cache.count) as count:
+            for version in ['2.0', '3.0', '4.0', '5.0']:
+                ebuild = Ebuild(self.location / 'cat' / 'pkg' / 'pkg-{}.ebuild'.format(version))
+                self.write(ebuild.location, self.ebuild_content)
+                cache.put(ebuild, self.metadata)
+            self.assertEqual(count.call_count, 1)
+        self.assertEqual(cache.count(), 2)
+        self.assertIsNone(cache.get(self.ebuild))
+
+    def test_prune(self):
+        os.remove(str(self.ebuild_path))
+        self.assertEqual(self.cache.prune(), 1)
+        self.assertEqual(self.cache.count(), 0)
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+# Distributed under the terms of the GNU General Public License v2
+import os
+from unittest.mock import patch
+
+from appi.catalog import Catalog
+from appi.conf import Repository
+
+from .helpers import TemporaryDirectoryTestCase
+
+
+class CatalogTestCase(TemporaryDirectoryTestCase):
+    """Setup a temporary repository."""
+
+    ebuilds = [
+        'app-misc/foo/foo-1.0.ebuild',
+        'app-misc/foo/foo-1.1-r1.ebuild',
+        'app-misc/foo/foo-bar-1.0.ebuild',
+        'app-misc/foo/Manifest',
+        'dev-libs/foo/foo-2.0_rc1.ebuild',
+        'dev-libs/bar/bar-0.1.ebuild',
+        'eclass/baz.eclass',
+    ]
+
+    def setUp(self):
+        super().setUp()
+        self.repository = self.location / 'repo'
+        for path in self.ebuilds:
+            self.write(self.repository / path)
+        self.catalog = Catalog(self.repository)
+
+    def tearDown(self):
+        Catalog.invalidate(self.repository)
+        super().tearDown()
+
+
+class TestCatalog(CatalogTestCase):
+
+    def test_list_categories(self):
+        self.assertEqual(self.catalog.list_categories(), ['app-misc', 'dev-libs'])
+
+    def test_list_packages(self):
+        self.assertEqual(self.catalog.list_packages('dev-libs'), ['bar', 'foo'])
+        self.assertEqual(self.catalog.list_packages('nonexistent'), [])
+
+    def test_find_categories(self):
+        self.assertEqual(self.catalog.find_categories('foo'), ['app-misc', 'dev-libs'])
+        self.assertEqual(self.catalog.find_categories('bar'), ['dev-libs'])
+        self.assertEqual(self.catalog.find_categories('nonexistent'), [])
+
+    def test_list_versions(self):
+        self.assertEqual(
+            sorted(self.catalog.list_versions('app-misc', 'foo')), ['1.0', '1.1-r1'])
+        self.assertEqual(self.catalog.list_versions('app-misc', 'bar'), [])
+
+    def test_iter_ebuild_paths(self):
+        self.assertEqual(
+            sorted(self.catalog.iter_ebuild_paths('foo', version_pattern='1*')), [
+                self.repository / 'app-misc/foo/foo-1.0.ebuild',
+                self.repository / 'app-misc/foo/foo-1.1-r1.ebuild',
+            ])
+        self.assertEqual(
+            list(self.catalog.iter_ebuild_paths('foo', 'dev-libs')),
+            [self.repository / 'dev-libs/foo/foo-2.0_rc1.ebuild'])
+
+    def test_refresh(self):
+        self.catalog.list_categories()
+        self.write(self.repository / 'sys-apps/qux/qux-1.0.ebuild')
+        self.assertEqual(self.catalog.find_categories('qux'), [])
+        self.catalog.refresh()
+        self.assertEqual(self.catalog.find_categories('qux'), ['sys-apps'])
+
+    def test_for_location(self):
+        catalog = Catalog.for_location(self.repository)
+        self.assertIs(Catalog.for_location(str(self.repository)), catalog)
+        Catalog.invalidate(self.repository)
+        self.assertIsNot(Catalog.for_location(self.repository), catalog)
+
+    def test_new_ebuilds(self):
+        self.assertEqual(
+            sorted(self.catalog.list_versions('app-misc', 'foo')), ['1.0', '1.1-r1'])
+        self.assertEqual(self.catalog.find_categories('qux'), [])
+        self.write(self.repository / 'app-misc/foo/foo-2.0.ebuild')
+        self.write(self.repository / 'dev-libs/qux/qux-1.0.ebuild')
+        # Make sure mtimes differ from the ones the catalog saw.
+        for path in ('app-misc/foo', 'dev-libs'):
+            os.utime(str(self.repository / path), ns=(0, 0))
+        self.assertEqual(
+            sorted(self.catalog.list_versions('app-misc', 'foo')), ['1.0', '1.1-r1', '2.0'])
+        self.assertEqual(self.catalog.find_categories('qux'), [])
+        with patch.object(Catalog, 'check_interval', 0):
+            self.assertEqual(self.catalog.find_categories('qux'), ['dev-libs'])
+
+    def test_repository_conf_reload(self):
+        catalog = Catalog.for_location(self.repository)
+        self.assertIs(Catalog.for_location(self.repository), catalog)
+        with patch.object(Repository, 'get_state', return_value=object()):
+            self.assertIsNot(Catalog.for_location(self.repository), catalog)
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+# Distributed under the terms of the GNU General Public License v2
+from unittest import TestCase
+from unittest.mock import patch
+
+from appi.atom import DependAtom
+from appi.base.util.cache import LRUCache
+from appi.depend import DependError, DependGroup, UseConditional
+
+
+class TestDependGroupValidityMetaclass(type(TestCase)):
+
+    @staticmethod
+    def invalid_test_func_wrapper(depend, code):
+        def test_func(self):
+            with self.assertRaises(DependError) as cm:
+                DependGroup.parse(depend)
+            self.assertEqual(cm.exception.code, code)
+        return test_func
+
+    @staticmethod
+    def valid_test_func_wrapper(depend):
+        def test_func(self):
+            DependGroup.parse(depend)
+        return test_func
+
+    def __new__(mcs, name, bases, attrs):
+        for depend, code in attrs['invalid_depends']:
+            func_name = 'test_invalid_depend_{}'.format(depend)
+            test_func = mcs.invalid_test_func_wrapper(depend, code)
+            test_func.__name__ = func_name
+            attrs[func_name] = test_func
+        for depend in attrs['valid_depends']:
+            func_name = 'test_valid_depend_{}'.format(depend)
+            test_func = mcs.valid_test_func_wrapper(depend)
+            test_func.__name__ = func_name
+            attrs[func_name] = test_func
+        return super().__new__(mcs, name, bases, attrs)
+
+
+class TestDependGroupValidity(TestCase, metaclass=TestDependGroupValidityMetaclass):
+
+    invalid_depends = [
+        ('( dev-lang/python', 'unclosed_group'), ('ssl? ( a/b ( c/d )', 'unclosed_group'),
+        ('dev-lang/python )', 'unexpected_parenthesis'), (')', 'unexpected_parenthesis'),
+        ('|| dev-lang/python', 'missing_parenthesis'), ('ssl?', 'missing_parenthesis'),
+        ('|| ^^ ( a/b )', 'missing_parenthesis'), ('python', 'invalid_atom'),
+        ('(dev-lang/python)', 'invalid_atom'), ('ssl ( a/b )', 'invalid_atom'),
+        ('a/b[threads(*)]', 'invalid_atom'), ('a/b[(+)]', 'invalid_atom'),
+    ]
+    valid_depends = [
+        '', '  \n\t', 'dev-lang/python', '>=dev-lang/python-3.6:3.6=[ssl,-tk]',
+        '|| ( a/b c/d )', '^^ ( a/b c/d )', '?? ( a/b c/d )', '( a/b c/d )',
+        'ssl? ( dev-libs/openssl ) !ssl? ( dev-libs/libressl )', '|| ( )',
+        'test? ( || ( dev-python/a ( dev-python/b dev-python/c ) ) )',
+        '!!<sys-apps/portage-2.3\n\tdoc? ( app-doc/doxygen )',
+        'x11-libs/gtk+:3[X]', 'dev-lang/python[threads(+)]',
+        'x11-libs/libX11[abi_x86_32(-)?,abi_x86_64(-)?]',
+    ]
+
+
+class TestDependGroup(TestCase):
+
+    depend_string = (
+        'dev-lang/python:3.6 ssl? ( >=dev-libs/openssl-1.1:0= ) '
+        '!ssl? ( || ( dev-libs/a ( dev-libs/b dev-libs/c ) ) ) '
+        'test? ( ?? ( app-misc/x app-misc/y ) )'
+    )
+
+    def setUp(self):
+        self.tree = DependGroup.parse(self.depend_string)
+
+    def test_tree(self):
+        python, ssl, no_ssl, test = self.tree.children
+        self.assertIsInstance(python, DependAtom)
+        self.assertEqual(str(python), 'dev-lang/python:3.6')
+        self.assertIsInstance(ssl, UseConditional)
+        self.assertEqual((ssl.flag, ssl.negated), ('ssl', False))
+        self.assertEqual((no_ssl.flag, no_ssl.negated), ('ssl', True))
+        any_of, = no_ssl.children
+        self.assertEqual(any_of.operator, '||')
+        self.assertIsNone(any_of.children[1].operator)
+        self.assertEqual(test.children[0].operator, '??')
+
+    def test_str(self):
+        self.assertEqual(str(self.tree), self.depend_string.strip())
+        self.assertEqual(str(DependGroup.parse(' a/b\n( c/d )\t')), 'a/b ( c/d )')
+
+    def test_parse_is_memoized(self):
+        self.assertIs(DependGroup.parse(self.depend_string), self.tree)
+
+    def test_equality(self):
+        tree = DependGroup._parse(self.depend_string)
+        self.assertIsNot(tree, self.tree)
+        self.assertEqual(tree, self.tree)
+        self.assertEqual(hash(tree), hash(self.tree))
+        self.assertNotEqual(DependGroup.parse('ssl? ( a/b )'), DependGroup.parse('!ssl? ( a/b )'))
+        self.assertNotEqual(DependGroup.parse('|| ( a/b )'), DependGroup.parse('^^ ( a/b )'))
+        self.assertNotEqual(DependGroup.parse('( a/b )'), DependGroup.parse('a/b'))
+
+    def test_equality_without_shared_atoms(self):
+        with patch.object(DependAtom, 'intern_cache', LRUCache(0)):
+            self.assertEqual(DependGroup._parse('dev-libs/a'), DependGroup._parse('dev-libs/a'))
+
+    def test_immutable(self):
+        with self.assertRaises(AttributeError):
+            self.tree.children = ()
+
+    def test_evaluate(self):
+        self.assertEqual(
+            str(self.tree.evaluate({'ssl'})),
+            'dev-lang/python:3.6 >=dev-libs/openssl-1.1:0=')
+        self.assertEqual(
+            str(self.tree.evaluate({'test'})),
+            'dev-lang/python:3.6 || ( dev-libs/a ( dev-libs/b dev-libs/c ) ) '
+            '?? ( app-misc/x app-misc/y )')
+
+    def test_flatten(self):
+        self.assertEqual(
+            [str(a) for a in self.tree.flatten()],
+            ['dev-lang/python:3.6', '>=dev-libs/openssl-1.1:0=', 'dev-libs/a',
+             'dev-libs/b', 'dev-libs/c', 'app-misc/x', 'app-misc/y'])
+        self.assertEqual(
+            [str(a) for a in self.tree.flatten({'ssl'})],
+            ['dev-lang/python:3.6', '>=dev-libs/openssl-1.1:0='])
+
+    def test_iter_tokens(self):
+        self.assertEqual(
+            list(DependGroup.iter_tokens(' || (\ta/b\n) ')), ['||', '(', 'a/b', ')'])
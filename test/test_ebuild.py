@@ -2,11 +2,17 @@
 # Distributed under the terms of the GNU General Public License v2
 from pathlib import Path
 from unittest import TestCase
+from unittest.mock import patch
 
 from appi.atom import DependAtom
+from appi.base import constant
+from appi.cache import PersistentCache
 from appi.ebuild import Ebuild, EbuildError
 from appi.version import Version
 
+from .helpers import TemporaryDirectoryTestCase
+from .test_profile import ConfigTestCase
+
 
 class TestEbuildValidityMetaclass(type(TestCase)):
 
@@ -85,6 +91,26 @@ class TestEbuildStr(TestCase):
     """Need to setup a temporary portage directory for these tests"""
 
 
+class TestEbuildIdentity(TestCase):
+
+    def test_same_ebuild(self):
+        ebuilds = {Ebuild('/repo/cat/pkg/pkg-1.0.ebuild'), Ebuild('/repo/cat/pkg/pkg-1.0.ebuild')}
+        self.assertEqual(len(ebuilds), 1)
+        self.assertEqual(
+            Ebuild('/repo/cat/pkg/pkg-1.0.ebuild').get_key(), ('cat', 'pkg', '1.0', None))
+
+    def test_different_ebuilds(self):
+        self.assertNotEqual(
+            Ebuild('/repo/cat/pkg/pkg-1.0.ebuild'), Ebuild('/repo/cat/pkg/pkg-1.00.ebuild'))
+        self.assertNotEqual(
+            Ebuild('/repo/cat/pkg/pkg-1.0.ebuild'), Ebuild('/repo/other/pkg/pkg-1.0.ebuild'))
+        self.assertNotEqual(Ebuild('/repo/cat/pkg/pkg-1.0.ebuild'), 'cat/pkg-1.0')
+
+    def test_str_is_cached(self):
+        ebuild = Ebuild('/repo/cat/pkg/pkg-1.0.ebuild')
+        self.assertIs(str(ebuild), str(ebuild))
+
+
 class TestGetVersionMetaclass(type(TestCase)):
 
     @staticmethod
@@ -194,3 +220,94 @@ class TestDbDir(TestCase, metaclass=TestDbDirMetaclass):
         ('/toto/dev-libs/clang/clang-9.ebuild',
          '/var/db/pkg/dev-libs/clang-9'),
     ]
+
+
+class TestLoadMetadata(TestCase):
+
+    ebuilds = [
+        '/repo/cat/pkg/pkg-1.0.ebuild',
+        '/repo/cat/pkg/pkg-2.0.ebuild',
+        '/repo/cat/other/other-1.0.ebuild',
+    ]
+
+    def test_loaded_ebuilds_are_skipped(self):
+        ebuilds = [Ebuild(e) for e in self.ebuilds]
+        for ebuild in ebuilds:
+            ebuild._vars = {'SLOT': '0'}
+        self.assertEqual(Ebuild.load_metadata(ebuilds, workers=2), {})
+
+    def test_errors_are_captured(self):
+        ebuilds = [Ebuild(e) for e in self.ebuilds]
+        ebuilds[0]._vars = {'SLOT': '0'}
+        with patch.object(constant, 'CACHE_DIR', None), \
+                patch.object(constant, 'GLOBAL_CONFIG_PATH', '/nonexistent/appi'):
+            errors = Ebuild.load_metadata(ebuilds, workers=2)
+        self.assertEqual(set(errors), set(ebuilds[1:]))
+        for error in errors.values():
+            self.assertIsInstance(error, OSError)
+
+
+class SourcingTestCase(ConfigTestCase):
+    """Setup a temporary portage configuration whose ebuild.sh only sources
+    the ebuild, so that ebuilds can actually be executed.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.write('bin/ebuild.sh', 'source "${EBUILD}"\n')
+        for p in [
+            patch.object(constant, 'BIN_PATH', str(self.location / 'bin')),
+            patch.object(constant, 'CACHE_DIR', None),
+        ]:
+            p.start()
+            self.patches.append(p)
+
+
+class TestLoadMetadataSourcing(SourcingTestCase):
+
+    def test_vars_are_loaded(self):
+        foo = Ebuild(self.write(
+            'repo/cat/foo/foo-1.0-r1.ebuild',
+            'EAPI=7\nSLOT="0/${PV}"\nIUSE="+doc ${PN}"\n'))
+        bar = Ebuild(self.write(
+            'repo/cat/bar/bar-2.0.ebuild',
+            'EAPI=6\nSLOT="2"\nKEYWORDS="amd64 ~x86"\n'))
+        self.assertEqual(Ebuild.load_metadata([foo, bar], workers=2), {})
+        self.assertEqual(foo.vars['EAPI'], '7')
+        self.assertEqual(foo.vars['SLOT'], '0/1.0')
+        self.assertEqual(foo.useflags, {'doc', 'foo'})
+        self.assertEqual(bar.vars['EAPI'], '6')
+        self.assertEqual(bar.vars['KEYWORDS'], 'amd64 ~x86')
+        self.assertEqual(bar.slot, '2')
+
+
+class TestPersistentCaching(TemporaryDirectoryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.ebuild = Ebuild(self.write('repo/cat/pkg/pkg-1.0.ebuild', 'SLOT="0"\n'))
+        self.patches = [
+            patch.object(constant, 'CACHE_DIR', str(self.location / 'cache')),
+            patch.object(PersistentCache, '_defaults', {}),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        super().tearDown()
+
+    def parse(self, result):
+        def source(ebuild, worker=None):
+            ebuild._vars = result
+        with patch.object(Ebuild, '_source_ebuild_file', source):
+            self.ebuild._parse_ebuild_file()
+        return PersistentCache.get_default().get(self.ebuild)
+
+    def test_sourced_vars_are_cached(self):
+        self.assertEqual(self.parse({'EAPI': '7', 'SLOT': '0'}), {'EAPI': '7', 'SLOT': '0'})
+
+    def test_failures_are_not_cached(self):
+        self.assertIsNone(self.parse({}))
+        self.assertEqual(PersistentCache.get_default().count(), 0)
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+# Distributed under the terms of the GNU General Public License v2
+from unittest.mock import patch
+
+from appi.base import constant
+from appi.conf import Profile
+from appi.conf.layer import ProfileLayer, ProfileStack
+from appi.ebuild import Ebuild
+from appi.util import SignatureCache
+
+from .helpers import TemporaryDirectoryTestCase
+
+
+class ProfileTestCase(TemporaryDirectoryTestCase):
+    """Setup temporary profiles: `base`, `arch` over it, and two flavors
+    over `arch`.
+    """
+
+    files = {
+        'base/use.mask': 'doc\nfoo bar\n',
+        'base/use.force': 'test\n',
+        'base/package.mask': '# Masked\n>=dev-lang/python-3.7\ndev-lang/perl\n',
+        'base/package.use.mask': 'dev-lang/python tk\n',
+        'base/packages': '*sys-apps/portage\n*sys-apps/sed\napp-misc/profile\n',
+        'arch/use.mask/10-arch': '-foo\nsse\n',
+        'arch/use.stable.mask': 'unstable\n',
+        'arch/package.mask': '-dev-lang/perl\n',
+        'arch/package.use.mask': 'dev-lang/python -tk sqlite\n*/* bar\n',
+        'arch/packages': '-*sys-apps/sed\n',
+        'desktop/use.force': '-test X\n',
+        'server/use.mask': '-*\n',
+    }
+
+    def setUp(self):
+        super().setUp()
+        for name, content in self.files.items():
+            self.write(name, content)
+        (self.location / 'empty').mkdir()
+        self.patches = [
+            patch.object(ProfileLayer, '_layers', SignatureCache()),
+            patch.object(ProfileStack, 'root', ProfileStack()),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        super().tearDown()
+
+    def get_stack(self, *names):
+        return ProfileStack.from_profiles([Profile(self.location / n) for n in names])
+
+
+class TestProfileLayer(ProfileTestCase):
+
+    def test_files(self):
+        layer = ProfileLayer.get(self.location / 'arch')
+        self.assertEqual(layer.use_mask, ('-foo', 'sse'))
+        self.assertEqual(layer.use_stable_mask, ('unstable',))
+        self.assertEqual(layer.use_force, ())
+        self.assertEqual(layer.package_mask, ((
+            ('-dev-lang/perl',), str(self.location / 'arch/package.mask'), 1),))
+
+    def test_immutable(self):
+        layer = ProfileLayer.get(self.location / 'base')
+        with self.assertRaises(AttributeError):
+            layer.use_mask = ()
+
+    def test_shared_until_changed(self):
+        layer = ProfileLayer.get(self.location / 'base')
+        self.assertIs(ProfileLayer.get(self.location / 'base'), layer)
+        with (self.location / 'base/use.force').open('a', encoding='utf-8') as f:
+            f.write('more\n')
+        self.assertIs(ProfileLayer.get(self.location / 'base'), layer)
+        with patch.object(ProfileLayer, 'check_interval', 0):
+            layer = ProfileLayer.get(self.location / 'base')
+            self.assertEqual(layer.use_force, ('test', 'more'))
+            self.assertIs(ProfileLayer.get(self.location / 'base'), layer)
+
+
+class TestProfileStack(ProfileTestCase):
+
+    def test_flags(self):
+        stack = self.get_stack('base', 'arch', 'desktop')
+        self.assertEqual(stack.use_mask, {'doc', 'bar', 'sse'})
+        self.assertEqual(stack.use_force, {'X'})
+        self.assertEqual(stack.use_stable_mask, {'unstable'})
+        self.assertEqual(self.get_stack('base', 'arch', 'server').use_mask, set())
+
+    def test_package_mask(self):
+        stack = self.get_stack('base')
+        self.assertTrue(stack.is_masked(Ebuild('/usr/portage/dev-lang/perl/perl-5.26.ebuild')))
+        stack = self.get_stack('base', 'arch')
+        self.assertFalse(stack.is_masked(Ebuild('/usr/portage/dev-lang/perl/perl-5.26.ebuild')))
+        self.assertTrue(stack.is_masked(Ebuild('/usr/portage/dev-lang/python/python-3.7.ebuild')))
+        self.assertFalse(stack.is_masked(Ebuild('/usr/portage/dev-lang/python/python-3.6.ebuild')))
+
+    def test_package_use(self):
+        stack = self.get_stack('base', 'arch', 'desktop')
+        python = Ebuild('/usr/portage/dev-lang/python/python-3.6.ebuild')
+        self.assertEqual(stack.get_use_mask(python), {'doc', 'bar', 'sse', 'sqlite'})
+        self.assertEqual(stack.get_use_mask(python, stable=True),
+                         {'doc', 'bar', 'sse', 'sqlite', 'unstable'})
+        self.assertEqual(self.get_stack('base').get_use_mask(python), {'doc', 'foo', 'bar', 'tk'})
+        self.assertEqual(stack.get_use_force(python), {'X'})
+
+    def test_system(self):
+        self.assertEqual(self.get_stack('base').system, {'sys-apps/portage', 'sys-apps/sed'})
+        self.assertEqual(self.get_stack('base', 'arch').system, {'sys-apps/portage'})
+
+    def test_shared_prefix(self):
+        desktop = self.get_stack('base', 'arch', 'desktop')
+        server = self.get_stack('base', 'arch', 'server')
+        self.assertIsNot(desktop, server)
+        self.assertIs(desktop.parent, server.parent)
+        self.assertIs(self.get_stack('base', 'arch', 'desktop'), desktop)
+        self.assertEqual([str(layer) for layer in desktop.list_layers()], [
+            str(self.location / n) for n in ('base', 'arch', 'desktop')])
+
+    def test_changed_layer(self):
+        desktop = self.get_stack('base', 'arch', 'desktop')
+        with (self.location / 'arch/use.force').open('w', encoding='utf-8') as f:
+            f.write('arch\n')
+        with patch.object(ProfileLayer, 'check_interval', 0):
+            stack = self.get_stack('base', 'arch', 'desktop')
+        self.assertIs(stack.parent.parent, desktop.parent.parent)
+        self.assertIsNot(stack.parent, desktop.parent)
+        self.assertEqual(stack.use_force, {'arch', 'X'})
+
+    def test_empty_profile(self):
+        stack = self.get_stack('base', 'empty')
+        self.assertEqual(stack.use_mask, self.get_stack('base').use_mask)
+        self.assertEqual(stack.layer.errors, ())
+
+    def test_default_profiles(self):
+        for name, content in [('arch/parent', '../base\n'), ('desktop/parent', '../arch\n'),
+                              ('portage/profile/use.force', 'user\n')]:
+            self.write(name, content)
+        (self.location / 'portage/make.profile').symlink_to(self.location / 'desktop')
+        with patch.object(constant, 'CONF_DIR', str(self.location / 'portage')), \
+                patch.object(Profile, '_profiles', SignatureCache()):
+            stack = ProfileStack.from_profiles()
+        self.assertEqual([str(layer) for layer in stack.list_layers()], [
+            str(self.location / n) for n in ('base', 'arch', 'desktop', 'portage/profile')])
+        self.assertEqual(stack.use_force, {'X', 'user'})
+        self.assertIs(stack.parent, self.get_stack('base', 'arch', 'desktop'))
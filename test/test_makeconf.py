@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+# Distributed under the terms of the GNU General Public License v2
+import re
+from unittest import TestCase
+
+from appi.conf.makeconf import MakeConfParser, UnsupportedSyntax
+from appi.util import extract_bash_file_vars
+
+from .helpers import TemporaryDirectoryTestCase
+
+
+class TestMakeConfParserMetaclass(type(TestCase)):
+
+    @staticmethod
+    def same_as_bash_test_func_wrapper(content):
+        def test_func(self):
+            path = self.write('make.conf', content.replace('{tmp_dir}', self.tmp_dir.name))
+            output_vars = set(re.findall(
+                r'^\s*(?:export\s+)?([a-z][a-z0-9_]*)=', content, re.M | re.I))
+            parsed = MakeConfParser(self.context).parse_file(path)
+            parsed = {k: parsed[k] for k in output_vars if k in parsed}
+            self.assertEqual(parsed, extract_bash_file_vars(path, output_vars, self.context))
+        return test_func
+
+    @staticmethod
+    def unsupported_test_func_wrapper(content):
+        def test_func(self):
+            with self.assertRaises(UnsupportedSyntax):
+                MakeConfParser(self.context).parse(content)
+        return test_func
+
+    def __new__(mcs, name, bases, attrs):
+        for i, content in enumerate(attrs['same_as_bash']):
+            func_name = 'test_same_as_bash_{}'.format(i)
+            test_func = mcs.same_as_bash_test_func_wrapper(content)
+            test_func.__name__ = func_name
+            attrs[func_name] = test_func
+        for i, content in enumerate(attrs['unsupported']):
+            func_name = 'test_unsupported_{}'.format(i)
+            test_func = mcs.unsupported_test_func_wrapper(content)
+            test_func.__name__ = func_name
+            attrs[func_name] = test_func
+        return super().__new__(mcs, name, bases, attrs)
+
+
+class TestMakeConfParser(TemporaryDirectoryTestCase, metaclass=TestMakeConfParserMetaclass):
+
+    context = {'USE': 'foo bar', 'ARCH': 'amd64'}
+    same_as_bash = [
+        'USE="${USE} baz"\n',
+        '# Comment\nCFLAGS="-O2 -pipe"  # Trailing comment\nCXXFLAGS="${CFLAGS}"\n',
+        'export MAKEOPTS=-j5\n',
+        "A='single $ARCH'\nB=\"double $ARCH\"\nC=unquoted$ARCH\n",
+        'A="multi\nline"\nB="continued \\\nline"\nC=a\\ b\n',
+        'A=1 B=$A\nC+=x\nC+=y\n',
+        'A=1\nunset A\nB=${A}\n',
+        'GRUB_PLATFORMS="efi-64"; VIDEO_CARDS="intel i965"\n',
+        'A="escaped \\$ARCH \\"quote\\" \\\\ \\q"\n',
+        'A=*\nB="$"\nC=foo#bar\n',
+        'A=${UNDEFINED}x\nexport A\n',
+        'A=1\nsource {tmp_dir}/make.conf.d\n',
+        'FEATURES="-test"\nACCEPT_LICENSE="* -@EULA"\n',
+    ]
+    unsupported = [
+        'A=$(uname -m)\n', 'A=`uname -m`\n', 'A=${B:-default}\n', 'A=(a b)\n',
+        'if true; then A=1; fi\n', 'A=1 true\n', 'echo A=1\n', 'A=~/foo\n',
+        'source relative/path\n', 'A="$BASH_VERSION"\n', 'A=$1\n', 'A="unterminated\n',
+        'A=1 && B=2\n', "A=$'ansi'\n", 'export -n A\n',
+    ]
+
+    def setUp(self):
+        super().setUp()
+        self.write('make.conf.d', 'SOURCED="$A"\nA=2\n')
+
+    def test_source(self):
+        content = 'source {}/make.conf.d\n'.format(self.tmp_dir.name)
+        variables = MakeConfParser({'A': '1'}).parse(content)
+        self.assertEqual(variables['SOURCED'], '1')
+        self.assertEqual(variables['A'], '2')
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+# Distributed under the terms of the GNU General Public License v2
+from unittest import TestCase
+from unittest.mock import patch
+
+from appi.atom import AtomError, DependAtom, QueryAtom
+from appi.base import constant
+from appi.conf.package import (
+    PackageAcceptKeywords, PackageConf, PackageMask, PackageUse, WildcardMatcher,
+)
+from appi.util import SignatureCache
+from appi.version import Version
+
+from .helpers import TemporaryDirectoryTestCase
+
+
+class FakeEbuild:
+    """The attributes of an ebuild used by matchers."""
+
+    def __init__(self, category, package, version, slot='0', repo_name='gentoo'):
+        self.category = category
+        self.package = package
+        self.version = version
+        self.slot, _, self.subslot = slot.partition('/')
+        self.subslot = self.subslot or None
+        self.repo_name = self.repository = repo_name
+
+    def get_version(self):
+        return Version.parse(self.version)
+
+
+class PackageConfTestCase(TemporaryDirectoryTestCase):
+    """Setup a temporary portage configuration directory."""
+
+    def setUp(self):
+        super().setUp()
+        self.patches = [
+            patch.object(constant, 'CONF_DIR', str(self.location)),
+            patch.object(PackageConf, '_snapshots', SignatureCache()),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        super().tearDown()
+
+
+class TestParseAtom(TestCase):
+
+    def test_atom_classes(self):
+        atom, matcher = PackageConf.parse_atom('>=dev-lang/python-3.6:3.6')
+        self.assertIsInstance(atom, DependAtom)
+        atom, matcher = PackageConf.parse_atom('dev-lang/python::gentoo')
+        self.assertIsInstance(atom, QueryAtom)
+        self.assertEqual(atom.repository, 'gentoo')
+        atom, matcher = PackageConf.parse_atom('=dev-lang/python-3*')
+        self.assertIsInstance(atom, DependAtom)
+        atom, matcher = PackageConf.parse_atom('dev-*/*')
+        self.assertEqual(atom, 'dev-*/*')
+        self.assertIsInstance(matcher, WildcardMatcher)
+
+    def test_invalid_atoms(self):
+        for atom_string in ('!dev-lang/python', 'dev-lang/python-3.6', '*/*:*', '**'):
+            with self.subTest(atom=atom_string):
+                with self.assertRaises(AtomError):
+                    PackageConf.parse_atom(atom_string)
+
+
+class TestWildcardMatcher(TestCase):
+
+    def test_match(self):
+        python = FakeEbuild('dev-lang', 'python', '3.6.5', '3.6/3.6m')
+        for atom_string, expected in [
+                ('*/*', True), ('dev-lang/*', True), ('*/python', True),
+                ('dev-*/py*', True), ('*/*:3.6', True), ('*/*:3.6/3.6m', True),
+                ('*/*::gentoo', True), ('app-*/*', False), ('*/pythons', False),
+                ('*/*:2.7', False), ('*/*:3.6/3.6', False), ('*/*::sapher', False)]:
+            with self.subTest(atom=atom_string):
+                self.assertEqual(WildcardMatcher(atom_string).match(python), expected)
+
+
+class TestPackageConf(PackageConfTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write('package.use/10-python', (
+            '# Python\n'
+            'dev-lang/python sqlite  # inline comment\n'
+            '>=dev-lang/python-3.6 -tk\n'
+            '\n'
+            'dev-lang/python:2.7::gentoo tk\n'
+            '=dev-lang/python foo\n'
+        ))
+        self.write('package.use/00-all', '*/* ipv6\nvim doc\n')
+        self.write('package.use/.hidden', 'dev-lang/python hidden\n')
+        self.write('package.use/.git/config', 'dev-lang/python git\n')
+        self.write('package.use/sub/.hidden/20-python', 'dev-lang/python hidden\n')
+        self.write('package.use/sub/20-python~', 'dev-lang/python backup\n')
+        self.write('package.use/sub/20-python', 'dev-lang/python:3.6 xml\n')
+
+    def test_values(self):
+        use = PackageUse()
+        self.assertEqual(len(use), 6)
+        python36 = FakeEbuild('dev-lang', 'python', '3.6.5', '3.6')
+        python27 = FakeEbuild('dev-lang', 'python', '2.7.15', '2.7')
+        self.assertEqual(use.get_values(python36), ['ipv6', 'sqlite', '-tk', 'xml'])
+        self.assertEqual(use.get_values(python27), ['ipv6', 'sqlite', 'tk'])
+        self.assertEqual(use.get_values(FakeEbuild('app-editors', 'vim', '8.1')),
+                         ['ipv6', 'doc'])
+
+    def test_entries(self):
+        entries = PackageUse().get_entries(FakeEbuild('dev-lang', 'python', '2.7.15', '2.7'))
+        self.assertEqual([str(e) for e in entries], [
+            '*/* ipv6', 'dev-lang/python sqlite', 'dev-lang/python:2.7::gentoo tk'])
+        self.assertEqual(entries[1].path, str(self.location / 'package.use/10-python'))
+        self.assertEqual(entries[1].line, 2)
+
+    def test_errors(self):
+        errors = PackageUse().errors
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors[0][:2], (str(self.location / 'package.use/10-python'), 6))
+
+    def test_only_package_atoms_are_matched(self):
+        use = PackageUse()
+        with patch.object(WildcardMatcher, 'match', return_value=False):
+            with patch('appi.atom.AtomMatcher.match', return_value=False) as match:
+                use.get_entries(FakeEbuild('app-editors', 'emacs', '26.1'))
+        # Only the category-less atom is matched.
+        self.assertEqual(match.call_count, 1)
+
+    def test_missing_file(self):
+        mask = PackageMask()
+        self.assertEqual(len(mask), 0)
+        self.assertFalse(mask.matches(FakeEbuild('dev-lang', 'python', '3.6.5')))
+
+    def test_matches(self):
+        self.write('package.mask', '>=dev-lang/python-3.7\n')
+        mask = PackageMask()
+        self.assertTrue(mask.matches(FakeEbuild('dev-lang', 'python', '3.7.0')))
+        self.assertFalse(mask.matches(FakeEbuild('dev-lang', 'python', '3.6.5')))
+
+    def test_empty_values(self):
+        self.write('package.accept_keywords', '=dev-lang/python-3.7*\n')
+        keywords = PackageAcceptKeywords()
+        python = FakeEbuild('dev-lang', 'python', '3.7.0')
+        self.assertEqual(len(keywords.get_entries(python)), 1)
+        self.assertEqual(keywords.get_values(python), [])
+
+
+class TestSnapshot(PackageConfTestCase):
+
+    def test_shared_until_changed(self):
+        self.write('package.mask', 'dev-lang/python\n')
+        mask = PackageMask.get_snapshot()
+        self.assertIs(PackageMask.get_snapshot(), mask)
+        self.assertIsNot(PackageUse.get_snapshot(), mask)
+        self.write('package.mask', 'dev-lang/python\ndev-lang/perl\n')
+        self.assertIs(PackageMask.get_snapshot(), mask)
+        with patch.object(PackageMask, 'check_interval', 0):
+            self.assertEqual(len(PackageMask.get_snapshot()), 2)
+
+    def test_new_files(self):
+        self.write('package.mask/python', 'dev-lang/python\n')
+        mask = PackageMask.get_snapshot()
+        with patch.object(PackageMask, 'check_interval', 0):
+            self.assertIs(PackageMask.get_snapshot(), mask)
+            self.write('package.mask/sub/perl', 'dev-lang/perl\n')
+            self.assertEqual(len(PackageMask.get_snapshot()), 2)
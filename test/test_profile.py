@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+# Distributed under the terms of the GNU General Public License v2
+from unittest.mock import patch
+
+from appi.base import constant
+from appi.conf import Profile
+from appi.util import SignatureCache
+
+from .helpers import TemporaryDirectoryTestCase
+
+
+class ConfigTestCase(TemporaryDirectoryTestCase):
+    """Setup a temporary portage configuration with no profile."""
+
+    files = {
+        'config/make.globals': 'PORTAGE_TMPDIR="/var/tmp"\nUSE="foo"\n',
+        'portage/make.conf': 'USE="${USE} bar"\n',
+    }
+
+    def setUp(self):
+        super().setUp()
+        for name, content in self.files.items():
+            self.write(name, content)
+        self.patches = [
+            patch.object(constant, 'GLOBAL_CONFIG_PATH', str(self.location / 'config')),
+            patch.object(constant, 'CONF_DIR', str(self.location / 'portage')),
+            patch.object(Profile, '_system_make_conf', None),
+            patch.object(Profile, '_profiles', SignatureCache()),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        super().tearDown()
+
+
+class TestGetSystemMakeConf(ConfigTestCase):
+
+    def test_make_conf(self):
+        make_conf = Profile.get_system_make_conf()
+        self.assertEqual(make_conf['PORTAGE_TMPDIR'], '/var/tmp')
+        self.assertEqual(make_conf['USE'], 'bar foo')
+
+    def test_cached(self):
+        Profile.get_system_make_conf()
+        with patch.object(Profile, '_parse_make_conf_file') as parse:
+            Profile.get_system_make_conf()
+        parse.assert_not_called()
+
+    def test_returns_a_copy(self):
+        Profile.get_system_make_conf()['USE'] = 'baz'
+        self.assertEqual(Profile.get_system_make_conf()['USE'], 'bar foo')
+
+    def test_invalidated_on_change(self):
+        Profile.get_system_make_conf()
+        self.write('portage/make.conf', 'USE="${USE} bar baz"\n')
+        self.assertEqual(Profile.get_system_make_conf()['USE'], 'bar baz foo')
+
+
+class TestList(ConfigTestCase):
+    """Profiles: `base` <- `arch` <- `desktop` and `server`, where `desktop`
+    also inherits `extra`, which inherits `base`. The selected profile is not
+    part of the list, only its parents.
+    """
+
+    files = dict(ConfigTestCase.files, **{
+        'profiles/base/make.defaults': '',
+        'profiles/arch/parent': '../base\n',
+        'profiles/extra/parent': '# Comment\n../base\n',
+        'profiles/desktop/parent': '../arch\n../extra\n',
+        'profiles/server/parent': '../arch\n',
+    })
+
+    def setUp(self):
+        super().setUp()
+        self.select('desktop')
+
+    def select(self, name):
+        link = self.location / 'portage' / 'make.profile'
+        if link.is_symlink():
+            link.unlink()
+        link.symlink_to(self.location / 'profiles' / name)
+
+    def get_names(self):
+        return [p.path.name for p in Profile.list()]
+
+    def test_list(self):
+        self.assertEqual(self.get_names(), ['base', 'arch', 'extra'])
+
+    def test_hashable(self):
+        profiles = Profile.list()
+        self.assertEqual(len(set(profiles + Profile.list())), 3)
+        self.assertEqual(Profile(self.location / 'profiles/base/../arch'), profiles[1])
+        self.assertNotEqual(profiles[0], profiles[1])
+        self.assertNotEqual(profiles[0], str(profiles[0]))
+
+    def test_cached(self):
+        Profile.list()
+        with patch.object(Profile, '_read_parent_file') as read:
+            with patch.object(Profile, 'check_interval', 0):
+                self.assertEqual(self.get_names(), ['base', 'arch', 'extra'])
+        read.assert_not_called()
+
+    def test_returns_a_copy(self):
+        Profile.list().pop()
+        self.assertEqual(len(Profile.list()), 3)
+
+    def test_invalidated_on_target_change(self):
+        Profile.list()
+        self.select('server')
+        self.assertEqual(self.get_names(), ['base', 'arch'])
+
+    def test_invalidated_on_parent_change(self):
+        Profile.list()
+        self.write('profiles/extra/parent', '')
+        self.write('profiles/base/parent', '../core\n')
+        self.assertEqual(self.get_names(), ['base', 'arch', 'extra'])
+        with patch.object(Profile, 'check_interval', 0):
+            self.assertEqual(self.get_names(), ['core', 'base', 'arch', 'extra'])
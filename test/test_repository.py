@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+# Distributed under the terms of the GNU General Public License v2
+from pathlib import Path
+from unittest.mock import patch
+
+from appi.conf import Repository
+from appi.conf.base import Conf
+from appi.ebuild import Ebuild
+from appi.util import SignatureCache
+
+from .helpers import TemporaryDirectoryTestCase
+
+
+class RepositoryConfTestCase(TemporaryDirectoryTestCase):
+    """Setup a temporary repos.conf with nested repositories, one of them
+    being reached through a symbolic link.
+    """
+
+    def setUp(self):
+        super().setUp()
+        for name in ('gentoo', 'gentoo/nested', 'actual'):
+            (self.location / 'repos' / name).mkdir(parents=True)
+        (self.location / 'repos' / 'link').symlink_to(self.location / 'repos' / 'actual')
+        conf_dir = self.location / 'portage'
+        (conf_dir / 'repos.conf' / 'empty').mkdir(parents=True)
+        self.write_conf('gentoo.conf', (
+            '[DEFAULT]\nmain-repo = gentoo\n\n'
+            '[gentoo]\nlocation = {0}/repos/gentoo\n\n'
+            '[nested]\nlocation = {0}/repos/gentoo/nested/\npriority = 10\n\n'
+        ).format(self.location))
+        self.write_conf(
+            'linked.conf', '[linked]\nlocation = {}/repos/link\n'.format(self.location))
+        self.patches = [
+            patch('appi.conf.base.CONF_DIR', str(conf_dir)),
+            patch.object(Repository, '_states', SignatureCache()),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        super().tearDown()
+
+    def write_conf(self, name, content):
+        self.write(Path('portage/repos.conf', name), content)
+
+
+class TestIndexedLookup(RepositoryConfTestCase):
+
+    def test_find_by_location(self):
+        location = self.location / 'repos' / 'gentoo'
+        self.assertEqual(Repository.find(location=location).name, 'gentoo')
+        self.assertEqual(Repository.find(location='{}/'.format(location)).name, 'gentoo')
+        self.assertIsNone(Repository.find(location=self.location))
+
+    def test_list_with_other_fields(self):
+        location = self.location / 'repos' / 'gentoo' / 'nested'
+        self.assertEqual([str(r) for r in Repository.list(location=location, priority=10)],
+                         ['nested'])
+        self.assertEqual(Repository.list(location=location, priority=0), [])
+        self.assertEqual([str(r) for r in Repository.list(priority='0')], ['gentoo', 'linked'])
+
+    def test_values_are_not_compared(self):
+        Repository.list()
+        with patch.object(Repository, 'matches') as matches:
+            Repository.find(location=self.location / 'repos' / 'gentoo')
+        matches.assert_not_called()
+
+
+class TestFindByPath(RepositoryConfTestCase):
+
+    def test_longest_prefix(self):
+        repos = self.location / 'repos'
+        self.assertEqual(Repository.find_by_path(repos / 'gentoo').name, 'gentoo')
+        self.assertEqual(Repository.find_by_path(repos / 'gentoo/cat/pkg').name, 'gentoo')
+        self.assertEqual(Repository.find_by_path(repos / 'gentoo/nested/').name, 'nested')
+        self.assertEqual(Repository.find_by_path(repos / 'gentoo/nested/cat').name, 'nested')
+
+    def test_resolved_location(self):
+        repos = self.location / 'repos'
+        self.assertEqual(Repository.find_by_path(repos / 'link/cat').name, 'linked')
+        self.assertEqual(Repository.find_by_path(repos / 'actual/cat').name, 'linked')
+
+    def test_outside_repositories(self):
+        self.assertIsNone(Repository.find_by_path(self.location))
+        self.assertIsNone(Repository.find_by_path(self.location / 'repos' / 'gentoo2'))
+        self.assertIsNone(Repository.find_by_path('relative/path'))
+
+    def test_ebuild_repository(self):
+        path = self.location / 'repos/gentoo/nested/dev-lang/python/python-3.6.5.ebuild'
+        self.assertEqual(Ebuild(path).repo_name, 'nested')
+        path = self.location / 'repos/actual/dev-lang/python/python-3.6.5.ebuild'
+        self.assertEqual(Ebuild(path).repo_name, 'linked')
+
+
+class TestReload(RepositoryConfTestCase):
+
+    def test_main_repository(self):
+        self.assertEqual(Repository.get_main_repository().name, 'gentoo')
+
+    def test_state_is_per_class(self):
+        Repository.list()
+        self.assertIsNot(Repository._states, Conf._states)
+
+    def test_throttled_until_reload(self):
+        self.assertIsNone(Repository.get('extra'))
+        self.write_conf('extra.conf', '[extra]\nlocation = /var/db/repos/extra\n')
+        self.assertIsNone(Repository.get('extra'))
+        Repository.reload()
+        self.assertEqual(Repository.find_by_path('/var/db/repos/extra').name, 'extra')
+
+    def test_changed_files_are_parsed_again(self):
+        state = Repository.get_state()
+        with patch.object(Repository, 'check_interval', 0):
+            self.assertIs(Repository.get_state(), state)
+            self.write_conf('sub/extra.conf', '[extra]\nlocation = /var/db/repos/extra\n')
+            self.assertEqual(Repository['extra']['location'], Path('/var/db/repos/extra'))
+            (self.location / 'portage/repos.conf/linked.conf').unlink()
+            self.assertIsNone(Repository.get('linked'))
+        self.assertEqual(Repository.get_main_repository().name, 'gentoo')
+        self.assertIsNot(Repository.get_state(), state)
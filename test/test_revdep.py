@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+# Distributed under the terms of the GNU General Public License v2
+from hashlib import md5
+import os
+from pathlib import Path
+from unittest.mock import patch
+
+from appi.atom import DependAtom
+from appi.catalog import Catalog
+from appi.conf import Repository
+from appi.conf.makeconf import MakeConfParser
+from appi.ebuild import Ebuild
+from appi.revdep import ReverseDependencyIndex
+from appi.util import SignatureCache
+
+from .helpers import TemporaryDirectoryTestCase
+
+
+def parse_ebuild_file(ebuild, worker=None):
+    """Stand-in for `Ebuild._parse_ebuild_file()` reading plain assignments."""
+    ebuild._vars = MakeConfParser().parse_file(ebuild.location)
+
+
+class TestReverseDependencyIndex(TemporaryDirectoryTestCase):
+
+    ebuilds = {
+        'app-misc/foo/foo-1.0.ebuild': 'DEPEND="dev-libs/bar ssl? ( dev-libs/openssl )"\n',
+        'app-misc/foo/foo-2.0.ebuild': (
+            'DEPEND="|| ( dev-libs/bar dev-libs/baz )"\nRDEPEND="!app-misc/old"\n'),
+        'dev-libs/bar/bar-1.0.ebuild': 'RDEPEND=">=dev-libs/openssl-1.1:0="\n',
+        'dev-libs/baz/baz-1.0.ebuild': 'PDEPEND="invalid"\n',
+    }
+
+    def setUp(self):
+        super().setUp()
+        for path, content in self.ebuilds.items():
+            self.write(path, content)
+        Catalog.invalidate()
+        self.patcher = patch.object(Ebuild, '_parse_ebuild_file', parse_ebuild_file)
+        self.patcher.start()
+        self.index = ReverseDependencyIndex.from_repositories(
+            [{'location': self.location}], workers=2)
+
+    def tearDown(self):
+        self.patcher.stop()
+        Catalog.invalidate()
+        super().tearDown()
+
+    def dependents(self, package, index=None):
+        paths = (index or self.index).get_dependent_paths(package)
+        return sorted(str(Path(p).relative_to(self.location)) for p in paths)
+
+    def test_index(self):
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(
+            self.dependents('dev-libs/bar'),
+            ['app-misc/foo/foo-1.0.ebuild', 'app-misc/foo/foo-2.0.ebuild'])
+        self.assertEqual(
+            self.dependents('dev-libs/openssl'),
+            ['app-misc/foo/foo-1.0.ebuild', 'dev-libs/bar/bar-1.0.ebuild'])
+        self.assertEqual(self.dependents(DependAtom('>=dev-libs/baz-2')),
+                         ['app-misc/foo/foo-2.0.ebuild'])
+        self.assertEqual(self.dependents('app-misc/old'), [])
+        self.assertEqual(
+            self.index.list_packages(), ['dev-libs/bar', 'dev-libs/baz', 'dev-libs/openssl'])
+
+    def test_errors(self):
+        error_path = str(self.location / 'dev-libs/baz/baz-1.0.ebuild')
+        self.assertEqual(list(self.index.errors), [error_path])
+
+    def test_list_dependents(self):
+        ebuilds = self.index.list_dependents('dev-libs/baz')
+        self.assertEqual([str(e) for e in ebuilds], ['app-misc/foo-2.0'])
+
+    def test_update(self):
+        self.assertEqual(self.index.update(), 0)
+        path = self.write('dev-libs/bar/bar-1.0.ebuild', 'RDEPEND="dev-libs/libressl"\n')
+        os.utime(str(path), ns=(0, 0))
+        os.remove(str(self.location / 'app-misc/foo/foo-2.0.ebuild'))
+        new = self.write('dev-libs/qux/qux-1.0.ebuild', 'DEPEND="dev-libs/bar"\n')
+        self.assertEqual(self.index.update(), 1)
+        self.assertEqual(self.index.update([new]), 1)
+        self.assertEqual(self.dependents('dev-libs/openssl'), ['app-misc/foo/foo-1.0.ebuild'])
+        self.assertEqual(self.dependents('dev-libs/libressl'), ['dev-libs/bar/bar-1.0.ebuild'])
+        self.assertEqual(self.dependents('dev-libs/baz'), [])
+        self.assertEqual(
+            self.dependents('dev-libs/bar'),
+            ['app-misc/foo/foo-1.0.ebuild', 'dev-libs/qux/qux-1.0.ebuild'])
+
+    def test_save_and_load(self):
+        path = self.location / 'revdep.json'
+        self.index.save(path)
+        index = ReverseDependencyIndex.load(path)
+        self.assertEqual(len(index), len(self.index))
+        for package in self.index.list_packages():
+            self.assertEqual(self.dependents(package, index), self.dependents(package))
+        self.assertEqual(index.update(), 0)
+
+    def test_load_invalid_file(self):
+        path = self.write('revdep.json', '{"version": 0}')
+        with self.assertRaises(ValueError):
+            ReverseDependencyIndex.load(path)
+
+
+class TestMetadataCache(TemporaryDirectoryTestCase):
+    """Index a configured repository which ebuilds are described by its
+    md5-cache, without executing them.
+    """
+
+    def setUp(self):
+        super().setUp()
+        repository = self.location / 'repos' / 'gentoo'
+        self.write(self.location / 'portage/repos.conf/gentoo.conf',
+                   '[gentoo]\nlocation = {}\n'.format(repository))
+        content = 'EAPI=7\nSLOT="0"\n'
+        self.write(repository / 'app-misc/foo/foo-1.0.ebuild', content)
+        self.write(repository / 'metadata/md5-cache/app-misc/foo-1.0', (
+            'EAPI=7\nSLOT=0\n'
+            'DEPEND=dev-libs/bar[ssl(+)?]\n'
+            'RDEPEND=dev-lang/python[threads(+)]\n'
+            'BDEPEND=>=dev-util/ninja-1.8[abi_x86_32(-)?]\n'
+            'IDEPEND=sys-apps/install-xattr\n'
+            '_eclasses_=\n_md5_={}\n'
+        ).format(md5(content.encode('utf-8')).hexdigest()))
+        self.patches = [
+            patch('appi.conf.base.CONF_DIR', str(self.location / 'portage')),
+            patch.object(Repository, '_states', SignatureCache()),
+        ]
+        for p in self.patches:
+            p.start()
+        Catalog.invalidate()
+
+    def tearDown(self):
+        Catalog.invalidate()
+        for p in self.patches:
+            p.stop()
+        super().tearDown()
+
+    def test_cached_dependencies(self):
+        with patch.object(Ebuild, '_source_ebuild_file') as source:
+            index = ReverseDependencyIndex.from_repositories()
+        source.assert_not_called()
+        self.assertEqual(dict(index.errors), {})
+        self.assertEqual(index.list_packages(), [
+            'dev-lang/python', 'dev-libs/bar', 'dev-util/ninja', 'sys-apps/install-xattr'])
+        ebuild, = index.list_dependents('dev-util/ninja')
+        self.assertEqual(ebuild.vars['BDEPEND'], '>=dev-util/ninja-1.8[abi_x86_32(-)?]')
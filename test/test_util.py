@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+# Distributed under the terms of the GNU General Public License v2
+from unittest import TestCase
+
+from appi.base.util.cache import LRUCache
+from appi.util import BashError, BashWorker, SignatureCache, extract_bash_file_vars
+
+from .helpers import TemporaryDirectoryTestCase
+
+
+class TestBashWorker(TemporaryDirectoryTestCase):
+
+    files = {
+        'first.sh': 'FOO="foo ${BASE}"\nBAR=${REQUEST}\n',
+        'second.sh': 'BAR="bar"\nBAZ="$\'multi\\nline\'"\n',
+        'reader.sh': 'read FOO\nBAR=read\n',
+        'killer.sh': 'kill -9 $$\n',
+    }
+    output_vars = {'FOO', 'BAR', 'BAZ'}
+
+    def setUp(self):
+        super().setUp()
+        for name, content in self.files.items():
+            self.write(name, content)
+        self.worker = BashWorker(context={'BASE': 'base'})
+
+    def tearDown(self):
+        self.worker.close()
+        super().tearDown()
+
+    def test_context(self):
+        result = self.worker.extract_vars(
+            self.location / 'first.sh', self.output_vars, {'REQUEST': 'request'})
+        self.assertEqual(result, {'FOO': 'foo base', 'BAR': 'request'})
+
+    def test_environment_reset(self):
+        self.worker.extract_vars(self.location / 'first.sh', self.output_vars)
+        result = self.worker.extract_vars(self.location / 'second.sh', self.output_vars)
+        self.assertNotIn('FOO', result)
+
+    def test_same_as_extract_bash_file_vars(self):
+        path = self.location / 'second.sh'
+        self.assertEqual(
+            self.worker.extract_vars(path, self.output_vars),
+            extract_bash_file_vars(path, self.output_vars))
+
+    def test_stdin_is_not_consumed(self):
+        result = self.worker.extract_vars(self.location / 'reader.sh', self.output_vars)
+        self.assertEqual(result['BAR'], 'read')
+        result = self.worker.extract_vars(self.location / 'second.sh', self.output_vars)
+        self.assertEqual(result['BAR'], 'bar')
+
+    def test_iter_extract_vars(self):
+        requests = [
+            (self.location / 'first.sh', {'REQUEST': 'request'}),
+            (self.location / 'second.sh', {}),
+        ]
+        results = list(self.worker.iter_extract_vars(requests, self.output_vars))
+        self.assertEqual([path for path, _ in results], [path for path, _ in requests])
+        self.assertEqual(results[1][1]['BAR'], 'bar')
+
+    def test_died(self):
+        with self.assertRaises(BashError):
+            self.worker.extract_vars(self.location / 'killer.sh', self.output_vars)
+        result = self.worker.extract_vars(self.location / 'second.sh', self.output_vars)
+        self.assertEqual(result['BAR'], 'bar')
+
+
+class TestLRUCache(TestCase):
+
+    def setUp(self):
+        self.cache = LRUCache(2)
+
+    def test_hits_and_misses(self):
+        self.assertEqual(self.cache.get('a', lambda: 1), 1)
+        self.assertEqual(self.cache.get('a', lambda: 2), 1)
+        stats = self.cache.get_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (1, 1, 1))
+
+    def test_least_recently_used_entry_is_discarded(self):
+        self.cache.get('a', lambda: 1)
+        self.cache.get('b', lambda: 2)
+        self.cache.get('a', lambda: 1)
+        self.cache.get('c', lambda: 3)
+        self.assertIn('a', self.cache)
+        self.assertNotIn('b', self.cache)
+
+    def test_failures_are_not_cached(self):
+        with self.assertRaises(ValueError):
+            self.cache.get('a', lambda: int('a'))
+        self.assertNotIn('a', self.cache)
+
+    def test_resize_and_clear(self):
+        self.cache.get('a', lambda: 1)
+        self.cache.get('b', lambda: 2)
+        self.cache.resize(1)
+        self.assertEqual(len(self.cache), 1)
+        self.assertIn('b', self.cache)
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.get_stats()['hits'], 0)
+
+
+class TestSignatureCache(TestCase):
+
+    def setUp(self):
+        self.cache = SignatureCache()
+        self.signatures = {'a': 1}
+        self.computed = []
+
+    def compute(self, key):
+        self.computed.append(key)
+        return len(self.computed), self.signatures[key]
+
+    def get(self, key, check_interval=0):
+        return self.cache.get(
+            key, self.compute, lambda k, v: self.signatures[k], check_interval)
+
+    def test_shared_until_changed(self):
+        self.assertEqual(self.get('a'), 1)
+        self.assertEqual(self.get('a'), 1)
+        self.signatures['a'] = 2
+        self.assertEqual(self.get('a'), 2)
+        self.assertEqual(self.computed, ['a', 'a'])
+
+    def test_check_interval(self):
+        self.get('a', 60)
+        self.signatures['a'] = 2
+        self.assertEqual(self.get('a', 60), 1)
+        self.assertEqual(self.get('a'), 2)
+
+    def test_set_and_discard(self):
+        self.assertEqual(self.cache.set('a', 'value', 1), 'value')
+        self.assertEqual(self.get('a'), 'value')
+        self.cache.discard('a')
+        self.assertEqual(self.get('a'), 1)
+        self.cache.clear()
+        self.assertEqual(self.get('a'), 2)
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+# Distributed under the terms of the GNU General Public License v2
+import os
+import re
+from unittest.mock import patch
+
+from appi.atom import QueryAtom
+from appi.base import constant
+from appi.ebuild import Ebuild
+from appi.vdb import InstalledPackage, InstalledPackageSet
+
+from .helpers import TemporaryDirectoryTestCase
+
+
+class VdbTestCase(TemporaryDirectoryTestCase):
+    """Setup a temporary database of installed packages."""
+
+    packages = {
+        'dev-lang/python-3.6.5': {'SLOT': '3.6/3.6m', 'USE': 'ssl xml', 'repository': 'gentoo'},
+        'dev-lang/python-2.7.15': {'SLOT': '2.7', 'USE': 'ssl', 'repository': 'gentoo'},
+        'dev-python/python-utils-2.3.0': {'SLOT': '0', 'repository': 'sapher'},
+        'app-misc/foo-1.0-r1': {'SLOT': '0', 'RDEPEND': 'dev-lang/python:3.6'},
+    }
+
+    def setUp(self):
+        super().setUp()
+        for cpv, files in self.packages.items():
+            path = self.location / cpv
+            path.mkdir(parents=True)
+            for name, content in files.items():
+                (path / name).write_text(content + '\n', encoding='utf-8')
+            (path / (path.name + '.ebuild')).write_text('SLOT=0\n', encoding='utf-8')
+        (self.location / 'dev-lang' / '-MERGING-python-3.7.0').mkdir()
+        (self.location / 'dev-lang' / '.keep').touch()
+
+
+class TestInstalledPackage(VdbTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.package = InstalledPackage('dev-lang', 'python', '3.6.5', self.location)
+
+    def test_from_path(self):
+        package = InstalledPackage.from_path(self.location / 'app-misc' / 'foo-1.0-r1')
+        self.assertEqual((package.category, package.package, package.version),
+                         ('app-misc', 'foo', '1.0-r1'))
+        with self.assertRaises(ValueError):
+            InstalledPackage.from_path(self.location / 'app-misc' / 'foo')
+
+    def test_mapping(self):
+        self.assertEqual(self.package['SLOT'], '3.6/3.6m')
+        self.assertEqual(self.package.get('KEYWORDS'), None)
+        self.assertEqual(
+            list(self.package), ['SLOT', 'USE', 'python-3.6.5.ebuild', 'repository'])
+        with self.assertRaises(KeyError):
+            self.package['../python-2.7.15/SLOT']
+
+    def test_files_are_read_lazily(self):
+        self.assertEqual(self.package._files, {})
+        self.package.get('USE')
+        self.assertEqual(set(self.package._files), {'USE'})
+
+    def test_properties(self):
+        self.assertEqual((self.package.slot, self.package.subslot), ('3.6', '3.6m'))
+        self.assertEqual(self.package.use, {'ssl', 'xml'})
+        self.assertEqual(self.package.repo_name, 'gentoo')
+        self.assertEqual(self.package.ebuild_path,
+                         self.location / 'dev-lang' / 'python-3.6.5' / 'python-3.6.5.ebuild')
+
+    def test_get_vars(self):
+        self.assertEqual(self.package.get_vars(['SLOT', 'IUSE']), {'SLOT': '3.6/3.6m', 'IUSE': ''})
+
+    def test_equality(self):
+        other = InstalledPackage('dev-lang', 'python', '3.6.5', self.location)
+        self.assertEqual(other, self.package)
+        self.assertEqual(len({other, self.package}), 1)
+
+
+class TestInstalledPackageSet(VdbTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.packages = InstalledPackageSet(self.location)
+
+    def test_scan(self):
+        self.assertEqual(len(self.packages), 4)
+        self.assertEqual(
+            [str(p) for p in self.packages],
+            ['app-misc/foo-1.0-r1', 'dev-lang/python-2.7.15', 'dev-lang/python-3.6.5',
+             'dev-python/python-utils-2.3.0'])
+
+    def test_indexes(self):
+        self.assertEqual(self.packages.list_categories(), ['app-misc', 'dev-lang', 'dev-python'])
+        self.assertEqual(self.packages.list_packages('dev-lang'), ['python'])
+        self.assertEqual(self.packages.find_categories('python'), ['dev-lang'])
+        self.assertEqual(
+            [p.version for p in self.packages.get('dev-lang', 'python')], ['2.7.15', '3.6.5'])
+        self.assertIn('dev-python/python-utils', self.packages)
+        self.assertNotIn('dev-python/python', self.packages)
+
+    def test_match(self):
+        def match(atom):
+            return [str(p) for p in self.packages.match(QueryAtom(atom, False))]
+        self.assertEqual(match('python'), ['dev-lang/python-2.7.15', 'dev-lang/python-3.6.5'])
+        self.assertEqual(match('>=dev-lang/python-3'), ['dev-lang/python-3.6.5'])
+        self.assertEqual(match('dev-lang/python:2.7'), ['dev-lang/python-2.7.15'])
+        self.assertEqual(match('app-misc/foo'), ['app-misc/foo-1.0-r1'])
+        self.assertEqual(match('app-misc/bar'), [])
+
+    def test_missing_database(self):
+        self.assertEqual(len(InstalledPackageSet(self.location / 'nonexistent')), 0)
+
+    def test_find(self):
+        self.assertEqual(str(self.packages.find('dev-lang', 'python', '3.6.5')),
+                         'dev-lang/python-3.6.5')
+        self.assertIsNone(self.packages.find('dev-lang', 'python', '3.7.0'))
+
+
+class TestSnapshot(VdbTestCase):
+
+    def bump_mtime(self):
+        mtime = os.stat(str(self.location)).st_mtime_ns + 10 ** 9
+        os.utime(str(self.location), ns=(mtime, mtime))
+
+    def test_snapshot_is_shared(self):
+        snapshot = InstalledPackageSet.get_snapshot(self.location)
+        self.assertIs(InstalledPackageSet.get_snapshot(str(self.location)), snapshot)
+        self.assertFalse(snapshot.is_stale())
+
+    def test_snapshot_is_refreshed(self):
+        snapshot = InstalledPackageSet.get_snapshot(self.location)
+        (self.location / 'app-misc' / 'bar-1.0').mkdir()
+        self.bump_mtime()
+        self.assertTrue(snapshot.is_stale())
+        refreshed = InstalledPackageSet.get_snapshot(self.location)
+        self.assertIsNot(refreshed, snapshot)
+        self.assertIn('app-misc/bar', refreshed)
+
+    def test_matching_installed_ebuilds(self):
+        pkg_db_re = re.compile(Ebuild.pkg_db_re.pattern.replace(
+            constant.PACKAGE_DB_PATH, re.escape(str(self.location))))
+        with patch.object(constant, 'PACKAGE_DB_PATH', str(self.location)), \
+                patch.object(Ebuild, 'pkg_db_re', pkg_db_re):
+            atom = QueryAtom('>=dev-lang/python-3')
+            self.assertEqual(
+                [e.location.parent.name for e in atom.iter_matching_ebuilds(tree=False)],
+                ['python-3.6.5'])
+            path = self.location / 'dev-lang' / 'python-3.7.0'
+            path.mkdir()
+            (path / 'python-3.7.0.ebuild').write_text('SLOT=0\n', encoding='utf-8')
+            self.bump_mtime()
+            self.assertEqual(
+                [e.location.parent.name for e in atom.iter_matching_ebuilds(tree=False)],
+                ['python-3.6.5', 'python-3.7.0'])
+
+    def test_atom_is_installed(self):
+        snapshot = InstalledPackageSet(self.location)
+        self.assertTrue(QueryAtom('dev-lang/python').is_installed(snapshot))
+        self.assertTrue(QueryAtom('dev-lang/python:2.7').is_installed(snapshot))
+        self.assertFalse(QueryAtom('>=dev-lang/python-4').is_installed(snapshot))
+        self.assertFalse(QueryAtom('app-misc/bar').is_installed(snapshot))
+        with patch.object(constant, 'PACKAGE_DB_PATH', str(self.location)):
+            self.assertTrue(QueryAtom('=app-misc/foo-1.0-r1').is_installed())
+
+
+class TestInstalledEbuildVars(VdbTestCase):
+
+    def test_vars_are_read_from_the_database(self):
+        pkg_db_re = re.compile(Ebuild.pkg_db_re.pattern.replace(
+            constant.PACKAGE_DB_PATH, re.escape(str(self.location))))
+        with patch.object(constant, 'PACKAGE_DB_PATH', str(self.location)), \
+                patch.object(Ebuild, 'pkg_db_re', pkg_db_re):
+            ebuild = Ebuild(self.location / 'app-misc' / 'foo-1.0-r1' / 'foo-1.0-r1.ebuild')
+            self.assertIsNone(ebuild.repo_name)
+            self.assertEqual(ebuild.vars['RDEPEND'], 'dev-lang/python:3.6')
+            self.assertEqual(ebuild.vars['IUSE'], '')
+            self.assertEqual(ebuild.slot, '0')
+
+    def test_ebuild_is_installed(self):
+        pkg_db_re = re.compile(Ebuild.pkg_db_re.pattern.replace(
+            constant.PACKAGE_DB_PATH, re.escape(str(self.location))))
+        snapshot = InstalledPackageSet(self.location)
+        with patch.object(constant, 'PACKAGE_DB_PATH', str(self.location)), \
+                patch.object(Ebuild, 'pkg_db_re', pkg_db_re):
+            path = self.location / 'dev-lang' / 'python-3.6.5' / 'python-3.6.5.ebuild'
+            self.assertTrue(Ebuild(path).is_installed(snapshot))
+            self.assertTrue(Ebuild(path).is_installed())
+            path = self.location / 'app-misc' / 'foo-1.0-r1' / 'foo-1.0-r1.ebuild'
+            self.assertFalse(Ebuild(path).is_installed(snapshot))
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+# Distributed under the terms of the GNU General Public License v2
+import operator
+import random
+from unittest import TestCase, skipIf
+
+from appi.vector import VersionArray, numpy
+from appi.version import Version
+
+from . import test_version
+
+
+@skipIf(numpy is None, "NumPy is not installed")
+class TestVersionArray(TestCase):
+
+    versions = test_version.TestVersionComparison.ordered_versions + [
+        '1.01', '1.001', '1.010', '1.0_p1-r3', '0.1_alpha_pre2', '3.0.0.0.1',
+    ]
+    selectors = {
+        '>=': operator.ge, '<=': operator.le, '=': operator.eq, '!=': operator.ne,
+        '<': operator.lt, '>': operator.gt,
+    }
+
+    def setUp(self):
+        self.array = VersionArray(self.versions)
+
+    def test_match_same_as_version(self):
+        for other in self.versions + ['1.0000001', '5.4.3.2.1_rc1_p2_p3-r1']:
+            other = Version(other)
+            for selector, comp in self.selectors.items():
+                expected = [comp(v, other) for v in self.array]
+                self.assertEqual(list(self.array.match(selector, other)), expected,
+                                 "{} {}".format(selector, other))
+
+    def test_match_upstream_version(self):
+        self.assertEqual(
+            [str(v) for v in self.array.filter('~', '1.1.9')], ['1.1.9-r5', '1.1.9-r123'])
+        self.assertEqual(
+            [str(v) for v in self.array.filter('^', '1.7')], ['1.7.2', '1.7.10'])
+        self.assertEqual(
+            [str(v) for v in VersionArray(['1.0', '10', '1.2']).filter('^', '1')], ['1.0', '1.2'])
+
+    def test_argsort(self):
+        versions = [Version(v) for v in self.versions]
+        random.Random(0).shuffle(versions)
+        array = VersionArray(versions)
+        self.assertEqual(
+            [str(v) for v in array.sorted()],
+            [str(v) for v in sorted(versions, key=Version.sort_key)])
+
+    def test_empty(self):
+        array = VersionArray([])
+        self.assertEqual(list(array.match('>=', '1.0')), [])
+        self.assertEqual(list(array.argsort()), [])
+
+    def test_invalid_selector(self):
+        with self.assertRaises(ValueError):
+            self.array.match('=>', '1.0')
@@ -2,7 +2,7 @@
 # Distributed under the terms of the GNU General Public License v2
 from unittest import TestCase
 
-from appi.version import Version, VersionError
+from appi.version import Version, VersionError, VersionRange
 
 
 class TestVersionValidityMetaclass(type(TestCase)):
@@ -58,6 +58,25 @@ class TestVersionComparison(TestCase, metaclass=TestVersionComparisonMetaclass):
         self.assertEqual(Version('5.0_p005'), Version('5.00_p5'))
 
 
+class TestSortKey(TestCase):
+
+    def test_sorted(self):
+        ordered_versions = [Version(v) for v in TestVersionComparison.ordered_versions]
+        shuffled = ordered_versions[1::2] + ordered_versions[::-2]
+        self.assertEqual(
+            [str(v) for v in sorted(shuffled, key=Version.sort_key)],
+            [str(v) for v in ordered_versions])
+
+    def test_hash(self):
+        self.assertEqual(hash(Version('5.0_p005')), hash(Version('5.00_p5')))
+        self.assertEqual(len({Version('5.0'), Version('05.0'), Version('5.1')}), 2)
+
+    def test_other_types(self):
+        self.assertNotEqual(Version('1.0'), '1.0')
+        with self.assertRaises(TypeError):
+            Version('1.0') < '1.1'
+
+
 class TestInvalidVersionMetaclass(type(TestCase)):
 
     @staticmethod
@@ -205,6 +224,9 @@ class TestStartswith(TestCase, metaclass=TestStartswithMetaclass):
         ('1.2.3d_beta5_p6_rc7', '1.2.3d_beta5'),
         ('1.2.3d_beta5_p6_rc7', '1.2.3d_beta5_p6'),
         ('1.2.3d_beta5_p6_rc7', '1.2.3d_beta5_p6_rc7'),
+        ('1.2b', '1.2'),
+        ('1.2_rc1', '1.2'),
+        ('1.0_p1', '1.0_p'),
     ]
     expect_false = [
         ('12.34.5-r2', '12.34.5-r23'),
@@ -216,6 +238,11 @@ class TestStartswith(TestCase, metaclass=TestStartswithMetaclass):
         ('1.2.3d_beta5_p6_rc7', '1.2.3d_p6_beta5_rc7'),
         ('1.2.3d_beta5_p6_rc7', '1.2.3d_p6_beta5'),
         ('1.2.3d_beta5_p6_rc7', '1.2.3d_rc7'),
+        ('10', '1'),
+        ('12', '1'),
+        ('1.20', '1.2'),
+        ('1.0_pre1', '1.0_p'),
+        ('1.0', '1.0_p'),
     ]
 
     def test_invalid_version_number(self):
@@ -230,3 +257,92 @@ class TestStartswith(TestCase, metaclass=TestStartswithMetaclass):
 
 class TestGetUpstreamVersion(TestCase):
     pass
+
+
+class TestParse(TestCase):
+
+    def test_instances_are_shared(self):
+        self.assertIs(Version.parse('1.2.3-r1'), Version.parse('1.2.3-r1'))
+        self.assertEqual(Version.parse('1.2.3-r1'), Version('1.2.3-r1'))
+
+    def test_invalid_version(self):
+        with self.assertRaises(VersionError):
+            Version.parse('pi')
+
+    def test_immutable(self):
+        version = Version.parse('1.2.3')
+        with self.assertRaises(AttributeError):
+            version.base = '2'
+
+
+class TestVersionRange(TestCase):
+
+    versions = sorted(
+        (Version(v) for v in TestVersionComparison.ordered_versions + [
+            '1.0-r1', '1.0_rc', '1.0_rc2_p1', '1.0.1', '10', '1.05', '1.0z_pre997-r1',
+        ]), key=Version.sort_key)
+
+    def select(self, version_range):
+        return [str(v) for v in version_range.select(self.versions)]
+
+    def test_selectors_same_as_comparisons(self):
+        for other in ['0', '1.0', '1.0z_pre997', '2.76_p0', '1999.05.05', '9999', '3']:
+            other = Version(other)
+            for selector, method in Version.selector_to_comp_method.items():
+                if selector in ('^', '!='):
+                    continue
+                expected = [str(v) for v in self.versions if getattr(v, method)(other)]
+                version_range = VersionRange.from_selector(selector, other)
+                self.assertEqual(self.select(version_range), expected)
+                self.assertEqual(
+                    [str(v) for v in self.versions if v in version_range], expected)
+
+    def test_upstream_version(self):
+        self.assertEqual(self.select(VersionRange.from_selector('~', '1.0')), ['1.0', '1.0-r1'])
+        self.assertEqual(
+            self.select(VersionRange.from_selector('~', '1.0z_pre997')),
+            ['1.0z_pre997', '1.0z_pre997-r1'])
+
+    def test_prefix(self):
+        def select(version):
+            return self.select(VersionRange.from_selector('=', version, '*'))
+        self.assertEqual(select('1.0'), [
+            '1.0_rc', '1.0_rc2_p1', '1.0', '1.0-r1', '1.0a', '1.0z_pre997',
+            '1.0z_pre997-r1', '1.0z', '1.0.1'])
+        self.assertEqual(select('1'), [
+            '1.0_rc', '1.0_rc2_p1', '1.0', '1.0-r1', '1.0a', '1.0z_pre997',
+            '1.0z_pre997-r1', '1.0z', '1.0.1', '1.05', '1.1.9-r5', '1.1.9-r123',
+            '1.7.2', '1.7.10', '1.10.0'])
+        self.assertEqual(select('1.0_rc'), ['1.0_rc', '1.0_rc2_p1'])
+        self.assertEqual(select('1.0z'), ['1.0z_pre997', '1.0z_pre997-r1', '1.0z'])
+        self.assertEqual(select('1.1.9-r5'), ['1.1.9-r5'])
+        self.assertEqual(select('2.76_p'), ['2.76_p0', '2.76_p1', '2.76_p75'])
+
+    def test_intersection_and_union(self):
+        at_least_1 = VersionRange.from_selector('>=', '1.0')
+        before_1_1 = VersionRange.from_selector('<', '1.1')
+        self.assertEqual(self.select(at_least_1 & before_1_1), [
+            '1.0', '1.0-r1', '1.0a', '1.0z_pre997', '1.0z_pre997-r1', '1.0z', '1.0.1', '1.05'])
+        self.assertEqual(at_least_1 | before_1_1, VersionRange.all())
+        self.assertEqual(
+            at_least_1.intersection(before_1_1, VersionRange.from_selector('~', '1.0')),
+            VersionRange.from_selector('~', '1.0'))
+
+    def test_emptiness(self):
+        self.assertTrue(VersionRange().is_empty())
+        self.assertFalse(VersionRange.all().is_empty())
+        self.assertTrue((
+            VersionRange.from_selector('>', '2') & VersionRange.from_selector('<', '1')
+        ).is_empty())
+        self.assertTrue((
+            VersionRange.from_selector('>', '2') & VersionRange.from_selector('<=', '2')
+        ).is_empty())
+        self.assertFalse((
+            VersionRange.from_selector('>=', '2') & VersionRange.from_selector('<=', '2')
+        ).is_empty())
+
+    def test_bisect(self):
+        keys = [v.sort_key() for v in self.versions]
+        version_range = (
+            VersionRange.from_selector('<', '0.1') | VersionRange.from_selector('>', '2016'))
+        self.assertEqual(version_range.bisect(keys), [(0, 5), (len(keys) - 2, len(keys))])